@@ -0,0 +1,76 @@
+import numpy as np
+from typing import Iterable, List
+
+from .ephemeris import Ephemeris
+from .objects import AstronomicalBody, LagrangePointObject, ALL_OBJECTS, EPHEMERIS, STAR
+from .utils import distances_points_to_segments, AU_IN_METER
+from .instrumentation import INSTRUMENTS
+
+class ClearanceChecker:
+  """Vectorized check that legs keep clear of every body's safe range.
+
+  The non-Lagrange bodies with a safe range, and the star at the origin, are
+  cached as arrays once. A batch of legs from one origin is then checked
+  against all of them with a single ephemeris evaluation.
+  """
+
+  def __init__(self, ephemeris: Ephemeris, bodies: Iterable, star: AstronomicalBody):
+    self.ephemeris = ephemeris
+    
+    obstacles = [
+      body for body in bodies
+      if not isinstance(body, LagrangePointObject) and body.safe_range() is not None
+    ]
+    self.names = [body.name for body in obstacles]
+    self.column = {name: i for i, name in enumerate(self.names)}
+    
+    # The star sits in the last column, always at the origin
+    self.column[star.name] = len(self.names)
+    safe_ranges = [body.safe_range() for body in obstacles] + [star.safe_range()]
+    self.safe_range_au = np.array(safe_ranges, dtype=np.float64) / AU_IN_METER
+
+  def sample_fractions(self, samples=1):
+    """Fractions of the leg duration at which bodies are sampled, the midpoint for a single sample"""
+    return np.linspace(0, 1, samples + 2)[1:-1]
+
+  @INSTRUMENTS.timed("clearance", items=len)
+  def clear(self, origin_name, origin_position, target_names: List[str], target_positions, departure_time, arrival_times, samples=1) -> np.ndarray:
+    """Return a boolean mask of the legs that clear every body.
+
+    Each leg is the straight segment from `origin_position` to its target
+    position. Bodies are sampled at `samples` evenly spaced times along the leg
+    (only the midpoint by default), and the origin and target of each leg are
+    excluded from its check.
+    """
+    
+    arrival_times = np.asarray(arrival_times, dtype=np.float64)
+    target_positions = np.asarray(target_positions, dtype=np.float64).reshape(-1, 3)
+    origin_position = np.asarray(origin_position, dtype=np.float64)
+    legs = arrival_times.size
+    
+    fractions = self.sample_fractions(samples)
+    times = departure_time + (arrival_times[:, None] - departure_time) * fractions
+    
+    # (legs, samples, bodies, 3), with the star appended at the origin
+    positions = self.ephemeris.positions_over(times.ravel(), self.names).reshape(legs, fractions.size, len(self.names), 3)
+    positions = np.concatenate((positions, np.zeros((legs, fractions.size, 1, 3))), axis=2)
+    
+    distances = distances_points_to_segments(
+      positions,
+      origin_position,
+      target_positions[:, None, None, :]
+    )
+    blocked = distances < self.safe_range_au
+    
+    excluded = np.zeros((legs, len(self.safe_range_au)), dtype=bool)
+    origin_column = self.column.get(origin_name)
+    if origin_column is not None:
+      excluded[:, origin_column] = True
+    for leg, name in enumerate(target_names):
+      column = self.column.get(name)
+      if column is not None:
+        excluded[leg, column] = True
+    
+    blocked &= ~excluded[:, None, :]
+    return ~blocked.any(axis=(1, 2))
+CLEARANCE = ClearanceChecker(EPHEMERIS, ALL_OBJECTS.values(), STAR)
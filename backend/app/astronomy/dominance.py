@@ -0,0 +1,132 @@
+import math
+
+class Label:
+  __slots__ = ("bucket", "cost", "dv_remaining", "alive")
+
+  def __init__(self, bucket, cost, dv_remaining):
+    self.bucket = bucket
+    self.cost = cost
+    self.dv_remaining = dv_remaining
+    self.alive = True
+
+  def dominates(self, other: 'Label') -> bool:
+    return self.bucket <= other.bucket and self.cost <= other.cost and self.dv_remaining >= other.dv_remaining
+
+class ParetoLabels:
+  """Non-dominated (arrival bucket, cost, remaining delta-v) labels per body.
+
+  Arrival times are quantized to `bucket_seconds`, which turns the search
+  into a time-expanded lattice: two arrivals in the same bucket count as
+  simultaneous. A label is dominated by another label at the same body that
+  arrives no later, costs no more and keeps at least as much delta-v.
+  Dominated labels are marked dead so states already queued for them can be
+  skipped when popped.
+  """
+
+  def __init__(self, bucket_seconds=3600.0):
+    self.bucket_seconds = bucket_seconds
+    self.labels = {}
+    self.size = 0
+    self.rejected = 0
+    self.superseded = 0
+
+  def __len__(self):
+    return self.size
+
+  def bucket(self, timestamp):
+    return math.floor(timestamp / self.bucket_seconds)
+
+  def insert(self, body_name, timestamp, cost, dv_remaining):
+    """Add a label unless it is dominated, returning the new label or None"""
+
+    label = Label(self.bucket(timestamp), cost, dv_remaining)
+    front = self.labels.setdefault(body_name, [])
+    for other in front:
+      if other.dominates(label):
+        self.rejected += 1
+        return None
+
+    kept = [other for other in front if not label.dominates(other)]
+    for other in front:
+      if label.dominates(other):
+        other.alive = False
+    self.superseded += len(front) - len(kept)
+    self.size += len(kept) + 1 - len(front)
+
+    kept.append(label)
+    self.labels[body_name] = kept
+    return label
+
+  def remove(self, body_name, label: Label):
+    """Drop a label whose state was evicted from the open set"""
+
+    if not label.alive:
+      return
+    label.alive = False
+    front = self.labels.get(body_name, [])
+    if label in front:
+      front.remove(label)
+      self.size -= 1
+
+class ParetoFront:
+  """Bounded set of mutually non-dominated objective vectors, all minimized.
+
+  Vectors are compared on an epsilon grid given by `resolution`, so two
+  vectors in the same grid box count as equal and the first one is kept.
+  When the front grows past `max_size` it is thinned, keeping the best
+  vector on every objective and then the most balanced ones.
+  """
+
+  def __init__(self, resolution, max_size=8):
+    self.resolution = tuple(resolution)
+    self.max_size = max_size
+    self.entries = []
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __iter__(self):
+    return iter(self.entries)
+
+  def box(self, objectives):
+    return tuple(math.floor(value / step) for value, step in zip(objectives, self.resolution))
+
+  def dominated(self, objectives) -> bool:
+    box = self.box(objectives)
+    return any(all(a <= b for a, b in zip(other_box, box)) for other_box, _, _ in self.entries)
+
+  def insert(self, objectives, payload) -> bool:
+    """Add a vector unless it is dominated, dropping the vectors it dominates"""
+
+    box = self.box(objectives)
+    if any(all(a <= b for a, b in zip(other_box, box)) for other_box, _, _ in self.entries):
+      return False
+
+    self.entries = [entry for entry in self.entries if not all(a <= b for a, b in zip(box, entry[0]))]
+    self.entries.append((box, tuple(objectives), payload))
+    if len(self.entries) > self.max_size:
+      self.thin()
+    return True
+
+  def thin(self):
+    count = len(self.resolution)
+    kept = []
+    for i in range(count):
+      best = min(self.entries, key=lambda entry: entry[1][i])
+      if not any(entry is best for entry in kept):
+        kept.append(best)
+
+    # Rank on every objective and prefer the vectors with the best worst rank
+    ranks = {id(entry): 0 for entry in self.entries}
+    for i in range(count):
+      for rank, entry in enumerate(sorted(self.entries, key=lambda entry: entry[1][i])):
+        ranks[id(entry)] = max(ranks[id(entry)], rank)
+    for entry in sorted(self.entries, key=lambda entry: ranks[id(entry)]):
+      if len(kept) >= self.max_size:
+        break
+      if not any(other is entry for other in kept):
+        kept.append(entry)
+    self.entries = kept
+
+  def contains(self, payload) -> bool:
+    return any(entry[2] is payload for entry in self.entries)
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+import math
+import threading
+
+class EdgeCache:
+  """Bounded LRU cache of leg geometry for the pathfinder.
+
+  Entries are keyed on the origin and target names, the departure time
+  quantized to `bucket_seconds` and a vessel fingerprint, so states that
+  revisit the same body pair at nearly the same time share one computation.
+  """
+
+  def __init__(self, max_entries=50000, bucket_seconds=60.0):
+    self.max_entries = max_entries
+    self.bucket_seconds = bucket_seconds
+    self.entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self.entries)
+
+  def key(self, origin, target, departure_time, fingerprint):
+    bucket = math.floor(departure_time / self.bucket_seconds)
+    return (origin.name, target.name, bucket, fingerprint)
+
+  def get(self, key):
+    with self._lock:
+      value = self.entries.get(key)
+      if value is None:
+        self.misses += 1
+        return None
+      self.entries.move_to_end(key)
+      self.hits += 1
+      return value
+
+  def put(self, key, value):
+    with self._lock:
+      self.entries[key] = value
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+        self.evictions += 1
+
+  def clear(self):
+    with self._lock:
+      self.entries.clear()
+      self.hits = 0
+      self.misses = 0
+      self.evictions = 0
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {
+      "entries": len(self.entries),
+      "max_entries": self.max_entries,
+      "bucket_seconds": self.bucket_seconds,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "hit_rate": self.hits / lookups if lookups else 0.0,
+    }
+
+SHARED_EDGE_CACHE = EdgeCache()
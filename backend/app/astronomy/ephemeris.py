@@ -0,0 +1,264 @@
+import numpy as np
+from typing import Iterable, Tuple
+
+from .utils import position_from_constants, move_towards, AU_IN_METER, KEPLER_SOLVES
+from .instrumentation import INSTRUMENTS
+from . import kepler
+
+@INSTRUMENTS.timed("kepler", items=np.size)
+def solve_kepler(eccentricity, mean_anomaly, warm=None):
+  """Solve Kepler's equation for arrays of eccentricities and mean anomalies, see `kepler.solve_kepler`.
+
+  A (T, N) `mean_anomaly` holds consecutive timestamps and is solved with
+  `kepler.solve_kepler_series`. `warm`, a `kepler.WarmKepler` over the N
+  eccentricities, starts a single timestamp from its previous solution.
+  """
+
+  if warm is not None:
+    eccentric_anomaly = warm.solve(mean_anomaly.reshape(-1)).reshape(mean_anomaly.shape)
+  elif mean_anomaly.ndim == 2:
+    eccentric_anomaly = kepler.solve_kepler_series(eccentricity, mean_anomaly)
+  else:
+    eccentric_anomaly = kepler.solve_kepler(eccentricity, mean_anomaly)
+  KEPLER_SOLVES.count += eccentric_anomaly.size
+  return eccentric_anomaly
+
+def orbital_positions(semimajor_axis_m, semiminor_axis_m, eccentricity, rotation, mean_anomaly_at_epoch, mean_motion, elapsed_seconds, warm=None):
+  """Vectorized counterpart of `position_from_constants`.
+
+  Per-body arguments have shape (N,) and `rotation` has shape (N, 3, 3).
+  `elapsed_seconds` broadcasts against them, a (T, 1) column is a time
+  series and `warm` is passed on as in `solve_kepler`. The result has a
+  trailing axis of size 3 and is in AU.
+  """
+
+  # The solver reduces the mean anomaly to one revolution itself
+  eccentric_anomaly = solve_kepler(eccentricity, mean_anomaly_at_epoch + mean_motion * elapsed_seconds, warm)
+  return anomaly_positions(semimajor_axis_m, semiminor_axis_m, eccentricity, rotation, eccentric_anomaly)
+
+def anomaly_positions(semimajor_axis_m, semiminor_axis_m, eccentricity, rotation, eccentric_anomaly):
+  """Positions relative to the parent in AU at given eccentric anomalies, shapes as in `orbital_positions`"""
+
+  # Perifocal coordinates straight from the eccentric anomaly
+  orbital_x = semimajor_axis_m * (np.cos(eccentric_anomaly) - eccentricity)
+  orbital_y = semiminor_axis_m * np.sin(eccentric_anomaly)
+
+  positions = orbital_x[..., None] * rotation[:, :, 0] + orbital_y[..., None] * rotation[:, :, 1]
+  return positions / AU_IN_METER
+
+def orbit_parent(body):
+  """Return the orbiting body whose position this body is relative to, or None if it orbits the star"""
+
+  primary = body.primary_object
+  if primary is None or not hasattr(primary, "semimajor_axis_au"):
+    return None
+  return primary
+
+class Ephemeris:
+  """Struct-of-arrays ephemeris for a catalog of orbiting bodies.
+
+  Every body's orbital elements are packed into NumPy arrays so that Kepler's
+  equation is solved for the whole catalog at once. Moons and Lagrange points
+  are then moved into place by a vector pass over each depth level, so a
+  parent is always resolved before its children.
+  """
+
+  def __init__(self, bodies: Iterable):
+    self.bodies = []
+    self.index = {}
+    for body in bodies:
+      self._add(body)
+
+    self.names = [body.name for body in self.bodies]
+
+    orbits = [body.orbit for body in self.bodies]
+    self.semimajor_axis_m = np.array([orbit.semimajor_axis_m for orbit in orbits], dtype=np.float64)
+    self.semiminor_axis_m = np.array([orbit.semiminor_axis_m for orbit in orbits], dtype=np.float64)
+    self.eccentricity = np.array([orbit.eccentricity for orbit in orbits], dtype=np.float64)
+    self.mean_anomaly_at_epoch = np.array([orbit.mean_anomaly_at_epoch for orbit in orbits], dtype=np.float64)
+    self.mean_motion = np.array([orbit.mean_motion for orbit in orbits], dtype=np.float64)
+    self.rotation = np.array([orbit.rotation for orbit in orbits], dtype=np.float64).reshape(-1, 3, 3)
+
+    self.parent = np.array([self._parent_index(body) for body in self.bodies], dtype=np.intp)
+    self.radial_offset_au = np.array([body.radial_offset_au() for body in self.bodies], dtype=np.float64)
+
+    depth = np.zeros(len(self.bodies), dtype=np.intp)
+    for i, parent in enumerate(self.parent):
+      if parent >= 0:
+        depth[i] = depth[parent] + 1
+    self.levels = [np.flatnonzero(depth == d) for d in range(int(depth.max(initial=0)) + 1)]
+    self.offset_levels = [level[self.radial_offset_au[level] != 0] for level in self.levels]
+
+  def __len__(self):
+    return len(self.bodies)
+
+  def _add(self, body):
+    if body.name in self.index:
+      return
+    parent = orbit_parent(body)
+    if parent is not None:
+      self._add(parent)
+    self.index[body.name] = len(self.bodies)
+    self.bodies.append(body)
+
+  def _parent_index(self, body):
+    parent = orbit_parent(body)
+    return -1 if parent is None else self.index[parent.name]
+
+  def warm_start(self):
+    """A `kepler.WarmKepler` for the whole catalog, to pass to `positions_at` at successive timestamps"""
+    return kepler.WarmKepler(self.eccentricity)
+
+  def positions_at(self, timestamp_second, warm=None) -> np.ndarray:
+    """Return an (N, 3) array of positions relative to the star in catalog order.
+
+    `warm` from `warm_start` solves Kepler's equation from the solutions of
+    the previous call made with it.
+    """
+    return self.positions_over(np.array([timestamp_second], dtype=np.float64), warm=warm)[0]
+
+  def positions_over(self, timestamps, names=None, warm=None) -> np.ndarray:
+    """Return a (T, N, 3) block of positions for every timestamp and body.
+
+    If `names` is given, only those bodies (and the parents they depend on)
+    are evaluated and the body axis follows the order of `names`. Each
+    timestamp starts Kepler's equation from the solution at the one before,
+    see `kepler.solve_kepler_series`; `warm` is as in `positions_at` and
+    needs all bodies and a single timestamp.
+    """
+
+    timestamps = np.asarray(timestamps, dtype=np.float64).reshape(-1, 1)
+
+    if names is None:
+      columns = np.arange(len(self.bodies))
+    else:
+      columns = self._closure([self.index[name] for name in names])
+
+    positions = orbital_positions(
+      self.semimajor_axis_m[columns],
+      self.semiminor_axis_m[columns],
+      self.eccentricity[columns],
+      self.rotation[columns],
+      self.mean_anomaly_at_epoch[columns],
+      self.mean_motion[columns],
+      timestamps,
+      warm
+    )
+
+    local = np.full(len(self.bodies), -1, dtype=np.intp)
+    local[columns] = np.arange(columns.size)
+
+    for level, offset_level in zip(self.levels, self.offset_levels):
+      children = local[level[self.parent[level] >= 0]]
+      children = children[children >= 0]
+      if children.size:
+        positions[:, children] += positions[:, local[self.parent[columns[children]]]]
+
+      offsets = local[offset_level]
+      offsets = offsets[offsets >= 0]
+      if offsets.size:
+        positions[:, offsets] = self._move_towards_star(positions[:, offsets], self.radial_offset_au[columns[offsets]])
+
+    if names is not None:
+      positions = positions[:, local[[self.index[name] for name in names]]]
+
+    return positions
+
+  def positions_paired(self, indices, timestamps, warm=None) -> np.ndarray:
+    """Return a (K, 3) array with the position of body `indices[k]` at `timestamps[k]`.
+
+    `warm` is a list the caller keeps over calls with the same `indices` at
+    nearby timestamps, e.g. a sample and the points around it. It collects
+    a `kepler.WarmKepler` per parent level, so that every call after the
+    first starts from the previous call's solutions.
+    """
+    return self._positions_paired(np.asarray(indices, dtype=np.intp), timestamps, warm, 0)
+
+  def _positions_paired(self, indices, timestamps, warm, level):
+    timestamps = np.broadcast_to(np.asarray(timestamps, dtype=np.float64), indices.shape)
+
+    solver = None
+    if warm is not None:
+      if len(warm) == level:
+        warm.append(kepler.WarmKepler(self.eccentricity[indices]))
+      solver = warm[level]
+
+    positions = orbital_positions(
+      self.semimajor_axis_m[indices],
+      self.semiminor_axis_m[indices],
+      self.eccentricity[indices],
+      self.rotation[indices],
+      self.mean_anomaly_at_epoch[indices],
+      self.mean_motion[indices],
+      timestamps,
+      solver
+    )
+
+    parents = self.parent[indices]
+    children = parents >= 0
+    if children.any():
+      positions[children] += self._positions_paired(parents[children], timestamps[children], warm, level + 1)
+
+    offsets = self.radial_offset_au[indices]
+    moved = offsets != 0
+    if moved.any():
+      positions[moved] = self._move_towards_star(positions[moved], offsets[moved])
+
+    return positions
+
+  def place(self, indices, relative, positions) -> np.ndarray:
+    """Move (K, 3) positions of bodies `indices` relative to their parents into place.
+
+    `positions` is the (N, 3) catalog at the time the parents are taken at,
+    e.g. from `positions_at`. Bodies with a radial offset are then moved
+    towards the star as in `positions_over`.
+    """
+
+    indices = np.asarray(indices, dtype=np.intp)
+    placed = np.array(relative, dtype=np.float64)
+    parents = self.parent[indices]
+    children = parents >= 0
+    placed[children] += positions[parents[children]]
+
+    offsets = self.radial_offset_au[indices]
+    moved = offsets != 0
+    if moved.any():
+      placed[moved] = self._move_towards_star(placed[moved], offsets[moved])
+    return placed
+
+  def _closure(self, indices):
+    """Return the sorted indices together with all of their parents"""
+
+    needed = set()
+    for i in indices:
+      while i >= 0 and i not in needed:
+        needed.add(i)
+        i = self.parent[i]
+    return np.array(sorted(needed), dtype=np.intp)
+
+  def position_of(self, body, timestamp_second) -> Tuple[float, float, float]:
+    """Return the position of a single body relative to the star"""
+
+    coordinates = position_from_constants(body.orbit, timestamp_second)
+
+    parent = orbit_parent(body)
+    if parent is not None:
+      x, y, z = parent.position_at_time(timestamp_second)
+      rel_x, rel_y, rel_z = coordinates
+      coordinates = (x + rel_x, y + rel_y, z + rel_z)
+
+    offset = body.radial_offset_au()
+    if offset:
+      coordinates = move_towards(coordinates, (0, 0, 0), offset)
+
+    return coordinates
+
+  @staticmethod
+  def _move_towards_star(positions, offset_au):
+    """Vectorized `move_towards` with the star as target"""
+
+    length = np.linalg.norm(positions, axis=-1)
+    safe_length = np.where(length == 0, 1.0, length)
+    moved = positions * (1 - offset_au / safe_length)[..., None]
+    arrived = (length == 0) | (offset_au >= length)
+    return np.where(arrived[..., None], 0.0, moved)
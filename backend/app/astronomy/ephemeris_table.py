@@ -0,0 +1,335 @@
+import glob
+import hashlib
+import math
+import os
+import tempfile
+import threading
+import numpy as np
+
+from .ephemeris import Ephemeris
+from .objects import EPHEMERIS
+from .utils import AU_IN_METER
+
+# Span of one table, tables are aligned to half windows so a timestamp is always at least a quarter window from an edge
+TABLE_WINDOW_S = 366 * 86400
+# Largest interpolation error allowed, in AU (about 150 m)
+TABLE_TOLERANCE_AU = 1e-9
+# Times a body's step is halved when the check of the interpolation finds the tolerance exceeded
+TABLE_MAX_REFINE = 4
+# Fractions of each interval the check is made at, where the error from the positions and from the velocities peaks
+TABLE_CHECK_FRACTIONS = (0.5, (3 - 3**0.5) / 6, (3 + 3**0.5) / 6)
+# Timestamps the table serves, 1900 to 2200; farther out mean anomalies lose precision and the analytic ephemeris answers
+TABLE_MIN_TIMESTAMP = -2208988800.0
+TABLE_MAX_TIMESTAMP = 7258118400.0
+# Directory of the memory-mapped tables, shared by every process on the machine
+TABLE_DIR = os.path.join(tempfile.gettempdir(), "sente-ephemeris")
+# Windows kept in the directory, the least recently loaded are deleted after each build
+TABLE_MAX_WINDOWS = 4
+
+INDEX_DTYPE = np.dtype([("offset", "<i8"), ("count", "<i8"), ("step", "<f8"), ("error_au", "<f8")])
+
+def orbital_period_s(body) -> float:
+  """`get_orbital_period` in seconds, Lagrange points move with their secondary"""
+
+  if hasattr(body, "get_orbital_period"):
+    return body.get_orbital_period() * 86400
+  return body.secondary_object.get_orbital_period() * 86400
+
+def hermite(p0, v0, p1, v1, u, h):
+  """Cubic Hermite interpolation between two samples `h` seconds apart, at fraction `u`"""
+
+  u2 = u * u
+  u3 = u2 * u
+  return (
+    (2 * u3 - 3 * u2 + 1) * p0
+    + (u3 - 2 * u2 + u) * h * v0
+    + (-2 * u3 + 3 * u2) * p1
+    + (u3 - u2) * h * v1
+  )
+
+def sample_steps(ephemeris: Ephemeris, tolerance_au) -> np.ndarray:
+  """Per-body sample step in seconds from the cubic Hermite error bound h^4 / 384 * max|x''''|.
+
+  The fourth derivative of a Kepler orbit is bounded by a n^4 (1+e)^2 / (1-e)^5,
+  its value for the angular rate and radius at periapsis, with n taken from
+  the orbital period. A body tabulated relative to the star moves with all
+  of its parents, so their bounds add up.
+  """
+
+  periods = np.array([orbital_period_s(body) for body in ephemeris.bodies])
+  mean_motion = 2 * np.pi / periods
+  e = ephemeris.eccentricity
+  bound = ephemeris.semimajor_axis_m / AU_IN_METER * mean_motion**4 * (1 + e)**2 / (1 - e)**5
+
+  total = bound.copy()
+  for i in range(len(ephemeris)):
+    parent = ephemeris.parent[i]
+    while parent >= 0:
+      total[i] += bound[parent]
+      parent = ephemeris.parent[parent]
+  return (384 * tolerance_au / total) ** 0.25
+
+class EphemerisTable:
+  """Positions of every catalog body tabulated over a time window.
+
+  Each body is sampled, relative to the star, at its own step from
+  `sample_steps`, with velocities, and read back by cubic Hermite
+  interpolation. Building a table checks the interpolation against the
+  analytic ephemeris where its error peaks in every interval, see
+  TABLE_CHECK_FRACTIONS, and halves the step of any body over `tolerance_au`; the largest error
+  seen is kept per body as its error bound. Bodies still over it after
+  TABLE_MAX_REFINE halvings get no samples (a count of 0) and are always
+  answered by the analytic ephemeris.
+
+  Tables are written once to `directory` and memory-mapped read-only, so
+  every process serving the same window shares one copy; at most
+  `max_windows` tables stay on disk. Queries outside
+  the loaded window load the table around them; a table not built yet is
+  built on a background thread while the analytic ephemeris answers. Spans
+  too long for one window, and timestamps outside TABLE_MIN_TIMESTAMP to
+  TABLE_MAX_TIMESTAMP, always use the analytic ephemeris.
+  """
+
+  def __init__(self, ephemeris: Ephemeris, window_s=TABLE_WINDOW_S, tolerance_au=TABLE_TOLERANCE_AU, directory=TABLE_DIR, max_windows=TABLE_MAX_WINDOWS):
+    self.ephemeris = ephemeris
+    self.window_s = window_s
+    self.tolerance_au = tolerance_au
+    self.directory = directory
+    self.max_windows = max_windows
+    self.steps = sample_steps(ephemeris, tolerance_au)
+
+    fingerprint = hashlib.sha1()
+    for array in (ephemeris.semimajor_axis_m, ephemeris.eccentricity, ephemeris.mean_anomaly_at_epoch, ephemeris.mean_motion, ephemeris.rotation, ephemeris.parent, ephemeris.radial_offset_au, self.steps):
+      fingerprint.update(np.ascontiguousarray(array).tobytes())
+    fingerprint.update(f"{window_s}:{tolerance_au}".encode())
+    self.key = fingerprint.hexdigest()[:16]
+
+    # (start, samples, index) of the loaded window, replaced as a whole so readers never see a mix
+    self.window = None
+    self.builds = 0
+    self.loads = 0
+    self.hits = 0
+    self.fallbacks = 0
+    self.building = set()
+    self.evictions = 0
+    # Reentrant, `load` runs under it and may start a build
+    self._lock = threading.RLock()
+
+  def window_start(self, timestamp) -> float:
+    half = self.window_s / 2
+    return math.floor(timestamp / half) * half - self.window_s / 4
+
+  def paths(self, start):
+    name = os.path.join(self.directory, f"ephemeris-{self.key}-{start:.0f}")
+    return name + ".npy", name + ".index.npy"
+
+  def covering(self, t_min, t_max):
+    """Return the window holding [t_min, t_max], or None if it is out of range, too long or still being built"""
+
+    # Also rejects NaN
+    if not (TABLE_MIN_TIMESTAMP <= t_min and t_max <= TABLE_MAX_TIMESTAMP):
+      return None
+
+    window = self.window
+    if window is not None and window[0] <= t_min and t_max <= window[0] + self.window_s:
+      return window
+
+    start = self.window_start((t_min + t_max) / 2)
+    if t_min < start or t_max > start + self.window_s:
+      return None
+
+    if not os.path.exists(self.paths(start)[1]):
+      self.build_in_background(start)
+      return None
+
+    with self._lock:
+      window = self.window
+      if window is None or window[0] != start:
+        window = self.load(start)
+        if window is not None:
+          self.window = window
+    return window
+
+  def load(self, start):
+    """Map the table of the window at `start`, or rebuild it and return None if it is gone or incomplete"""
+
+    samples_path, index_path = self.paths(start)
+    try:
+      # The index file's mtime orders windows for `prune`
+      os.utime(index_path)
+      window = start, np.load(samples_path, mmap_mode="r"), np.load(index_path)
+    except (FileNotFoundError, ValueError, EOFError):
+      # Pruned by another process since `covering` saw the index, or not fully written
+      self.build_in_background(start)
+      return None
+    self.loads += 1
+    return window
+
+  def prune(self, keep):
+    """Delete all but the `max_windows` most recently loaded or built tables in the directory, of any catalog.
+
+    The index file goes first, so other processes rebuild rather than read a
+    half-deleted table; processes that mapped a deleted table keep reading it.
+    """
+
+    indexes = []
+    for path in glob.glob(os.path.join(self.directory, "ephemeris-*.index.npy")):
+      try:
+        indexes.append((os.path.getmtime(path), path))
+      except FileNotFoundError:
+        pass
+    indexes.sort(reverse=True)
+
+    window = self.window
+    protected = {self.paths(start)[1] for start in keep + ([window[0]] if window is not None else [])}
+    kept = len(protected)
+    for _, path in indexes:
+      if path in protected:
+        continue
+      if kept < self.max_windows:
+        kept += 1
+        continue
+      for stale in (path, path.removesuffix(".index.npy") + ".npy"):
+        try:
+          os.remove(stale)
+        except FileNotFoundError:
+          pass
+      self.evictions += 1
+
+  def build_in_background(self, start):
+    with self._lock:
+      if start in self.building:
+        return
+      self.building.add(start)
+    threading.Thread(target=self.build_window, args=(start,), name=f"ephemeris-table-{start:.0f}", daemon=True).start()
+
+  def build_window(self, start):
+    try:
+      self.save(start, *self.build(start))
+      self.builds += 1
+      self.prune([start])
+    finally:
+      with self._lock:
+        self.building.discard(start)
+
+  def save(self, start, samples, index):
+    """Write the table so that a process seeing the index file always finds complete samples"""
+
+    os.makedirs(self.directory, exist_ok=True)
+    for path, array in zip(self.paths(start), (samples, index)):
+      temporary = f"{path}.{os.getpid()}.tmp"
+      with open(temporary, "wb") as f:
+        np.save(f, array)
+      os.replace(temporary, path)
+
+  def sample(self, bodies, timestamps, steps, warm):
+    """Positions and central-difference velocities, an (K, 6) block.
+
+    The points around each sample start from its solutions to Kepler's
+    equation, through `warm` as in `Ephemeris.positions_paired`.
+    """
+
+    delta = steps * 1e-4
+    positions = self.ephemeris.positions_paired(bodies, timestamps, warm)
+    ahead = self.ephemeris.positions_paired(bodies, timestamps + delta, warm)
+    behind = self.ephemeris.positions_paired(bodies, timestamps - delta, warm)
+    return np.concatenate([positions, (ahead - behind) / (2 * delta)[:, None]], axis=1)
+
+  def build(self, start):
+    count = len(self.ephemeris)
+    # Refined per window, every build starts again from the bound
+    steps = self.steps.copy()
+    for refine in range(TABLE_MAX_REFINE + 1):
+      counts = np.ceil(self.window_s / steps).astype(np.int64) + 1
+      offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+      bodies = np.repeat(np.arange(count), counts)
+      row_steps = steps[bodies]
+      timestamps = start + (np.arange(bodies.size) - offsets[bodies]) * row_steps
+      warm = []
+      samples = self.sample(bodies, timestamps, row_steps, warm)
+
+      # Check every interval against the analytic positions, past the last sample too to keep `warm`'s bodies
+      has_next = np.ones(bodies.size, dtype=bool)
+      has_next[offsets + counts - 1] = False
+      rows = np.flatnonzero(has_next)
+      body_errors = np.zeros(count)
+      for fraction in TABLE_CHECK_FRACTIONS:
+        exact = self.ephemeris.positions_paired(bodies, timestamps + fraction * row_steps, warm)[rows]
+        interpolated = hermite(samples[rows, :3], samples[rows, 3:], samples[rows + 1, :3], samples[rows + 1, 3:], fraction, row_steps[rows, None])
+        np.maximum.at(body_errors, bodies[rows], np.linalg.norm(interpolated - exact, axis=1))
+
+      over = body_errors > self.tolerance_au
+      # The index must describe the samples, so the last pass keeps its steps
+      if not over.any() or refine == TABLE_MAX_REFINE:
+        break
+      steps = np.where(over, steps / 2, steps)
+
+    # Bodies the refinement could not bring within tolerance are left to the analytic ephemeris
+    samples = samples[~over[bodies]]
+    counts = np.where(over, 0, counts)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    index = np.zeros(count, dtype=INDEX_DTYPE)
+    index["offset"] = offsets
+    index["count"] = counts
+    index["step"] = steps
+    index["error_au"] = body_errors
+    return samples, index
+
+  def positions_over(self, timestamps, names=None, warm=None) -> np.ndarray:
+    """Interpolated counterpart of `Ephemeris.positions_over`, same shapes and body order.
+
+    `warm` is passed on to the analytic ephemeris when it answers.
+    """
+
+    timestamps = np.asarray(timestamps, dtype=np.float64).reshape(-1)
+    window = self.covering(timestamps.min(), timestamps.max()) if timestamps.size else None
+    if window is None:
+      self.fallbacks += 1
+      return self.ephemeris.positions_over(timestamps, names, warm)
+    self.hits += 1
+
+    start, samples, index = window
+    columns = np.arange(len(self.ephemeris)) if names is None else np.array([self.ephemeris.index[name] for name in names], dtype=np.intp)
+    steps = index["step"][columns]
+    counts = index["count"][columns]
+    tabulated = counts > 0
+    if not tabulated.any():
+      return self.ephemeris.positions_over(timestamps, names, warm)
+
+    position = (timestamps[:, None] - start) / steps
+    interval = np.clip(np.floor(position).astype(np.int64), 0, np.maximum(counts - 2, 0))
+    # Bodies without samples read the first row, their positions are replaced below
+    rows = np.where(tabulated, index["offset"][columns] + interval, 0)
+    left = samples[rows.ravel()].reshape(rows.shape + (6,))
+    right = samples[rows.ravel() + 1].reshape(rows.shape + (6,))
+    u = (position - interval)[..., None]
+    positions = hermite(left[..., :3], left[..., 3:], right[..., :3], right[..., 3:], u, steps[:, None])
+
+    analytic = np.flatnonzero(~tabulated)
+    if analytic.size:
+      positions[:, analytic] = self.ephemeris.positions_over(timestamps, [self.ephemeris.names[i] for i in columns[analytic]])
+    return positions
+
+  def positions_at(self, timestamp_second, warm=None) -> np.ndarray:
+    return self.positions_over(np.array([timestamp_second], dtype=np.float64), warm=warm)[0]
+
+  def stats(self):
+    window = self.window
+    return {
+      "window_start": window[0] if window is not None else None,
+      "window_s": self.window_s,
+      "tolerance_au": self.tolerance_au,
+      "error_bound_au": float(window[2]["error_au"][window[2]["count"] > 0].max(initial=0.0)) if window is not None else None,
+      "analytic_bodies": int((window[2]["count"] == 0).sum()) if window is not None else 0,
+      "samples": int(window[1].shape[0]) if window is not None else 0,
+      "bytes": int(window[1].nbytes) if window is not None else 0,
+      "builds": self.builds,
+      "building": len(self.building),
+      "evictions": self.evictions,
+      "loads": self.loads,
+      "hits": self.hits,
+      "fallbacks": self.fallbacks,
+    }
+
+EPHEMERIS_TABLE = EphemerisTable(EPHEMERIS)
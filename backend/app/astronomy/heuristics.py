@@ -0,0 +1,117 @@
+import numpy as np
+
+from .ephemeris import Ephemeris
+from .utils import g_to_ms2, AU_IN_METER
+
+# Span after the departure over which the table bounds each body's distance from the star by where it actually is
+HEURISTIC_HORIZON_S = 365 * 86400
+# Timestamps the positions are sampled at over the horizon
+HEURISTIC_HORIZON_SAMPLES = 128
+
+def radial_envelopes(ephemeris: Ephemeris):
+  """Return the minimum and maximum distance from the star each body can reach, in AU.
+
+  Orbits around the star span periapsis to apoapsis. Moons add their own
+  periapsis/apoapsis to their parent's envelope, and Lagrange offsets shift
+  the envelope towards or away from the star.
+  """
+
+  semimajor_axis_au = ephemeris.semimajor_axis_m / AU_IN_METER
+  periapsis = semimajor_axis_au * (1 - ephemeris.eccentricity)
+  apoapsis = semimajor_axis_au * (1 + ephemeris.eccentricity)
+
+  r_min = np.empty(len(ephemeris))
+  r_max = np.empty(len(ephemeris))
+
+  for level in ephemeris.levels:
+    for i in level.tolist():
+      parent = ephemeris.parent[i]
+      if parent < 0:
+        low, high = periapsis[i], apoapsis[i]
+      else:
+        low = max(0.0, r_min[parent] - apoapsis[i], periapsis[i] - r_max[parent])
+        high = r_max[parent] + apoapsis[i]
+
+      offset = ephemeris.radial_offset_au[i]
+      r_min[i] = max(0.0, low - offset)
+      r_max[i] = max(0.0, high - offset)
+
+  return r_min, r_max
+
+def speed_bounds(ephemeris: Ephemeris):
+  """Return an upper bound on each body's speed relative to the star, in AU per second.
+
+  A Kepler orbit is fastest at periapsis, n a sqrt((1+e)/(1-e)); a moon
+  adds its parents' speeds.
+  """
+
+  e = ephemeris.eccentricity
+  speed = ephemeris.mean_motion * ephemeris.semimajor_axis_m / AU_IN_METER * np.sqrt((1 + e) / (1 - e))
+  for level in ephemeris.levels[1:]:
+    speed[level] += speed[ephemeris.parent[level]]
+  return speed
+
+def horizon_envelopes(ephemeris: Ephemeris, start, end, envelopes=None, samples=HEURISTIC_HORIZON_SAMPLES):
+  """Return the minimum and maximum distance from the star each body can reach between `start` and `end`, in AU.
+
+  The distances are sampled and widened by the farthest a body can move
+  between two samples, then clipped to `radial_envelopes`.
+  """
+
+  r_min, r_max = envelopes if envelopes is not None else radial_envelopes(ephemeris)
+  timestamps = np.linspace(start, end, samples)
+  radii = np.linalg.norm(ephemeris.positions_over(timestamps), axis=-1)
+  margin = speed_bounds(ephemeris) * (end - start) / (samples - 1) / 2
+  return np.maximum(r_min, radii.min(axis=0) - margin), np.minimum(r_max, radii.max(axis=0) + margin)
+
+class HeuristicTable:
+  """Admissible lower bound on the policy cost from every body to one destination.
+
+  Two bodies can never be closer than the gap between their radial envelopes,
+  so that gap bounds any leg or chain of legs between them over any time
+  window. The fastest way to cover a distance d is a brachistochrone at the
+  maximum acceleration, t = 2 * sqrt(d / a), and splitting d over several legs
+  only makes that longer. Every leg also pays at least the comfort penalty of
+  flying at the maximum acceleration. Delta-v cost can approach zero with long
+  coasts, so it contributes nothing to the bound.
+
+  Given a `departure`, a second table uses the envelopes the bodies keep
+  between it and `horizon_s` later, much tighter than a full orbit for the
+  slow outer bodies. It holds for states before the horizon whose route
+  also arrives before it. A route arriving later takes at least the time
+  left until the horizon, so a state's bound is the smaller of the two,
+  and never below the whole-orbit bound.
+
+  The tables are built once per search and each lookup is a dict access.
+  """
+
+  def __init__(self, ephemeris: Ephemeris, destination, policy, max_accel_g, max_accel_limit_g, envelopes=None, departure=None, horizon_s=HEURISTIC_HORIZON_S):
+    envelopes = envelopes if envelopes is not None else radial_envelopes(ephemeris)
+    self.destination = destination
+    self.time_weight = max(0.0, policy.time_weight)
+    comfort_weight = max(0.0, policy.comfort_weight)
+    self.leg_penalty = comfort_weight * max(0.0, max_accel_limit_g - max_accel_g) * 1000
+
+    d = ephemeris.index[destination.name]
+    self.costs = self.policy_costs(ephemeris, d, max_accel_g, *envelopes)
+
+    self.departure = departure
+    self.horizon = None if departure is None else departure + horizon_s
+    self.horizon_costs = None
+    if departure is not None:
+      self.horizon_costs = self.policy_costs(ephemeris, d, max_accel_g, *horizon_envelopes(ephemeris, departure, self.horizon, envelopes))
+
+  def policy_costs(self, ephemeris: Ephemeris, d, max_accel_g, r_min, r_max):
+    gap_au = np.maximum.reduce([np.zeros(len(ephemeris)), r_min[d] - r_max, r_min - r_max[d]])
+    min_time = 2 * np.sqrt(gap_au * AU_IN_METER / g_to_ms2(max_accel_g))
+
+    cost = self.time_weight * min_time / 1000 + self.leg_penalty
+    cost[d] = 0.0
+    return dict(zip(ephemeris.names, cost.tolist()))
+
+  def lookup(self, body, timestamp=None):
+    cost = self.costs.get(body.name, 0.0)
+    if self.horizon_costs is None or timestamp is None or not self.departure <= timestamp <= self.horizon or body == self.destination:
+      return cost
+    late = self.time_weight * (self.horizon - timestamp) / 1000 + self.leg_penalty
+    return max(cost, min(self.horizon_costs.get(body.name, 0.0), late))
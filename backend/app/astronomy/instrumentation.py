@@ -0,0 +1,117 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools
+import os
+import threading
+import time
+
+class Timings:
+  """Calls, items and seconds spent per instrumented operation"""
+
+  def __init__(self):
+    self.ops = {}
+    self.wall_s = None
+
+  def add(self, name, seconds, items=1, calls=1):
+    entry = self.ops.get(name)
+    if entry is None:
+      entry = self.ops[name] = [0, 0, 0.0]
+    entry[0] += calls
+    entry[1] += items
+    entry[2] += seconds
+
+  def merge(self, ops: dict):
+    """Add the `as_dict` form of other timings, e.g. sent back by a worker process"""
+
+    for name, entry in ops.items():
+      self.add(name, entry["seconds"], entry["items"], entry["calls"])
+
+  def as_dict(self):
+    return {name: {"calls": calls, "items": items, "seconds": seconds} for name, (calls, items, seconds) in self.ops.items()}
+
+  def server_timing(self) -> str:
+    """Render as a `Server-Timing` header value, durations in milliseconds"""
+
+    metrics = [
+      f'{name};dur={seconds * 1000:.3f};desc="{calls} calls, {items} items"'
+      for name, (calls, items, seconds) in sorted(self.ops.items(), key=lambda op: -op[1][2])
+    ]
+    if self.wall_s is not None:
+      metrics.insert(0, f"total;dur={self.wall_s * 1000:.3f}")
+    return ", ".join(metrics)
+
+class Instruments:
+  """Timers around hot-path functions, feeding process totals and per-request profiles.
+
+  Functions wrapped with `timed` only check `active` unless metrics are
+  enabled or a profile is open, so the disabled cost is one attribute read
+  per call. Totals are kept while `enabled`, profiles collect the calls made
+  in their own context, i.e. by the request that opened them.
+  """
+
+  def __init__(self, enabled=False):
+    self.enabled = enabled
+    self.active = enabled
+    self.totals = Timings()
+    self.open_profiles = 0
+    self._profile = ContextVar("instrument_profile", default=None)
+    self._lock = threading.Lock()
+
+  def timed(self, name, items=None):
+    """Decorator timing the calls of a function, `items` maps a call's result to its item count"""
+
+    def decorate(func):
+      @functools.wraps(func)
+      def wrapper(*args, **kwargs):
+        if not self.active:
+          return func(*args, **kwargs)
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.record(name, time.perf_counter() - start, items(result) if items else 1)
+        return result
+      return wrapper
+    return decorate
+
+  def record(self, name, seconds, items=1):
+    profile = self._profile.get()
+    if profile is not None:
+      profile.add(name, seconds, items)
+    if self.enabled:
+      with self._lock:
+        self.totals.add(name, seconds, items)
+
+  def absorb(self, ops: dict):
+    """Add timings measured in another process to the totals"""
+
+    if self.enabled and ops:
+      with self._lock:
+        self.totals.merge(ops)
+
+  def current(self) -> Timings:
+    """The profile open in this context, or None"""
+    return self._profile.get()
+
+  @contextmanager
+  def profile(self):
+    """Collect the instrumented calls made in this context into a fresh `Timings`"""
+
+    timings = Timings()
+    token = self._profile.set(timings)
+    with self._lock:
+      self.open_profiles += 1
+      self.active = True
+    start = time.perf_counter()
+    try:
+      yield timings
+    finally:
+      timings.wall_s = time.perf_counter() - start
+      self._profile.reset(token)
+      with self._lock:
+        self.open_profiles -= 1
+        self.active = self.enabled or self.open_profiles > 0
+
+  def snapshot(self):
+    with self._lock:
+      return self.totals.as_dict()
+
+INSTRUMENTS = Instruments(enabled=os.environ.get("SENTE_METRICS", "").lower() in ("1", "true", "yes"))
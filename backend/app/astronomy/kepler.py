@@ -0,0 +1,242 @@
+import math
+import numpy as np
+
+# Newton steps after the starter before the bracketed fallback, the series start needs up to five
+KEPLER_ITERATIONS = 5
+# Error in E accepted, estimated from the last Newton step, anything above continues on its bracket
+KEPLER_TOLERANCE = 1e-13
+# Safeguarded steps allowed for stragglers, each at least halves the bracket around M
+KEPLER_MAX_BISECTIONS = 64
+# Below this eccentricity the solvers start from a series instead of Markley's starter, which costs more than the extra Newton steps
+KEPLER_SERIES_ECCENTRICITY = 0.8
+# Widening of the bracket [M - e, M + e], whose ends can be the root itself (at E = -pi/2 or pi/2)
+KEPLER_BRACKET_MARGIN = 1e-3
+# Elements `solve_kepler_series` steps through at once, enough to amortize NumPy's overhead per call
+KEPLER_WARM_WIDTH = 8192
+# Consecutive timestamps each of its chains needs at least for warm starts to beat solving cold
+KEPLER_WARM_MIN_ROWS = 8
+# Largest last Newton step leaving an error within KEPLER_TOLERANCE at any eccentricity below KEPLER_SERIES_ECCENTRICITY
+KEPLER_SERIES_STEP = math.sqrt(2 * (1 - KEPLER_SERIES_ECCENTRICITY) * KEPLER_TOLERANCE / KEPLER_SERIES_ECCENTRICITY)
+
+class StepCounter:
+  """Running count of Newton steps taken per element by `solve_kepler`, read by the benchmarks"""
+
+  def __init__(self):
+    self.count = 0
+
+NEWTON_STEPS = StepCounter()
+
+def reduce_mean_anomaly(mean_anomaly):
+  """Reduce mean anomalies to [-pi, pi), where the starter and the bracket are valid.
+
+  The remainder is exact and so is the shift of the upper half, unlike adding
+  pi first, which rounds large anomalies once more.
+  """
+  reduced = np.remainder(np.asarray(mean_anomaly, dtype=np.float64), 2 * np.pi)
+  return np.where(reduced >= np.pi, reduced - 2 * np.pi, reduced)
+
+def markley_starter(eccentricity, mean_anomaly):
+  """Markley's (1995) cubic starter for M in [-pi, pi], within about 1e-4 rad for any e < 1"""
+
+  alpha = (3 * np.pi**2 + 1.6 * np.pi * (np.pi - np.abs(mean_anomaly)) / (1 + eccentricity)) / (np.pi**2 - 6)
+  d = 3 * (1 - eccentricity) + alpha * eccentricity
+  q = 2 * alpha * d * (1 - eccentricity) - mean_anomaly**2
+  r = 3 * alpha * d * (d - 1 + eccentricity) * mean_anomaly + mean_anomaly**3
+  w = np.cbrt(np.abs(r) + np.sqrt(q**3 + r**2)) ** 2
+  return (2 * r * w / (w**2 + w * q + q**2) + mean_anomaly) / d
+
+def safeguarded_newton(eccentricity, mean_anomaly, eccentric_anomaly, lower, upper):
+  """One Newton step per element, replaced by bisection when it leaves the bracket.
+
+  E - e sin E - M is increasing in E, so the sign of the residual tells
+  which side of the root the current E is on and the bracket only shrinks.
+  """
+
+  residual = eccentric_anomaly - eccentricity * np.sin(eccentric_anomaly) - mean_anomaly
+  lower = np.where(residual < 0, eccentric_anomaly, lower)
+  upper = np.where(residual > 0, eccentric_anomaly, upper)
+  step = eccentric_anomaly - residual / (1 - eccentricity * np.cos(eccentric_anomaly))
+  inside = (step >= lower) & (step <= upper)
+  return np.where(inside, step, (lower + upper) / 2), lower, upper
+
+def series_starter(eccentricity, mean_anomaly):
+  """Second-order series M + e sin M (1 + e cos M), within e^3 of the root"""
+  return mean_anomaly + eccentricity * np.sin(mean_anomaly) * (1 + eccentricity * np.cos(mean_anomaly))
+
+def solve_kepler(eccentricity, mean_anomaly, guess=None, iterations=KEPLER_ITERATIONS):
+  """Solve Kepler's equation E - e sin E = M for broadcastable arrays, e in [0, 1).
+
+  M is reduced to [-pi, pi) and the result lies in the same revolution. The
+  starting point is the series starter below KEPLER_SERIES_ECCENTRICITY and
+  Markley's starter above, or `guess` (e.g. the solution at the previous
+  timestamp) when given. Up to `iterations` Newton steps follow, stopping
+  once the error the last step leaves is within KEPLER_TOLERANCE
+  everywhere. Elements still above it continue on their bracket, so every
+  element converges.
+  """
+
+  eccentricity = np.asarray(eccentricity, dtype=np.float64)
+  mean_anomaly = reduce_mean_anomaly(mean_anomaly)
+  if eccentricity.shape != mean_anomaly.shape:
+    eccentricity, mean_anomaly = np.broadcast_arrays(eccentricity, mean_anomaly)
+  high = np.flatnonzero(eccentricity >= KEPLER_SERIES_ECCENTRICITY)
+  if guess is not None:
+    guess = np.broadcast_to(np.asarray(guess, dtype=np.float64), mean_anomaly.shape)
+    # Moved to the revolution of M, reducing the guess itself could put it a turn away near +-pi
+    eccentric_anomaly = guess + 2 * np.pi * np.round((mean_anomaly - guess) / (2 * np.pi))
+  else:
+    eccentric_anomaly = series_starter(eccentricity, mean_anomaly)
+    if high.size:
+      flat = eccentric_anomaly.reshape(-1)
+      flat[high] = markley_starter(eccentricity.reshape(-1)[high], mean_anomaly.reshape(-1)[high])
+
+  # The error bound e step^2 / (2 (1 - e cos E)) is within tolerance once |step| <= sqrt(2 (1 - e) tol / e)
+  if high.size:
+    with np.errstate(divide="ignore"):
+      step_limit = np.sqrt(2 * (1 - eccentricity) * KEPLER_TOLERANCE / eccentricity)
+  else:
+    step_limit = KEPLER_SERIES_STEP
+  converged = np.zeros(eccentric_anomaly.shape, dtype=bool)
+  for _ in range(iterations):
+    step = (eccentric_anomaly - eccentricity * np.sin(eccentric_anomaly) - mean_anomaly) / (1 - eccentricity * np.cos(eccentric_anomaly))
+    eccentric_anomaly = eccentric_anomaly - step
+    NEWTON_STEPS.count += eccentric_anomaly.size
+    # False for NaN, so a diverging step counts as not converged
+    converged = np.abs(step) <= step_limit
+    if converged.all():
+      return eccentric_anomaly
+
+  pending = np.flatnonzero(~converged)
+  flat = eccentric_anomaly.reshape(-1)
+  e, m = eccentricity.reshape(-1)[pending], mean_anomaly.reshape(-1)[pending]
+  # The root is within e of M, the margin keeps a Newton step that overshoots onto a bracket end from bisecting
+  lower, upper = m - e - KEPLER_BRACKET_MARGIN, m + e + KEPLER_BRACKET_MARGIN
+  E = np.clip(np.nan_to_num(flat[pending]), lower, upper)
+  for _ in range(KEPLER_MAX_BISECTIONS):
+    E, lower, upper = safeguarded_newton(e, m, E, lower, upper)
+    NEWTON_STEPS.count += E.size
+    if np.max(np.abs(E - e * np.sin(E) - m), initial=0.0) <= KEPLER_TOLERANCE:
+      break
+  flat[pending] = E
+  return eccentric_anomaly
+
+def eccentric_anomaly(eccentricity, mean_anomaly) -> float:
+  """Scalar `solve_kepler` on plain floats, for the per-body code paths.
+
+  Below KEPLER_SERIES_ECCENTRICITY the step bound is the one of the highest
+  eccentricity there, which saves computing it per call at the price of
+  rarely one more Newton step.
+  """
+
+  m = math.remainder(mean_anomaly, math.tau)
+  if eccentricity < KEPLER_SERIES_ECCENTRICITY:
+    E = m + eccentricity * math.sin(m) * (1 + eccentricity * math.cos(m))
+    step_limit = KEPLER_SERIES_STEP
+  else:
+    alpha = (3 * math.pi**2 + 1.6 * math.pi * (math.pi - abs(m)) / (1 + eccentricity)) / (math.pi**2 - 6)
+    d = 3 * (1 - eccentricity) + alpha * eccentricity
+    q = 2 * alpha * d * (1 - eccentricity) - m * m
+    r = 3 * alpha * d * (d - 1 + eccentricity) * m + m**3
+    w = (abs(r) + math.sqrt(q**3 + r * r)) ** (2 / 3)
+    E = (2 * r * w / (w * w + w * q + q * q) + m) / d
+    step_limit = math.sqrt(2 * (1 - eccentricity) * KEPLER_TOLERANCE / eccentricity)
+
+  for _ in range(KEPLER_ITERATIONS):
+    step = (E - eccentricity * math.sin(E) - m) / (1 - eccentricity * math.cos(E))
+    E -= step
+    if abs(step) <= step_limit:
+      return E
+
+  lower, upper = m - eccentricity - KEPLER_BRACKET_MARGIN, m + eccentricity + KEPLER_BRACKET_MARGIN
+  E = min(max(E, lower), upper) if math.isfinite(E) else m
+  for _ in range(KEPLER_MAX_BISECTIONS):
+    residual = E - eccentricity * math.sin(E) - m
+    if abs(residual) <= KEPLER_TOLERANCE:
+      break
+    if residual < 0:
+      lower = E
+    else:
+      upper = E
+    E -= residual / (1 - eccentricity * math.cos(E))
+    if not lower <= E <= upper:
+      E = (lower + upper) / 2
+  return E
+
+class WarmKepler:
+  """Kepler solver for a fixed set of orbits stepped through time, e.g. an animation.
+
+  Each call predicts E from the previous call's solution with dE/dM =
+  1 / (1 - e cos E) and finishes with one plain Newton step, about half the
+  work of `solve_kepler`. Elements whose step may leave an error above
+  KEPLER_TOLERANCE continue with `solve_kepler` from there, elements that
+  jumped over `max_jump` are solved cold. The eccentricities and every
+  call's mean anomalies have shape (N,).
+  """
+
+  def __init__(self, eccentricity, max_jump=0.5):
+    self.eccentricity = np.asarray(eccentricity, dtype=np.float64)
+    self.max_jump = max_jump
+    self.mean_anomaly = None
+    self.eccentric_anomaly = None
+    self.slope = None
+    self.warm = 0
+    self.cold = 0
+
+  def solve(self, mean_anomaly):
+    mean_anomaly = reduce_mean_anomaly(mean_anomaly)
+    previous = self.eccentric_anomaly
+    if previous is None or previous.shape != mean_anomaly.shape:
+      solution = solve_kepler(self.eccentricity, mean_anomaly)
+      slope = 1 - self.eccentricity * np.cos(solution)
+      self.cold += solution.size
+    else:
+      # Both anomalies are reduced, so the jump is the difference folded to one revolution
+      jump = reduce_mean_anomaly(mean_anomaly - self.mean_anomaly)
+      # The slope of the previous call's last Newton step is close enough for the prediction
+      solution = previous + jump / self.slope
+      # Keep E in the revolution of M, as solve_kepler does
+      solution = solution + 2 * np.pi * np.round((mean_anomaly - solution) / (2 * np.pi))
+      slope = 1 - self.eccentricity * np.cos(solution)
+      step = (solution - self.eccentricity * np.sin(solution) - mean_anomaly) / slope
+      solution = solution - step
+      NEWTON_STEPS.count += solution.size
+      # Error left by the Newton step, bounded by its quadratic term e step^2 / (2 (1 - e cos E)); False for NaN
+      settled = self.eccentricity * step * step / (2 * slope) <= KEPLER_TOLERANCE
+      far = np.abs(jump) > self.max_jump
+      refine = np.flatnonzero(~settled & ~far)
+      if refine.size:
+        solution[refine] = solve_kepler(self.eccentricity[refine], mean_anomaly[refine], guess=solution[refine])
+      cold = np.flatnonzero(far)
+      if cold.size:
+        solution[cold] = solve_kepler(self.eccentricity[cold], mean_anomaly[cold])
+      self.warm += solution.size - cold.size
+      self.cold += cold.size
+    self.mean_anomaly = mean_anomaly
+    self.eccentric_anomaly = solution
+    self.slope = slope
+    return solution
+
+def solve_kepler_series(eccentricity, mean_anomaly):
+  """`solve_kepler` for a (T, N) block of mean anomalies of N orbits at T consecutive timestamps.
+
+  The rows are split into chains of consecutive timestamps, stepped through
+  side by side with one `WarmKepler` so that each row starts from the
+  solution of the row before. Blocks too short for chains of
+  KEPLER_WARM_MIN_ROWS rows are solved cold.
+  """
+
+  mean_anomaly = np.asarray(mean_anomaly, dtype=np.float64)
+  rows, columns = mean_anomaly.shape
+  chains = -(-KEPLER_WARM_WIDTH // max(columns, 1))
+  if rows < chains * KEPLER_WARM_MIN_ROWS:
+    return solve_kepler(eccentricity, mean_anomaly)
+
+  length = -(-rows // chains)
+  # The last chain is padded with repeats of the last row
+  padded = np.concatenate([mean_anomaly, np.repeat(mean_anomaly[-1:], chains * length - rows, axis=0)])
+  blocks = padded.reshape(chains, length, columns)
+  solver = WarmKepler(np.broadcast_to(eccentricity, (chains, columns)).reshape(-1))
+  solution = np.empty_like(blocks)
+  for row in range(length):
+    solution[:, row] = solver.solve(blocks[:, row].reshape(-1)).reshape(chains, columns)
+  return solution.reshape(-1, columns)[:rows]
@@ -0,0 +1,50 @@
+import numpy as np
+from typing import List
+
+from .utils import AU_IN_METER
+
+class NeighborSelector:
+  """Chooses which bodies a search state expands to.
+
+  Bodies are ranked by distance from the state's body at the state's time,
+  and only the `k_nearest` bodies, the bodies within the vessel's reach on its
+  remaining delta-v and the destination are kept. Passing `k_nearest=None`
+  and `reachable=False` expands to every body.
+  """
+
+  def __init__(self, k_nearest=10, reachable=True):
+    self.k_nearest = k_nearest
+    self.reachable = reachable
+
+  def select(self, origin, origin_position, nodes: List, positions: np.ndarray, destination, reach_m) -> List:
+    """Return the nodes to expand to from `origin`.
+
+    `origin_position` and the (N, 3) `positions` of `nodes` are in AU at the
+    state's time, `reach_m` is how far the vessel can go on its remaining delta-v.
+    """
+
+    if self.k_nearest is None and not self.reachable:
+      return [node for node in nodes if node != origin]
+
+    origin_index = nodes.index(origin) if origin in nodes else None
+
+    distances = np.linalg.norm(positions - origin_position, axis=-1)
+    keep = np.zeros(len(nodes), dtype=bool)
+
+    if self.k_nearest:
+      # Sorted-radius index: the k closest bodies, not counting the origin itself
+      k = min(self.k_nearest + (origin_index is not None), len(nodes))
+      keep[np.argpartition(distances, k - 1)[:k]] = True
+
+    if self.reachable:
+      keep |= distances * AU_IN_METER <= reach_m
+
+    if origin_index is not None:
+      keep[origin_index] = False
+
+    selected = [node for node, kept in zip(nodes, keep.tolist()) if kept]
+    if destination != origin and destination not in selected:
+      selected.append(destination)
+    return selected
+
+EXPAND_ALL = NeighborSelector(k_nearest=None, reachable=False)
@@ -2,7 +2,8 @@ from enum import Enum
 from typing import List
 import math
 from . import utils
-from .utils import calculate_coordinate_relative_to_primary, move_towards
+from .utils import OrbitConstants
+from .ephemeris import Ephemeris
 
 AU_IN_METER = 1.496e11
 AU_IN_KM = 149597870.7
@@ -32,6 +33,10 @@ class AstronomicalBody:
   
   def safe_range(self):
     raise NotImplementedError()
+  
+  def radial_offset_au(self):
+    """Distance this object sits towards the star from its nominal orbit"""
+    return 0.0
     
 class Star(AstronomicalBody):
   """Represents a star"""
@@ -78,47 +83,30 @@ class LagrangePointObject():
     self.longitude_of_ascending_node = longitude_of_ascending_node
     self.argument_of_periapsis = argument_of_periapsis
     self.mean_anomaly = mean_anomaly
+    self.orbit = OrbitConstants.from_elements(
+      semimajor_axis_au * AU_IN_METER,
+      eccentricity,
+      inclination,
+      longitude_of_ascending_node,
+      argument_of_periapsis,
+      mean_anomaly,
+      primary_object.mass_kg
+    )
     
   def position_at_time(self, timestamp_second):
     """Return the coordinate of this object relative to the star"""
-    
-    coordinates = calculate_coordinate_relative_to_primary(
-        self.semimajor_axis_au * AU_IN_METER,
-        self.eccentricity,
-        self.inclination,
-        self.longitude_of_ascending_node,
-        self.argument_of_periapsis,
-        self.mean_anomaly,
-        self.primary_object.mass_kg,
-        timestamp_second
-    )
+    return EPHEMERIS.position_of(self, timestamp_second)
+  
+  def radial_offset_au(self):
+    """Distance this object sits towards the star from its nominal orbit"""
     
     if self.type in (LagrangePoint.L3, LagrangePoint.L4, LagrangePoint.L5):
-      offset = 0
-    else:
-      offset = self.size_km if self.type == LagrangePoint.L1 else -self.size_km
-    
-    offset *= KM_IN_AU 
-      
-    if isinstance(self.primary_object, Star):
-      coordinates = move_towards(coordinates, (0, 0, 0), offset)
-      return coordinates 
-    elif isinstance(self.primary_object.primary_object, Star):
-      x, y, z = self.primary_object.position_at_time(timestamp_second)
-      rel_x, rel_y, rel_z = coordinates
-      new_coordinates = move_towards((x + rel_x, y + rel_y, z + rel_z), (0, 0, 0), offset)
-      return new_coordinates
-    else:
-      raise Exception("Invalid top-level primary object: Not a star")
+      return 0.0
+    offset = self.size_km if self.type == LagrangePoint.L1 else -self.size_km
+    return offset * KM_IN_AU
     
   def true_anomaly_at_time(self, timestamp):
-    mu = G * self.primary_object.mass_kg
-    mean_motion = utils.compute_mean_motion(mu, self.semimajor_axis_au * AU_IN_METER)
-    mean_anomaly = utils.compute_mean_anomaly_at_time(self.mean_anomaly, mean_motion, timestamp)
-    eccentric_anomaly = utils.compute_eccentric_anomaly(self.eccentricity, mean_anomaly)
-    true_anomaly = utils.compute_true_anomaly(self.eccentricity, eccentric_anomaly)
-    
-    return true_anomaly
+    return utils.true_anomaly_from_constants(self.orbit, timestamp)
   
   def safe_range(self):
     return None
@@ -149,6 +137,15 @@ class BasePlanet(AstronomicalBody):
     self.longitude_of_ascending_node = longitude_of_ascending_node
     self.argument_of_periapsis = argument_of_periapsis
     self.mean_anomaly = mean_anomaly
+    self.orbit = OrbitConstants.from_elements(
+      semimajor_axis_au * AU_IN_METER,
+      eccentricity,
+      inclination,
+      longitude_of_ascending_node,
+      argument_of_periapsis,
+      mean_anomaly,
+      primary_object.mass_kg
+    )
     
   def get_lagrange_points(self) -> List[LagrangePointObject]:
     """Return a list of lagrange points of this object"""
@@ -174,37 +171,17 @@ class BasePlanet(AstronomicalBody):
   def get_orbital_period(self):
     """The orbital period in days"""
 
-    mass_primary = self.primary_object.mass_kg
-    a_m = self.semimajor_axis_au * AU_IN_METER
-    
-    orbital_period_seconds = 2 * math.pi * math.sqrt((a_m**3) / (G * mass_primary))
+    orbital_period_seconds = 2 * math.pi / self.orbit.mean_motion
     ortbial_period_days = orbital_period_seconds / (24 * 3600)
     
     return ortbial_period_days
   
   def position_at_time(self, timestamp_second):
     """Return the coordinate of this object relative to the star"""
-    
-    coordinates = calculate_coordinate_relative_to_primary(
-        self.semimajor_axis_au * AU_IN_METER,
-        self.eccentricity,
-        self.inclination,
-        self.longitude_of_ascending_node,
-        self.argument_of_periapsis,
-        self.mean_anomaly,
-        self.primary_object.mass_kg,
-        timestamp_second
-    )
-    return coordinates 
+    return EPHEMERIS.position_of(self, timestamp_second)
   
   def true_anomaly_at_time(self, timestamp):
-    mu = G * self.primary_object.mass_kg
-    mean_motion = utils.compute_mean_motion(mu, self.semimajor_axis_au * AU_IN_METER)
-    mean_anomaly = utils.compute_mean_anomaly_at_time(self.mean_anomaly, mean_motion, timestamp)
-    eccentric_anomaly = utils.compute_eccentric_anomaly(self.eccentricity, mean_anomaly)
-    true_anomaly = utils.compute_true_anomaly(self.eccentricity, eccentric_anomaly)
-    
-    return true_anomaly
+    return utils.true_anomaly_from_constants(self.orbit, timestamp)
   
   def safe_range(self):
     if self.radius_km is None:
@@ -231,25 +208,6 @@ class Moon(BasePlanet):
   def __init__(self, name, radius_km, mass_kg, semimajor_axis_km, axial_tilt, eccentricity, inclination, longitude_of_ascending_node, argument_of_periapsis, mean_anomaly, primary_object: Planet):
     super().__init__(name, radius_km, mass_kg, semimajor_axis_km * KM_IN_AU, axial_tilt, eccentricity, inclination, longitude_of_ascending_node, argument_of_periapsis, mean_anomaly, primary_object)
  
-  def position_at_time(self, timestamp_second):
-    """Return the coordinate of this object relative to the star"""
-    
-    coordinates = calculate_coordinate_relative_to_primary(
-        self.semimajor_axis_au * AU_IN_METER,
-        self.eccentricity,
-        self.inclination,
-        self.longitude_of_ascending_node,
-        self.argument_of_periapsis,
-        self.mean_anomaly,
-        self.primary_object.mass_kg,
-        timestamp_second
-    )
-    
-    x, y, z = self.primary_object.position_at_time(timestamp_second)
-    rel_x, rel_y, rel_z = coordinates
-    
-    return (x + rel_x, y + rel_y, z + rel_z) 
-  
   def current_phase(self, timestamp):
     """Calculate the phase fraction of this moon"""
     
@@ -357,4 +315,6 @@ for planet in PLANETS.values():
     LAGRANGE_POINTS[f"{name}-{point.type.name}"] = point
   
   
-ALL_OBJECTS = {**PLANETS, **DWARF_PLANETS, **MOONS, **LAGRANGE_POINTS}
\ No newline at end of file
+ALL_OBJECTS = {**PLANETS, **DWARF_PLANETS, **MOONS, **LAGRANGE_POINTS}
+
+EPHEMERIS = Ephemeris(ALL_OBJECTS.values())
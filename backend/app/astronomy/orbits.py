@@ -0,0 +1,144 @@
+import hashlib
+import os
+import tempfile
+import threading
+import numpy as np
+
+from .ephemeris import Ephemeris, anomaly_positions
+from .objects import EPHEMERIS
+
+# Largest distance between an orbit and its polyline, relative to the semimajor axis, per level of detail
+ORBIT_LODS = {"low": 1e-3, "medium": 1e-4, "high": 1e-5}
+# Points per orbit, the first point is repeated at the end to close the path
+ORBIT_MIN_POINTS = 16
+ORBIT_MAX_POINTS = 8192
+# Eccentric anomalies the point density is integrated over
+ORBIT_GRID = 4096
+# Directory of the generated orbit shapes, shared by every process on the machine
+ORBIT_DIR = os.path.join(tempfile.gettempdir(), "sente-orbits")
+
+def sample_anomalies(semimajor_axis, semiminor_axis, tolerance) -> list:
+  """Eccentric anomalies along each orbit, spaced so every chord stays within `tolerance` of its arc.
+
+  A chord of length L across an arc of curvature k deviates by about
+  k L^2 / 8 from it, so the points per unit length must be sqrt(k / (8 tol)).
+  On the ellipse (a cos E, b sin E) with r(E) = sqrt(a^2 sin^2 E + b^2 cos^2 E),
+  ds/dE = r and k = a b / r^3, which makes the points per unit of E
+  sqrt(a b / (8 tol r)): dense at the apsides of eccentric orbits, where
+  the curvature peaks, and uniform on circular ones.
+  """
+
+  grid = np.linspace(0, 2 * np.pi, ORBIT_GRID + 1)
+  a, b = semimajor_axis[:, None], semiminor_axis[:, None]
+  r = np.sqrt((a * np.sin(grid))**2 + (b * np.cos(grid))**2)
+  density = np.sqrt(a * b / (8 * tolerance[:, None] * r))
+  cumulative = np.concatenate(
+    (np.zeros((len(a), 1)), np.cumsum((density[:, 1:] + density[:, :-1]) / 2 * np.diff(grid), axis=1)),
+    axis=1
+  )
+
+  anomalies = []
+  for row in cumulative:
+    count = int(np.clip(np.ceil(row[-1]), ORBIT_MIN_POINTS, ORBIT_MAX_POINTS))
+    # Closed path: count intervals, so the last point is E = 2 pi, the first point again
+    anomalies.append(np.interp(np.linspace(0, row[-1], count + 1), row, grid))
+  return anomalies
+
+class OrbitPaths:
+  """One full revolution of every catalog body as a polyline, per level of detail.
+
+  Shapes are sampled relative to each body's parent from the eccentric
+  anomaly, so no Kepler equation is solved, and only depend on the orbital
+  elements. They are generated once per level of detail, written to
+  `directory` and memory-mapped like the ephemeris tables. `paths` places
+  them around the parents' positions at a timestamp.
+  """
+
+  def __init__(self, ephemeris: Ephemeris, lods=ORBIT_LODS, directory=ORBIT_DIR):
+    self.ephemeris = ephemeris
+    self.lods = lods
+    self.directory = directory
+
+    fingerprint = hashlib.sha1()
+    for array in (ephemeris.semimajor_axis_m, ephemeris.semiminor_axis_m, ephemeris.eccentricity, ephemeris.rotation):
+      fingerprint.update(np.ascontiguousarray(array).tobytes())
+    fingerprint.update(f"{ORBIT_MIN_POINTS}:{ORBIT_MAX_POINTS}:{ORBIT_GRID}".encode())
+    self.key = fingerprint.hexdigest()[:16]
+
+    # lod -> (counts, relative positions)
+    self.loaded = {}
+    self.builds = 0
+    self.loads = 0
+    self._lock = threading.Lock()
+
+  def path_names(self, lod):
+    name = os.path.join(self.directory, f"orbits-{self.key}-{lod}-{self.lods[lod]:g}")
+    return name + ".npy", name + ".counts.npy"
+
+  def shapes(self, lod):
+    """Return (counts, relative) for `lod`, the (K, 3) relative positions grouped by body in ephemeris order"""
+
+    shapes = self.loaded.get(lod)
+    if shapes is not None:
+      return shapes
+    with self._lock:
+      shapes = self.loaded.get(lod)
+      if shapes is None:
+        shapes = self.loaded[lod] = self.load(lod)
+    return shapes
+
+  def load(self, lod):
+    points_path, counts_path = self.path_names(lod)
+    if not os.path.exists(counts_path):
+      self.save(lod, *self.build(lod))
+      self.builds += 1
+    self.loads += 1
+    return np.load(counts_path), np.load(points_path, mmap_mode="r")
+
+  def save(self, lod, counts, relative):
+    """Write the shapes so that a process seeing the counts file always finds complete points"""
+
+    os.makedirs(self.directory, exist_ok=True)
+    for path, array in zip(self.path_names(lod), (relative, counts)):
+      temporary = f"{path}.{os.getpid()}.tmp"
+      with open(temporary, "wb") as f:
+        np.save(f, array)
+      os.replace(temporary, path)
+
+  def build(self, lod):
+    ephemeris = self.ephemeris
+    anomalies = sample_anomalies(ephemeris.semimajor_axis_m, ephemeris.semiminor_axis_m, self.lods[lod] * ephemeris.semimajor_axis_m)
+    counts = np.array([len(anomaly) for anomaly in anomalies], dtype=np.int64)
+    bodies = np.repeat(np.arange(len(ephemeris)), counts)
+    relative = anomaly_positions(
+      ephemeris.semimajor_axis_m[bodies],
+      ephemeris.semiminor_axis_m[bodies],
+      ephemeris.eccentricity[bodies],
+      ephemeris.rotation[bodies],
+      np.concatenate(anomalies)
+    )
+    return counts, relative
+
+  def paths(self, lod, positions, indices=None):
+    """Return (counts, points) for bodies `indices` (default all, in ephemeris order), placed around their parents.
+
+    `positions` is the (N, 3) catalog at the time the paths are drawn at.
+    """
+
+    counts, relative = self.shapes(lod)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    if indices is None:
+      indices = np.arange(len(self.ephemeris))
+    indices = np.asarray(indices, dtype=np.intp)
+    rows = np.concatenate([np.arange(offsets[i], offsets[i] + counts[i]) for i in indices])
+    bodies = np.repeat(indices, counts[indices])
+    return counts[indices], self.ephemeris.place(bodies, relative[rows], positions)
+
+  def stats(self):
+    return {
+      **{f"points_{lod}": int(counts.sum()) for lod, (counts, _) in self.loaded.items()},
+      "builds": self.builds,
+      "loads": self.loads,
+    }
+
+ORBIT_PATHS = OrbitPaths(EPHEMERIS)
@@ -1,14 +1,50 @@
-from .objects import AstronomicalBody, LagrangePointObject, Star, STAR, ALL_OBJECTS
+from .objects import AstronomicalBody, ALL_OBJECTS, EPHEMERIS
 from .vessels import Vessel
-from .utils import distance_at_time, g_to_ms2, distance_point_to_segment, linear_distance
+from .utils import distance_at_time, g_to_ms2, G_IN_MS2
+from .edge_cache import EdgeCache, SHARED_EDGE_CACHE
+from .collision import CLEARANCE, ClearanceChecker
+from .neighbors import NeighborSelector
+from .heuristics import HeuristicTable, radial_envelopes
+from .replanning import REPLAN_MAX_SHIFT_S, REPLAN_FRONTIER
+from .dominance import ParetoLabels, ParetoFront
+from .instrumentation import INSTRUMENTS
+from .trace import SearchTrace, SEEDED, REACHED, GAVE_UP, DEADLINE, LEG
 
+from collections import deque
 import math
 import numpy as np
+import os
+import tempfile
 from typing import List, Tuple
 import heapq
+import time
 
 MAX_ACCEL_G = 0.8
 AU_IN_METER = 1.496e11
+
+MAX_ITERATIONS = 500
+# Seconds between progress reports of a search with a progress callback
+PROGRESS_INTERVAL_S = 0.5
+# Summary lines kept in the search log, expansions go to the optional SearchTrace
+SEARCH_LOG_ENTRIES = 256
+# Arrival times within one bucket count as simultaneous when comparing states
+TIME_BUCKET_S = 3600.0
+# States kept in the open set, the most expensive quarter is dropped when it overflows
+MAX_OPEN_STATES = 20000
+
+# Multi-objective search: labels kept per body, routes returned and expansions allowed
+PARETO_LABELS_PER_BODY = 8
+PARETO_MAX_ROUTES = 16
+PARETO_MAX_EXPANSIONS = 1000
+
+ENVELOPES = radial_envelopes(EPHEMERIS)
+
+# Departure offsets, as fractions of the estimated time since launch, that later legs are speculatively solved for
+SPECULATIVE_OFFSETS = (-0.1, -0.05, 0.0, 0.05, 0.1)
+
+# Heap operations on the open set, timed when instruments are active
+heappush = INSTRUMENTS.timed("heap_push")(heapq.heappush)
+heappop = INSTRUMENTS.timed("heap_pop")(heapq.heappop)
   
 class Policy:
   def __init__(
@@ -37,21 +73,51 @@ class Policy:
     )
     
     return cost
+  
+  def evaluate_arrays(self, profiles):
+    """Vectorized `evaluate` over the dict of arrays returned by `travel_profiles`"""
+    
+    cost = (
+      (self.time_weight * ((profiles["burn_time"] + profiles["coast_time"]) / 1000)) +
+      (self.cost_weight * profiles["dv_cost"] / 1000) + 
+      (self.comfort_weight * (MAX_ACCEL_G - profiles["accel_g"]) * 1000) +
+      (self.comfort_weight * profiles["coast_time"] / 3600)
+    )
+    
+    if self.disable_coast:
+      cost = np.where(profiles["coast_time"] > 0, np.inf, cost)
+    return cost
     
 class NodeState:
-  def __init__(self, position: AstronomicalBody, timestamp, dv_remaining, path_history):
+  __slots__ = ("position", "timestamp", "dv_remaining", "node", "cost_so_far", "heuristic", "total_cost", "label")
+  
+  def __init__(self, position: AstronomicalBody, timestamp, dv_remaining, node=-1):
     self.position = position
     self.timestamp = timestamp
     self.dv_remaining = dv_remaining
-    self.path_history = path_history
+    # Index of the last hop in the PathArena, -1 at the origin
+    self.node = node
     self.cost_so_far = 0.0
     self.heuristic = 0.0
     self.total_cost = 0.0
+    self.label = None
     
   def __lt__(self, other):
     return self.total_cost < other.total_cost
     
+class ParetoState(NodeState):
+  """Search state of the multi-objective mode, tracking delta-v spent and the peak acceleration so far"""
+  
+  __slots__ = ("dv_spent", "peak_accel_g")
+  
+  def __init__(self, position: AstronomicalBody, timestamp, dv_remaining, node=-1, dv_spent=0.0, peak_accel_g=0.0):
+    super().__init__(position, timestamp, dv_remaining, node)
+    self.dv_spent = dv_spent
+    self.peak_accel_g = peak_accel_g
+    
 class Profile:
+  __slots__ = ("burn_time", "coast_time", "dv_cost", "dv_to_refuel", "accel_g", "v_peak", "distance_traveled", "total_time")
+  
   def __init__(self, burn_time, coast_time, dv_cost, dv_to_refuel, accel_g, v_peak, distance_traveled):
     self.burn_time = burn_time
     self.coast_time = coast_time
@@ -63,15 +129,222 @@ class Profile:
     
     self.total_time = burn_time + coast_time
     
+PROFILE_FIELDS = ("burn_time", "coast_time", "dv_cost", "dv_to_refuel", "accel_g", "v_peak", "distance_traveled")
+ARENA_DTYPE = np.dtype([("parent", np.int32), ("body", np.int32)] + [(field, np.float64) for field in PROFILE_FIELDS])
+
+class PathArena:
+  """Parent-pointer storage for every hop generated during a search.
+  
+  Each hop is one record of a structured array holding its parent hop, the
+  body it arrives at (an ephemeris index) and its profile, so a state only
+  carries an integer and paths are rebuilt once the goal is reached.
+  """
+  
+  def __init__(self, capacity=32):
+    self.records = np.empty(capacity, dtype=ARENA_DTYPE)
+    self.size = 0
+    
+  def __len__(self):
+    return self.size
+    
+  def clear(self):
+    self.size = 0
+    
+  def add(self, parent, body: AstronomicalBody, profile: Profile) -> int:
+    if self.size == len(self.records):
+      self.records = np.resize(self.records, 2 * len(self.records))
+    index = self.size
+    self.records[index] = (
+      parent,
+      EPHEMERIS.index[body.name],
+      profile.burn_time,
+      profile.coast_time,
+      profile.dv_cost,
+      profile.dv_to_refuel,
+      profile.accel_g,
+      profile.v_peak,
+      profile.distance_traveled
+    )
+    self.size += 1
+    return index
+  
+  def chain(self, node):
+    """Return the arena indices from the first hop to `node`"""
+    
+    indices = []
+    while node >= 0:
+      indices.append(node)
+      node = int(self.records["parent"][node])
+    indices.reverse()
+    return indices
+  
+  def body_names(self, node):
+    return tuple(EPHEMERIS.names[body] for body in self.records["body"][self.chain(node)].tolist())
+    
+  def path(self, node) -> List[Tuple[Profile, AstronomicalBody]]:
+    """Rebuild the (Profile, body) hops leading to `node`"""
+    
+    records = self.records[self.chain(node)]
+    columns = [records[field].tolist() for field in PROFILE_FIELDS]
+    bodies = [EPHEMERIS.bodies[body] for body in records["body"].tolist()]
+    return [(Profile(*fields), body) for fields, body in zip(zip(*columns), bodies)]
+    
+# Candidate legs assuming the vessel refuels at the origin:
+# (acceleration factor, delta-v fraction, force no coast, force acceleration)
+REFUEL_PROFILES = [
+  (1.0, 1.0, True, True),
+  (1.0, 1.0, True, False),
+  (1.0, 1.0, False, False),
+  (1.0, 0.9, False, False),
+  (1.0, 0.8, False, False),
+  (1.0, 0.7, False, False),
+  (1.0, 0.6, False, False),
+  (1.0, 0.5, False, False),
+  (0.9, 1.0, False, False),
+  (0.8, 1.0, False, False),
+  (0.7, 1.0, False, False),
+  (0.6, 1.0, False, False),
+  (0.5, 1.0, False, False),
+]
+
+def travel_profiles(vessel: Vessel, distance_m, accel_g, max_dv, force_no_coast=False, force_accel=False, step=0.01):
+  """Vectorized closed form of `PathFinder.compute_travel_time`.
+  
+  All arguments broadcast against each other. Returns a dict of arrays with
+  the `Profile` fields plus a `valid` mask for entries that have no profile.
+  """
+  
+  distance_m, accel_g, max_dv, force_no_coast, force_accel = np.broadcast_arrays(
+    np.asarray(distance_m, dtype=np.float64),
+    np.asarray(accel_g, dtype=np.float64),
+    np.asarray(max_dv, dtype=np.float64),
+    np.asarray(force_no_coast, dtype=bool),
+    np.asarray(force_accel, dtype=bool)
+  )
+  
+  # Vessel.max_distance_at falls back to the full delta-v when given zero
+  dv = np.where(max_dv != 0, max_dv, vessel.delta_v)
+  positive = distance_m > 0
+  safe_distance = np.where(positive, distance_m, 1.0)
+  
+  coasting = distance_m > dv**2 / (4 * g_to_ms2(accel_g))
+  lower = force_no_coast & ~force_accel & coasting
+  
+  # Largest acceleration on the step grid whose burn covers the distance: d = dv^2 / (4a)
+  limit_g = dv**2 / (4 * G_IN_MS2 * safe_distance)
+  lowered = accel_g - np.ceil((accel_g - limit_g) / step) * step
+  lowered = np.where(safe_distance > dv**2 / (4 * g_to_ms2(np.maximum(lowered, step))), lowered - step, lowered)
+  accel = np.where(lower, lowered, accel_g)
+  
+  valid = positive & (accel_g >= step) & (accel >= step) & ~(force_no_coast & force_accel & coasting)
+  accel = np.where(valid, accel, step)
+  
+  accel_ms2 = g_to_ms2(accel)
+  max_distance = dv**2 / (4 * accel_ms2)
+  distance_to_coast = np.maximum(0, safe_distance - max_distance)
+  distance_to_accel = safe_distance - distance_to_coast
+  valid &= distance_to_accel > 0
+  distance_to_accel = np.where(valid, distance_to_accel, safe_distance)
+  accel_time = np.sqrt(distance_to_accel / accel_ms2)
+  v_peak = accel_ms2 * accel_time
+  dv_cost = v_peak * 2
+  
+  return {
+    "valid": valid,
+    "burn_time": 2 * accel_time,
+    "coast_time": distance_to_coast / v_peak,
+    "dv_cost": dv_cost,
+    "dv_to_refuel": max_dv - dv_cost,
+    "accel_g": accel,
+    "v_peak": v_peak,
+    "distance_traveled": distance_m,
+  }
+
+def profiles_from_arrays(arrays) -> List['Profile']:
+  """Turn the output of `travel_profiles` into `Profile` objects, None where invalid"""
+  
+  columns = zip(
+    arrays["burn_time"].tolist(),
+    arrays["coast_time"].tolist(),
+    arrays["dv_cost"].tolist(),
+    arrays["dv_to_refuel"].tolist(),
+    arrays["accel_g"].tolist(),
+    arrays["v_peak"].tolist(),
+    arrays["distance_traveled"].tolist(),
+  )
+  return [Profile(*fields) if valid else None for valid, fields in zip(arrays["valid"].tolist(), columns)]
     
 class PathFinder:
-  def __init__(self, vessel: Vessel, policy: Policy, nodes: List[AstronomicalBody] = ALL_OBJECTS.values()):
+  def __init__(
+    self,
+    vessel: Vessel,
+    policy: Policy,
+    nodes: List[AstronomicalBody] = ALL_OBJECTS.values(),
+    edge_cache: EdgeCache = None,
+    clearance: ClearanceChecker = CLEARANCE,
+    collision_samples=1,
+    neighbor_selector: NeighborSelector = None,
+    heuristic="direct",
+    deadline=None,
+    leg_executor=None,
+    seeds=None,
+    time_bucket_s=TIME_BUCKET_S,
+    max_open=MAX_OPEN_STATES,
+    max_iterations=MAX_ITERATIONS,
+    trace: SearchTrace = None,
+    progress=None,
+    progress_interval_s=PROGRESS_INTERVAL_S
+  ):
     self.vessel = vessel
     self.policy = policy
-    self.nodes = nodes
+    self.nodes = list(nodes)
+    self.node_indices = [EPHEMERIS.index[node.name] for node in self.nodes]
     self.max_accel_g = min(MAX_ACCEL_G, self.vessel.max_acceleration())
     
-    self.search_log = []
+    # Legs only depend on the vessel, policy weights are applied after lookup
+    self.edge_cache = edge_cache if edge_cache is not None else EdgeCache()
+    self.fingerprint = (self.vessel.delta_v, self.vessel.mass_t, self.vessel.thrust_n, collision_samples)
+    
+    self.clearance = clearance
+    self.collision_samples = collision_samples
+    self.neighbor_selector = neighbor_selector if neighbor_selector is not None else NeighborSelector()
+    self.stats = {"expansions": 0, "neighbors_considered": 0, "neighbors_expanded": 0, "profiles": 0, "dominated": 0, "superseded": 0, "evicted": 0}
+    
+    # Time-expanded lattice: states at a body are compared on arrival bucket, cost and delta-v
+    self.time_bucket_s = time_bucket_s
+    self.max_open = max_open
+    self.max_iterations = max_iterations
+    self.labels: ParetoLabels = None
+    self.arena = PathArena()
+    
+    # "table" uses the precomputed admissible bound, "direct" the travel time of the current straight line
+    self.heuristic = heuristic
+    self.heuristic_table: HeuristicTable = None
+    
+    # Wall clock time (time.time()) after which the search gives up
+    self.deadline = deadline
+    self.timed_out = False
+    
+    # Called with a progress_snapshot every progress_interval_s, the search stops when it returns True
+    self.progress = progress
+    self.progress_interval_s = progress_interval_s
+    self.stopped = False
+    
+    # Cheapest complete route queued so far, returned when the search is cut short
+    self.best_goal: NodeState = None
+    self.interrupted = False
+    
+    # Executor for solving the legs of mandatory-stop routes in parallel, see find_path_for_waypoints_speculative
+    self.leg_executor = leg_executor
+    
+    # Frontiers of earlier searches to seed from, and the frontiers of this one, see replanning.SessionTrees
+    self.seeds = seeds or []
+    self.frontiers = []
+    self.incumbent_cost = math.inf
+    
+    self.search_log = deque(maxlen=SEARCH_LOG_ENTRIES)
+    # Structured per-expansion records, off unless a trace is given
+    self.trace = trace
     self.launch_time = None
     self.origin: AstronomicalBody = None
     self.full_path: List[Tuple[Profile, AstronomicalBody]] = []
@@ -89,43 +362,75 @@ class PathFinder:
     
     if strict_order:
       waypoints = [origin] + mandatory_stops + [destination]
+      if self.leg_executor is not None and len(waypoints) > 2:
+        return self.find_path_for_waypoints_speculative(waypoints, launch_time)
       return self.find_path_for_waypoints(waypoints, launch_time)
     
+    if self.heuristic == "table":
+      self.heuristic_table = HeuristicTable(EPHEMERIS, destination, self.policy, self.max_accel_g, MAX_ACCEL_G, ENVELOPES, launch_time)
+    
     start_state = NodeState(
       position=origin,
       timestamp=launch_time,
-      dv_remaining=self.vessel.delta_v,
-      path_history=[]
+      dv_remaining=self.vessel.delta_v
     )
     
+    self.labels = ParetoLabels(self.time_bucket_s)
+    self.arena.clear()
+    self.incumbent_cost = math.inf
+    self.best_goal = None
+    
     open_set = []
-    heapq.heappush(open_set, (0, start_state))
+    self.push_state(open_set, start_state, destination)
+    self.push_seeds(open_set, origin, destination, launch_time)
     
-    visited = set()
-    best_cost = {}
-    MAX_ITER = 500
     iterations = 0
+    started_at = time.time()
+    next_report = started_at + self.progress_interval_s
     
-    while open_set and iterations < MAX_ITER:
+    while open_set and iterations < self.max_iterations:
+      if self.deadline is not None and time.time() > self.deadline:
+        self.timed_out = True
+        self.search_log.append(f"Deadline reached after {iterations} iterations")
+        if self.trace is not None:
+          self.trace.record(DEADLINE, None, open_size=len(open_set))
+        break
+      
       iterations += 1
-      current_cost, current_state = heapq.heappop(open_set)
-      state_key = (current_state.position.name, round(current_state.timestamp))
+      current_cost, current_state = heappop(open_set)
       
-      if state_key in visited:
+      # Dominated by a state found after this one was queued
+      if not current_state.label.alive:
         continue
       
-      log_entry = f"Expanded {current_state.position.name} at time {current_state.timestamp:.1f}, cost_so_far {current_state.cost_so_far:.1f}"
-      self.search_log.append(log_entry)
+      if self.progress is not None and time.time() >= next_report:
+        next_report = time.time() + self.progress_interval_s
+        if self.progress(self.progress_snapshot(origin, destination, current_state, open_set, started_at)):
+          self.stopped = True
+          self.search_log.append(f"Stopped after {iterations} iterations")
+          break
       
       if current_state.position == destination:
-        self.full_path = current_state.path_history
-        return current_state.path_history
+        self.search_log.append(f"Reached {destination.name} at time {current_state.timestamp:.1f}, cost_so_far {current_state.cost_so_far:.1f}")
+        if self.trace is not None:
+          self.trace.record(REACHED, destination.name, current_state.node, current_state.timestamp, current_state.cost_so_far, 0.0, len(open_set))
+        self.log_pruning_summary()
+        path = self.arena.path(current_state.node)
+        self.record_frontier(origin, destination, launch_time, open_set, current_state)
+        self.full_path = path
+        return path
       
-      for neighbor in self.nodes:
-        if neighbor == current_state.position:
-          continue
-        
-        profiles = self.generate_candidate_profiles(current_state, neighbor)
+      neighbors = self.select_neighbors(current_state, destination)
+      self.stats["expansions"] += 1
+      self.stats["neighbors_considered"] += len(self.nodes) - (current_state.position in self.nodes)
+      self.stats["neighbors_expanded"] += len(neighbors)
+      if self.trace is not None:
+        self.trace.expansion(current_state, len(open_set))
+      
+      legs = self.expand_legs(current_state.position, neighbors, current_state.timestamp)
+      
+      for neighbor, leg in zip(neighbors, legs):
+        profiles = self.candidate_profiles(current_state, leg)
         profiles = [p for p in profiles if p is not None]
         
         if not profiles:
@@ -135,34 +440,245 @@ class PathFinder:
           
           profile_cost = self.policy.evaluate(profile)
           
+          # Costs only grow along a path, so nothing past a seeded complete path can beat it
+          if current_state.cost_so_far + profile_cost >= self.incumbent_cost:
+            continue
+          
           arrival_time = current_state.timestamp + profile.total_time
           new_dv_remaining = current_state.dv_remaining - profile.dv_cost
           
           if new_dv_remaining < 0:
             new_dv_remaining = self.vessel.delta_v
             
-          new_path_history = list(current_state.path_history)
-          new_path_history.append((profile, neighbor))
-          
           next_state = NodeState(
             position=neighbor,
             timestamp=arrival_time,
-            dv_remaining=new_dv_remaining,
-            path_history=new_path_history
+            dv_remaining=new_dv_remaining
           )
           
           next_state.cost_so_far = current_state.cost_so_far + profile_cost
-          next_state.heuristic = self.estimate_heuristic(next_state, destination)
-          next_state.total_cost = next_state.cost_so_far + next_state.heuristic
+          if self.push_state(open_set, next_state, destination):
+            # Only states that make it into the open set get an arena record
+            next_state.node = self.arena.add(current_state.node, neighbor, profile)
+        
+    if iterations >= self.max_iterations:
+      self.search_log.append(f"Gave up after {iterations} iterations")
+      if self.trace is not None:
+        self.trace.record(GAVE_UP, None, open_size=len(open_set))
+    self.log_pruning_summary()
+    self.record_frontier(origin, destination, launch_time, open_set, self.best_goal)
+    if self.best_goal is None:
+      return None
+    
+    # Anytime result: not proven cheapest, but the best route seen before the search was cut short
+    self.interrupted = True
+    self.search_log.append(f"Returning the best route found, cost_so_far {self.best_goal.cost_so_far:.1f}")
+    path = self.arena.path(self.best_goal.node)
+    self.full_path = path
+    return path
+  
+  def find_pareto_routes(self, origin: AstronomicalBody, destination: AstronomicalBody, launch_time, max_routes=PARETO_MAX_ROUTES, labels_per_body=PARETO_LABELS_PER_BODY, max_expansions=PARETO_MAX_EXPANSIONS):
+    """Return the Pareto set of routes trading off travel time, delta-v spent and peak acceleration.
+    
+    Every body keeps a bounded front of non-dominated labels (time, delta-v
+    spent, peak acceleration, delta-v remaining) instead of a single best
+    cost, and labels are expanded in arrival time order. Labels that cannot
+    beat a route already found at the destination are pruned. Returns a list
+    of paths, fastest first.
+    """
+    
+    self.launch_time = launch_time
+    self.origin = origin
+    self.arena.clear()
+    
+    # Grid used for dominance: the lattice time bucket, 1% of the vessel delta-v and 0.01 g
+    dv_step = max(self.vessel.delta_v * 0.01, 1.0)
+    resolution = (self.time_bucket_s, dv_step, 0.01, dv_step)
+    fronts = {}
+    routes = ParetoFront(resolution[:3], max_routes)
+    
+    start_state = ParetoState(position=origin, timestamp=launch_time, dv_remaining=self.vessel.delta_v)
+    open_set = [(launch_time, 0, start_state)]
+    counter = 1
+    
+    while open_set and self.stats["expansions"] < max_expansions:
+      if self.deadline is not None and time.time() > self.deadline:
+        self.timed_out = True
+        break
+      
+      _, _, state = heappop(open_set)
+      if state.node >= 0 and not fronts[state.position.name].contains(state):
+        continue
+      
+      neighbors = self.select_neighbors(state, destination)
+      self.stats["expansions"] += 1
+      self.stats["neighbors_considered"] += len(self.nodes) - (state.position in self.nodes)
+      self.stats["neighbors_expanded"] += len(neighbors)
+      if self.trace is not None:
+        self.trace.expansion(state, len(open_set))
+      
+      legs = self.expand_legs(state.position, neighbors, state.timestamp)
+      for neighbor, leg in zip(neighbors, legs):
+        for profile in self.candidate_profiles(state, leg):
+          if profile is None or (self.policy.disable_coast and profile.coast_time > 0):
+            continue
+          
+          dv_remaining = state.dv_remaining - profile.dv_cost
+          if dv_remaining < 0:
+            dv_remaining = self.vessel.delta_v
           
-          next_key = (neighbor.name, round(arrival_time))
-          if next_key in best_cost and next_state.total_cost >= best_cost[next_key]:
+          next_state = ParetoState(
+            position=neighbor,
+            timestamp=state.timestamp + profile.total_time,
+            dv_remaining=dv_remaining,
+            dv_spent=state.dv_spent + profile.dv_cost,
+            peak_accel_g=max(state.peak_accel_g, profile.accel_g)
+          )
+          objectives = (next_state.timestamp - launch_time, next_state.dv_spent, next_state.peak_accel_g)
+          
+          # Objectives only grow along a route, so anything a found route dominates is done
+          if routes.dominated(objectives):
+            self.stats["dominated"] += 1
             continue
-          best_cost[next_key] = next_state.total_cost
           
-          heapq.heappush(open_set, (next_state.total_cost, next_state))
-        
-    return None
+          if neighbor == destination:
+            next_state.node = self.arena.add(state.node, neighbor, profile)
+            routes.insert(objectives, next_state)
+            continue
+          
+          front = fronts.setdefault(neighbor.name, ParetoFront(resolution, labels_per_body))
+          if not front.insert(objectives + (-dv_remaining,), next_state):
+            self.stats["dominated"] += 1
+            continue
+          
+          next_state.node = self.arena.add(state.node, neighbor, profile)
+          heappush(open_set, (next_state.timestamp, counter, next_state))
+          counter += 1
+    
+    self.log_pruning_summary()
+    self.search_log.append(f"Pareto search found {len(routes)} routes")
+    
+    ordered = sorted(routes, key=lambda entry: entry[1])
+    paths = [self.arena.path(state.node) for _, _, state in ordered]
+    self.full_path = paths[0] if paths else []
+    return paths
+  
+  def push_state(self, open_set, state: NodeState, destination: AstronomicalBody):
+    """Queue `state` unless a state already seen at its body dominates it"""
+    
+    label = self.labels.insert(state.position.name, state.timestamp, state.cost_so_far, state.dv_remaining)
+    if label is None:
+      self.stats["dominated"] += 1
+      return False
+    
+    state.label = label
+    state.heuristic = self.estimate_heuristic(state, destination)
+    state.total_cost = state.cost_so_far + state.heuristic
+    heappush(open_set, (state.total_cost, state))
+    
+    # Nothing costing more than a queued complete route can lead to a cheaper one
+    if state.position == destination and state.cost_so_far < self.incumbent_cost:
+      self.incumbent_cost = state.cost_so_far
+      self.best_goal = state
+    
+    if len(open_set) > self.max_open:
+      self.trim_open_set(open_set)
+    return True
+  
+  def trim_open_set(self, open_set):
+    """Drop the most expensive quarter of the open set and forget their labels"""
+    
+    keep = self.max_open * 3 // 4
+    ordered = sorted(open_set)
+    for _, state in ordered[keep:]:
+      self.labels.remove(state.position.name, state.label)
+    self.stats["evicted"] += len(ordered) - keep
+    open_set[:] = ordered[:keep]
+  
+  def push_seeds(self, open_set, origin: AstronomicalBody, destination: AstronomicalBody, launch_time):
+    """Push the re-timed and re-costed states of a previous search of this leg onto `open_set`.
+    
+    Only frontiers of the same leg and vessel, searched for a launch time
+    within REPLAN_MAX_SHIFT_S, are used. The search itself is unchanged, so a
+    seed that is still the cheapest path is simply popped first.
+    """
+    
+    fingerprint = list(self.fingerprint)
+    seeded = 0
+    for frontier in self.seeds:
+      if (frontier["origin"], frontier["destination"]) != (origin.name, destination.name):
+        continue
+      if list(frontier["fingerprint"]) != fingerprint or abs(frontier["departure"] - launch_time) > REPLAN_MAX_SHIFT_S:
+        continue
+      
+      for hops in frontier["paths"]:
+        state = self.retime_state(origin, hops, launch_time)
+        if state is None or not math.isfinite(state.cost_so_far):
+          continue
+        if not self.push_state(open_set, state, destination):
+          continue
+        seeded += 1
+        if self.trace is not None:
+          self.trace.record(SEEDED, state.position.name, state.node, state.timestamp, state.cost_so_far, state.heuristic, len(open_set))
+    
+    self.stats["seeded"] = self.stats.get("seeded", 0) + seeded
+    if seeded:
+      self.search_log.append(f"Seeded {seeded} states from a previous search")
+  
+  def record_frontier(self, origin: AstronomicalBody, destination: AstronomicalBody, launch_time, open_set, goal: NodeState):
+    """Keep the found path and the cheapest open states as body names for a later re-plan"""
+    
+    states = [state for _, state in heapq.nsmallest(REPLAN_FRONTIER, open_set) if state.node >= 0]
+    if goal is not None:
+      states.insert(0, goal)
+    paths = [self.arena.body_names(state.node) for state in states]
+    
+    self.frontiers.append({
+      "origin": origin.name,
+      "destination": destination.name,
+      "departure": launch_time,
+      "fingerprint": list(self.fingerprint),
+      "paths": list(dict.fromkeys(paths)),
+    })
+  
+  def progress_snapshot(self, origin: AstronomicalBody, destination: AstronomicalBody, state: NodeState, open_set, started_at):
+    """Summary of a running search: the partial path being expanded, the cost bound and the best route so far.
+    
+    `bound` is the estimated total cost of the state being expanded, the
+    lowest in the open set, so with an admissible heuristic no route can be
+    cheaper than it.
+    """
+    
+    return {
+      "origin": origin.name,
+      "destination": destination.name,
+      "elapsed_s": time.time() - started_at,
+      "bound": state.total_cost,
+      "partial_path": [origin.name, *self.arena.body_names(state.node)],
+      "best_cost": self.best_goal.cost_so_far if self.best_goal is not None else None,
+      "best_path": [origin.name, *self.arena.body_names(self.best_goal.node)] if self.best_goal is not None else None,
+      "open_size": len(open_set),
+      "stats": dict(self.stats),
+    }
+  
+  def select_neighbors(self, state: NodeState, destination: AstronomicalBody):
+    """Return the bodies to expand `state` to, as chosen by the neighbor selector"""
+    
+    origin = state.position
+    positions = EPHEMERIS.positions_paired([EPHEMERIS.index[origin.name]] + self.node_indices, state.timestamp)
+    reach_m = self.vessel.max_distance_at(self.max_accel_g, state.dv_remaining)
+    
+    return self.neighbor_selector.select(origin, positions[0], self.nodes, positions[1:], destination, reach_m)
+  
+  def log_pruning_summary(self):
+    considered = self.stats["neighbors_considered"]
+    expanded = self.stats["neighbors_expanded"]
+    pruned = 1 - expanded / considered if considered else 0.0
+    self.stats["superseded"] += self.labels.superseded if self.labels is not None else 0
+    self.search_log.append(
+      f"Pruning: {self.stats['expansions']} expansions, {expanded}/{considered} neighbors expanded ({pruned:.0%} pruned), "
+      f"{self.stats['dominated']} states dominated, {self.stats['superseded']} superseded, {self.stats['evicted']} evicted"
+    )
 
   def find_path_for_waypoints(self, waypoints: List[AstronomicalBody], launch_time):
     full_path = []
@@ -172,7 +688,9 @@ class PathFinder:
     for next_target in waypoints[1:]:
       leg_path = self.find_path(current_origin, next_target, current_time)
       if not leg_path:
-        full_path = None
+        self.full_path = []
+        self.origin = waypoints[0]
+        return None
       full_path.extend(leg_path)
       current_origin = next_target
       current_time += sum(profile.total_time for profile, _ in leg_path)
@@ -181,54 +699,230 @@ class PathFinder:
     self.origin = waypoints[0]
     return full_path
         
-  def generate_candidate_profiles(self, state: NodeState, target: AstronomicalBody):
-    profiles = []
+  def find_path_for_waypoints_speculative(self, waypoints: List[AstronomicalBody], launch_time):
+    """Solve the legs of a strict-order route in parallel on `self.leg_executor`.
     
-    timestamp = state.timestamp
-    origin = state.position
-    distance_to_target, arrival_time = self.estimate_arrival(origin, target, timestamp)
+    Every later leg is solved for a small grid of departures around its
+    estimated departure time. The legs are then stitched in order using the
+    real arrival times: the candidate closest to the real departure is re-timed
+    along its hops, and the leg is solved again only if no candidate is close
+    enough or re-timing fails.
+    """
+    
+    self.origin = waypoints[0]
+    self.full_path = []
+    self.stats["speculative_hits"] = 0
+    self.stats["speculative_misses"] = 0
+    legs = list(zip(waypoints[:-1], waypoints[1:]))
+    
+    # Legs mostly fly straight at full acceleration, so the fastest direct profile is the best guess of their length
+    estimated = [launch_time]
+    for origin, target in legs[:-1]:
+      distance, arrival_time = self.estimate_arrival(origin, target, estimated[-1])
+      profile = self.compute_travel_time(distance, self.max_accel_g)
+      estimated.append(estimated[-1] + profile.total_time if profile is not None else arrival_time)
+    
+    candidates = []
+    tolerances = []
+    for (origin, target), departure in zip(legs, estimated):
+      elapsed = departure - launch_time
+      departures = sorted({departure + offset * elapsed for offset in SPECULATIVE_OFFSETS})
+      spacing = min(np.diff(departures), default=0.0)
+      candidates.append([(t, self.submit_leg(origin, target, t)) for t in departures])
+      tolerances.append(spacing / 2)
+    
+    full_path = []
+    current_time = launch_time
+    for (origin, target), leg_candidates, tolerance in zip(legs, candidates, tolerances):
+      leg_path = None
+      for departure, future in sorted(leg_candidates, key=lambda candidate: abs(candidate[0] - current_time)):
+        if abs(departure - current_time) > tolerance:
+          break
+        hops = future.result()
+        if hops:
+          leg_path = self.retime_hops(origin, hops, current_time)
+        if leg_path:
+          break
+      
+      if leg_path:
+        self.stats["speculative_hits"] += 1
+      else:
+        self.stats["speculative_misses"] += 1
+        hops = self.submit_leg(origin, target, current_time).result()
+        leg_path = self.retime_hops(origin, hops, current_time) if hops else None
+      
+      self.search_log.append(f"Leg {origin.name} -> {target.name} at time {current_time:.1f}: {'solved' if leg_path else 'no path'}")
+      if self.trace is not None:
+        self.trace.record(LEG, target.name, timestamp=current_time, cost=sum(self.policy.evaluate(profile) for profile, _ in leg_path) if leg_path else math.inf)
+      if not leg_path:
+        for leg_candidates in candidates:
+          for _, future in leg_candidates:
+            future.cancel()
+        return None
+      
+      full_path.extend(leg_path)
+      current_time += sum(profile.total_time for profile, _ in leg_path)
+    
+    self.full_path = full_path
+    return full_path
+  
+  def submit_leg(self, origin: AstronomicalBody, target: AstronomicalBody, departure_time):
+    vessel_args = (self.vessel.delta_v, self.vessel.mass_t, self.vessel.thrust_n)
+    policy_args = (self.policy.time_weight, self.policy.cost_weight, self.policy.comfort_weight, self.policy.disable_coast)
+    return self.leg_executor.submit(solve_leg, vessel_args, policy_args, self.heuristic, origin.name, target.name, departure_time, self.deadline)
+  
+  def retime_hops(self, origin: AstronomicalBody, hops, departure_time):
+    """Re-evaluate a leg's sequence of (profile, body name) hops for another departure time.
     
-    if not self.validate_path(origin, target, timestamp, arrival_time):
-      return profiles
+    Every hop takes its cheapest profile at the new time. Returns the leg as
+    (Profile, body) pairs, or None if a hop is no longer possible.
+    """
     
-    dv_remaining = state.dv_remaining
-    max_dv = self.vessel.delta_v
+    self.arena.clear()
+    state = self.retime_state(origin, [name for _, name in hops], departure_time)
+    return self.arena.path(state.node) if state is not None else None
   
-    # Try make the trip without refueling
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g, max_dv=dv_remaining))
+  def retime_state(self, origin: AstronomicalBody, names, departure_time):
+    """Follow a sequence of body names from `origin` at `departure_time`, taking the cheapest profile per hop.
+    
+    Returns the final search state, with `cost_so_far` under the current
+    policy, or None if a hop is no longer possible.
+    """
     
-    # Assuming refueling
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g, force_no_coast=True, force_accel=True))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g, force_no_coast=True))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g))
+    state = NodeState(position=origin, timestamp=departure_time, dv_remaining=self.vessel.delta_v)
+    for name in names:
+      body = ALL_OBJECTS[name]
+      leg = self.expand_legs(state.position, [body], state.timestamp)[0]
+      profiles = [p for p in self.candidate_profiles(state, leg) if p is not None]
+      if not profiles:
+        return None
       
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g, max_dv=0.9 * max_dv))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g, max_dv=0.8 * max_dv))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g, max_dv=0.7 * max_dv))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g, max_dv=0.6 * max_dv))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g, max_dv=0.5 * max_dv))
-    
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g * 0.9))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g * 0.8))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g * 0.7))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g * 0.6))
-    profiles.append(self.compute_travel_time(distance_to_target, self.max_accel_g * 0.5))
+      profile = min(profiles, key=self.policy.evaluate)
+      dv_remaining = state.dv_remaining - profile.dv_cost
+      if dv_remaining < 0:
+        dv_remaining = self.vessel.delta_v
+      
+      cost_so_far = state.cost_so_far + self.policy.evaluate(profile)
+      state = NodeState(
+        position=body,
+        timestamp=state.timestamp + profile.total_time,
+        dv_remaining=dv_remaining,
+        node=self.arena.add(state.node, body, profile)
+      )
+      state.cost_so_far = cost_so_far
+    return state
+        
+  def generate_candidate_profiles(self, state: NodeState, target: AstronomicalBody):
+    leg = self.expand_legs(state.position, [target], state.timestamp)[0]
+    return self.candidate_profiles(state, leg)
+  
+  def candidate_profiles(self, state: NodeState, leg):
+    distance_to_target, valid, refuel_profiles = leg
+    if not valid:
+      return []
+    
+    # Try make the trip without refueling
+    profiles = [self.compute_travel_time(distance_to_target, self.max_accel_g, max_dv=state.dv_remaining)]
+    profiles.extend(refuel_profiles)
+    self.stats["profiles"] += len(profiles)
     
     return profiles
   
+  def expand_legs(self, origin: AstronomicalBody, targets: List[AstronomicalBody], timestamp):
+    """Return the leg to every target, computing all edge cache misses together"""
+    
+    keys = [self.edge_cache.key(origin, target, timestamp, self.fingerprint) for target in targets]
+    legs = [self.edge_cache.get(key) for key in keys]
+    
+    missing = [i for i, leg in enumerate(legs) if leg is None]
+    if missing:
+      computed = self.compute_legs(origin, [targets[i] for i in missing], timestamp)
+      for i, leg in zip(missing, computed):
+        legs[i] = leg
+        self.edge_cache.put(keys[i], leg)
+    
+    return legs
+  
+  def compute_leg(self, origin: AstronomicalBody, target: AstronomicalBody, timestamp):
+    """Return the distance, validity and the profiles of a leg that do not depend on the remaining delta-v"""
+    return self.compute_legs(origin, [target], timestamp)[0]
+  
+  @INSTRUMENTS.timed("legs")
+  def compute_legs(self, origin: AstronomicalBody, targets: List[AstronomicalBody], timestamp):
+    """Batch version of `compute_leg` for many targets from the same origin and time"""
+    
+    distances, arrival_times, origin_position, target_positions = self.estimate_arrivals(origin, targets, timestamp)
+    valid = self.clearance.clear(
+      origin.name,
+      origin_position,
+      [target.name for target in targets],
+      target_positions,
+      timestamp,
+      arrival_times,
+      self.collision_samples
+    )
+    
+    # Assuming refueling, every candidate of every target in one vectorized call
+    arrays = self.refuel_profile_arrays(distances)
+    profiles = profiles_from_arrays({key: value.reshape(-1) for key, value in arrays.items()})
+    candidates = len(REFUEL_PROFILES)
+    
+    legs = []
+    for i, (distance_to_target, leg_valid) in enumerate(zip(distances.tolist(), valid.tolist())):
+      if not leg_valid:
+        legs.append((distance_to_target, False, []))
+        continue
+      legs.append((distance_to_target, True, profiles[i * candidates:(i + 1) * candidates]))
+    
+    return legs
+  
+  def refuel_profile_arrays(self, distances_m):
+    """Evaluate every refuel candidate for an array of leg distances in one vectorized call.
+    
+    Returns the `travel_profiles` arrays with shape distances.shape + (len(REFUEL_PROFILES),).
+    """
+    
+    factors, fractions, no_coast, force_accel = (np.array(column) for column in zip(*REFUEL_PROFILES))
+    return travel_profiles(
+      self.vessel,
+      np.asarray(distances_m, dtype=np.float64)[..., None],
+      self.max_accel_g * factors,
+      self.vessel.delta_v * fractions,
+      no_coast,
+      force_accel
+    )
+  
   def estimate_arrival(self, origin: AstronomicalBody, target: AstronomicalBody, timestamp):
-    static_distance = distance_at_time(origin, target, timestamp)
-    fast_profile = self.compute_travel_time(static_distance, self.max_accel_g)
-    slow_profile = self.compute_travel_time(static_distance, 0.05, max_dv=0.3*self.vessel.delta_v)
-    average_travel_time = np.average([fast_profile.total_time, slow_profile.total_time])
+    distances, arrival_times, _, _ = self.estimate_arrivals(origin, [target], timestamp)
+    return float(distances[0]), float(arrival_times[0])
+  
+  def estimate_arrivals(self, origin: AstronomicalBody, targets: List[AstronomicalBody], timestamp):
+    """Estimate the arrival time and distance to many targets at once.
+    
+    Returns the distances in meters, the arrival times, the origin position and
+    the (K, 3) target positions at arrival in AU.
+    """
+    
+    indices = [EPHEMERIS.index[origin.name]] + [EPHEMERIS.index[target.name] for target in targets]
+    current_positions = EPHEMERIS.positions_paired(indices, timestamp)
+    origin_position = current_positions[0]
+    
+    static_distances = np.linalg.norm(current_positions[1:] - origin_position, axis=-1) * AU_IN_METER
+    fast = travel_profiles(self.vessel, static_distances, self.max_accel_g, self.vessel.delta_v)
+    slow = travel_profiles(self.vessel, static_distances, 0.05, 0.3 * self.vessel.delta_v)
+    average_travel_time = ((fast["burn_time"] + fast["coast_time"]) + (slow["burn_time"] + slow["coast_time"])) / 2
     
-    arrival_time = timestamp + average_travel_time
-    new_target_pos = target.position_at_time(arrival_time)
-    new_distance = linear_distance(origin.position_at_time(timestamp), new_target_pos) * AU_IN_METER
+    arrival_times = timestamp + average_travel_time
+    target_positions = EPHEMERIS.positions_paired(indices[1:], arrival_times)
+    new_distances = np.linalg.norm(target_positions - origin_position, axis=-1) * AU_IN_METER
     
-    return new_distance, arrival_time
+    return new_distances, arrival_times, origin_position, target_positions
     
+  @INSTRUMENTS.timed("heuristic")
   def estimate_heuristic(self, state: NodeState, destination: AstronomicalBody):
+    if self.heuristic == "table" and self.heuristic_table is not None and self.heuristic_table.destination == destination:
+      return self.heuristic_table.lookup(state.position, state.timestamp)
+    
     current_node = state.position
     direct_distance = distance_at_time(current_node, destination, state.timestamp)
     pseudo_profile = self.compute_travel_time(direct_distance, self.max_accel_g) 
@@ -238,86 +932,74 @@ class PathFinder:
     
     return self.policy.evaluate(pseudo_profile)
   
+  @INSTRUMENTS.timed("validate_path")
   def validate_path(self, origin: AstronomicalBody, target: AstronomicalBody, departure_time, arrival_time):
-    valid = True
-    
-    midpoint_time = (departure_time + arrival_time) / 2
-    
-    all_objects = list(ALL_OBJECTS.values())
-    all_objects.append(STAR)
-    
     origin_pos = origin.position_at_time(departure_time)
     target_pos = target.position_at_time(arrival_time)
     
-    for body in all_objects:
-      if isinstance(body, LagrangePointObject):
-        continue
-      
-      if body in (origin, target):
-        continue
-    
-      body_pos = body.position_at_time(midpoint_time)
-      min_distance = distance_point_to_segment(body_pos, origin_pos, target_pos) * AU_IN_METER
-      
-      safe_distance = body.safe_range()
-      if safe_distance is None:
-        continue
-      if min_distance < safe_distance:
-        valid = False
-        break
-    return valid
+    valid = self.clearance.clear(
+      origin.name,
+      origin_pos,
+      [target.name],
+      target_pos,
+      departure_time,
+      [arrival_time],
+      self.collision_samples
+    )
+    return bool(valid[0])
         
+  @INSTRUMENTS.timed("travel_time")
   def compute_travel_time(self, distance_m, accel_g, force_no_coast=False, force_accel=False, max_dv=None, step=0.01):
+    """Return the brachistochrone profile for a distance, or None if there is none.
+    
+    With `force_no_coast`, the acceleration is lowered in `step` increments to
+    the largest value whose burn covers the whole distance, solved in closed
+    form from d = dv^2 / (4a).
+    """
+    
     if max_dv is None:
       max_dv = self.vessel.delta_v
       
-    while accel_g >= step:
-      # loops acceleration until minimum allowed
-      try:
-        max_distance = self.vessel.max_distance_at(accel_g, max_dv)
-        distance_to_coast = max(0, distance_m - max_distance)
-        distance_to_accel = distance_m - distance_to_coast
-        need_coasting = distance_to_coast > 0
-      
-        if distance_to_accel <= 0:
-          # max_distance is way too small
-          break
-        
-        accel_time = math.sqrt((2 * (distance_to_accel / 2)) / g_to_ms2(accel_g))
-        v_peak = g_to_ms2(accel_g) * accel_time
-        dv_cost = v_peak * 2
-        dv_to_refuel = max_dv - dv_cost
-        burn_time = 2 * accel_time
-      
-        if need_coasting:
-          if force_no_coast:
-            # force no coasting, try lower acceleration
-            if force_accel or accel_g <= step:
-              # can't lower acceleration or acceleration too small
-              break
-            accel_g -= step
-            # lower and recompute
-            continue
-          # calculate coast time
-          coast_time = distance_to_coast / v_peak
-          return Profile(burn_time, coast_time, dv_cost, dv_to_refuel, accel_g, v_peak, distance_m)
-        else:
-          # no coasting
-          coast_time = 0.0
-          return Profile(burn_time, coast_time, dv_cost, dv_to_refuel, accel_g, v_peak, distance_m)
-      
-      except Exception as e:
-        print(f"Failed to calculate path: {e}")
-        break
-      
-    return None
+    if accel_g < step or distance_m <= 0:
+      return None
+    
+    dv = max_dv if max_dv else self.vessel.delta_v
+    max_distance = self.vessel.max_distance_at(accel_g, max_dv)
+    
+    if distance_m > max_distance and force_no_coast:
+      if force_accel:
+        return None
+      limit_g = dv**2 / (4 * G_IN_MS2 * distance_m)
+      accel_g -= math.ceil((accel_g - limit_g) / step) * step
+      if accel_g >= step and distance_m > self.vessel.max_distance_at(accel_g, max_dv):
+        accel_g -= step
+      if accel_g < step:
+        return None
+      max_distance = self.vessel.max_distance_at(accel_g, max_dv)
+    
+    distance_to_coast = max(0, distance_m - max_distance)
+    distance_to_accel = distance_m - distance_to_coast
+    if distance_to_accel <= 0:
+      # max_distance is way too small
+      return None
+    
+    accel_time = math.sqrt(distance_to_accel / g_to_ms2(accel_g))
+    v_peak = g_to_ms2(accel_g) * accel_time
+    dv_cost = v_peak * 2
+    dv_to_refuel = max_dv - dv_cost
+    burn_time = 2 * accel_time
+    coast_time = distance_to_coast / v_peak
+    
+    return Profile(burn_time, coast_time, dv_cost, dv_to_refuel, accel_g, v_peak, distance_m)
   
   def print_search_log(self):
     print("\n=== Search Log ===")
     for entry in self.search_log:
         print(entry)
         
-  def save_search_log(self, filename="./data/search_log.txt"):
+  def save_search_log(self, filename=None):
+    if filename is None:
+      filename = os.path.join(tempfile.gettempdir(), "search_log.txt")
     try:
       with open(filename, 'w', encoding='utf-8') as f:
         for log in self.search_log:
@@ -338,8 +1020,10 @@ class PathFinder:
       print(f"Delta-V Cost: {profile.dv_cost / 1000:.1f} km/s")
       print(f"Acceleration: {profile.accel_g:.2f} g")
       
-  def parse_path(self):
-    if not self.full_path:
+  def parse_path(self, path=None):
+    if path is None:
+      path = self.full_path
+    if not path:
       return {"error": "No path found"}
     
     legs = []
@@ -348,7 +1032,7 @@ class PathFinder:
     total_cost = 0.0
     total_accel = 0.0
     
-    for idx, (profile, body) in enumerate(self.full_path, 1):
+    for idx, (profile, body) in enumerate(path, 1):
       leg_info = {
           "leg_number": idx,
           "destination": body.name,
@@ -378,5 +1062,38 @@ class PathFinder:
       "origin": self.origin.name,
       "launch_time": self.launch_time,
       "legs": legs,
-      "summary": summary
-    }
\ No newline at end of file
+      "summary": summary,
+      "interrupted": self.interrupted
+    }
+
+  def parse_pareto_routes(self, paths):
+    routes = []
+    for path in paths:
+      route = self.parse_path(path)
+      route["summary"]["peak_acceleration_g"] = max(profile.accel_g for profile, _ in path)
+      routes.append(route)
+    
+    return {
+      "origin": self.origin.name,
+      "launch_time": self.launch_time,
+      "routes": routes
+    }
+
+def solve_leg(vessel_args, policy_args, heuristic, origin_name, target_name, departure_time, deadline=None):
+  """Search a single leg, run as an executor task by the speculative waypoint mode.
+  
+  Takes and returns only plain values so it can run in another process, the
+  leg comes back as (Profile, body name) pairs or None if no path was found.
+  """
+  
+  pathfinder = PathFinder(
+    Vessel(*vessel_args),
+    Policy(*policy_args),
+    edge_cache=SHARED_EDGE_CACHE,
+    heuristic=heuristic,
+    deadline=deadline
+  )
+  path = pathfinder.find_path(ALL_OBJECTS[origin_name], ALL_OBJECTS[target_name], departure_time)
+  if not path:
+    return None
+  return [(profile, body.name) for profile, body in path]
@@ -0,0 +1,118 @@
+import numpy as np
+
+from .objects import AstronomicalBody, EPHEMERIS
+from .vessels import Vessel
+from .utils import g_to_ms2, AU_IN_METER
+from .collision import CLEARANCE
+from .pathfinder import Policy, MAX_ACCEL_G
+
+def timed_profiles(distance_m, time_of_flight_s, accel_g, max_dv):
+  """Cheapest brachistochrone profile that covers a distance in a fixed time.
+
+  The vessel burns at `accel_g`, coasts, and brakes just in time to arrive
+  after `time_of_flight_s`. With the accel phase lasting t, d = a t (T - t),
+  and the smallest root gives the least delta-v. At the shortest feasible
+  time of flight this is the profile `PathFinder.compute_travel_time` returns.
+  Returns the same dict of arrays as `travel_profiles`.
+  """
+
+  distance_m, time_of_flight_s = np.broadcast_arrays(
+    np.asarray(distance_m, dtype=np.float64),
+    np.asarray(time_of_flight_s, dtype=np.float64)
+  )
+  accel_ms2 = g_to_ms2(accel_g)
+
+  discriminant = time_of_flight_s**2 - 4 * distance_m / accel_ms2
+  valid = (distance_m > 0) & (time_of_flight_s > 0) & (discriminant >= 0)
+  accel_time = (time_of_flight_s - np.sqrt(np.where(valid, discriminant, 0.0))) / 2
+
+  v_peak = accel_ms2 * accel_time
+  dv_cost = 2 * v_peak
+  valid &= dv_cost <= max_dv * (1 + 1e-12)
+
+  return {
+    "valid": valid,
+    "burn_time": 2 * accel_time,
+    "coast_time": time_of_flight_s - 2 * accel_time,
+    "dv_cost": dv_cost,
+    "dv_to_refuel": max_dv - dv_cost,
+    "accel_g": np.full(distance_m.shape, accel_g),
+    "v_peak": v_peak,
+    "distance_traveled": distance_m,
+  }
+
+def porkchop_scan(vessel: Vessel, policy: Policy, origin: AstronomicalBody, destination: AstronomicalBody, departures, times_of_flight):
+  """Evaluate the policy cost of a direct leg over a departure x time-of-flight grid.
+
+  Positions for the whole grid come from one vectorized ephemeris call per
+  body. Returns a dict with the (D, F) `cost` matrix, inf where the vessel
+  cannot make the leg, and the matching `dv_cost` and `distance_au` grids.
+  """
+
+  departures = np.asarray(departures, dtype=np.float64)
+  times_of_flight = np.asarray(times_of_flight, dtype=np.float64)
+  arrivals = departures[:, None] + times_of_flight[None, :]
+
+  origin_positions = EPHEMERIS.positions_over(departures, [origin.name])[:, 0]
+  target_positions = EPHEMERIS.positions_over(arrivals.ravel(), [destination.name])[:, 0].reshape(arrivals.shape + (3,))
+  distance_au = np.linalg.norm(target_positions - origin_positions[:, None], axis=-1)
+
+  accel_g = min(MAX_ACCEL_G, vessel.max_acceleration())
+  profiles = timed_profiles(distance_au * AU_IN_METER, times_of_flight[None, :], accel_g, vessel.delta_v)
+  cost = np.where(profiles["valid"], policy.evaluate_arrays(profiles), np.inf)
+
+  return {
+    "departures": departures,
+    "times_of_flight": times_of_flight,
+    "cost": cost,
+    "dv_cost": np.where(profiles["valid"], profiles["dv_cost"], np.nan),
+    "distance_au": distance_au,
+    "origin_positions": origin_positions,
+    "target_positions": target_positions,
+  }
+
+def best_windows(scan, count=5, origin: AstronomicalBody = None, destination: AstronomicalBody = None):
+  """Return up to `count` launch windows, cheapest first.
+
+  A window is a local minimum of the best cost per departure, taken at its
+  best time of flight. With the two bodies given, windows whose straight
+  line passes too close to another body are dropped.
+  """
+
+  cost = scan["cost"]
+  best_tof = np.argmin(cost, axis=1)
+  best_cost = cost[np.arange(cost.shape[0]), best_tof]
+
+  padded = np.concatenate(([np.inf], best_cost, [np.inf]))
+  minima = np.flatnonzero((best_cost <= padded[:-2]) & (best_cost < padded[2:]) & np.isfinite(best_cost))
+  minima = minima[np.argsort(best_cost[minima], kind="stable")]
+
+  windows = []
+  for d in minima.tolist():
+    f = int(best_tof[d])
+    departure = float(scan["departures"][d])
+    arrival = departure + float(scan["times_of_flight"][f])
+
+    if origin is not None and destination is not None:
+      clear = CLEARANCE.clear(
+        origin.name,
+        scan["origin_positions"][d],
+        [destination.name],
+        scan["target_positions"][d, f][None, :],
+        departure,
+        [arrival]
+      )
+      if not clear[0]:
+        continue
+
+    windows.append({
+      "departure": departure,
+      "time_of_flight": float(scan["times_of_flight"][f]),
+      "arrival": arrival,
+      "cost": float(cost[d, f]),
+      "dv_cost": float(scan["dv_cost"][d, f]),
+      "distance_au": float(scan["distance_au"][d, f]),
+    })
+    if len(windows) >= count:
+      break
+  return windows
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+import sys
+import threading
+
+# Largest launch time shift, in seconds, for which a previous search tree is reused
+REPLAN_MAX_SHIFT_S = 7 * 86400
+# Open states kept per search, besides the path that was found
+REPLAN_FRONTIER = 32
+
+def frontier_size(frontiers) -> int:
+  """Rough memory footprint of a list of frontiers in bytes"""
+
+  size = sys.getsizeof(frontiers)
+  for frontier in frontiers:
+    size += sys.getsizeof(frontier) + sys.getsizeof(frontier["paths"])
+    size += sum(sys.getsizeof(hops) for hops in frontier["paths"])
+  return size
+
+class SessionTrees:
+  """LRU of the latest search frontiers per planning session, bounded by memory.
+
+  A frontier records, for one searched leg, the hop sequences of the path that
+  was found and of the cheapest open states, as body names. `PathFinder` seeds
+  the next search of the same leg with them, re-timed and re-costed.
+  """
+
+  def __init__(self, max_sessions=1024, max_bytes=32 * 1024 * 1024):
+    self.max_sessions = max_sessions
+    self.max_bytes = max_bytes
+    self.sessions = OrderedDict()
+    self.total_bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self.sessions)
+
+  def get(self, session_id):
+    """Return the frontiers stored for a session, or an empty list"""
+
+    with self._lock:
+      entry = self.sessions.get(session_id)
+      if entry is None:
+        self.misses += 1
+        return []
+      self.sessions.move_to_end(session_id)
+      self.hits += 1
+      return entry[0]
+
+  def put(self, session_id, frontiers):
+    size = frontier_size(frontiers)
+    with self._lock:
+      previous = self.sessions.pop(session_id, None)
+      if previous is not None:
+        self.total_bytes -= previous[1]
+      if size > self.max_bytes:
+        return
+
+      self.sessions[session_id] = (frontiers, size)
+      self.total_bytes += size
+      while len(self.sessions) > self.max_sessions or self.total_bytes > self.max_bytes:
+        _, (_, evicted_size) = self.sessions.popitem(last=False)
+        self.total_bytes -= evicted_size
+        self.evictions += 1
+
+  def discard(self, session_id):
+    with self._lock:
+      entry = self.sessions.pop(session_id, None)
+      if entry is not None:
+        self.total_bytes -= entry[1]
+      return entry is not None
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {
+      "sessions": len(self.sessions),
+      "max_sessions": self.max_sessions,
+      "bytes": self.total_bytes,
+      "max_bytes": self.max_bytes,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "hit_rate": self.hits / lookups if lookups else 0.0,
+    }
+
+SESSION_TREES = SessionTrees()
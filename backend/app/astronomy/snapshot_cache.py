@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import hashlib
+import math
+import os
+import threading
+
+# Timestamps within one bucket share a snapshot, computed at the bucket start (bodies move ~1e-7 AU per second)
+SNAPSHOT_RESOLUTION_S = float(os.environ.get("SENTE_SNAPSHOT_RESOLUTION_S", "1.0"))
+# Total size of the cached response bodies, the least recently used are evicted above it
+SNAPSHOT_CACHE_BYTES = int(os.environ.get("SENTE_SNAPSHOT_CACHE_BYTES", str(32 * 1024 * 1024)))
+# Same for /orbits responses, up to a few MB each, cached apart so they never evict position snapshots
+ORBIT_SNAPSHOT_CACHE_BYTES = int(os.environ.get("SENTE_ORBIT_SNAPSHOT_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+class Snapshot:
+  __slots__ = ("body", "etag")
+
+  def __init__(self, body: bytes):
+    self.body = body
+    self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+class SnapshotCache:
+  """Bounded LRU cache of serialized responses keyed by quantized timestamp.
+
+  Values are the response bodies as bytes, so a hit costs no computation
+  and no serialization. Eviction is by total body size. Concurrent misses
+  on one key are coalesced: the first caller computes, the others wait for
+  its result.
+  """
+
+  def __init__(self, resolution_s=SNAPSHOT_RESOLUTION_S, max_bytes=SNAPSHOT_CACHE_BYTES):
+    self.resolution_s = resolution_s
+    self.max_bytes = max_bytes
+    self.entries = OrderedDict()
+    self.pending = {}
+    self.bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.coalesced = 0
+    self.evictions = 0
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self.entries)
+
+  def quantize(self, timestamp) -> float:
+    return math.floor(timestamp / self.resolution_s) * self.resolution_s
+
+  def get(self, key, compute) -> Snapshot:
+    """Return the snapshot of `key`, calling `compute()` for its body bytes on a miss"""
+
+    with self._lock:
+      snapshot = self.entries.get(key)
+      if snapshot is not None:
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return snapshot
+      future = self.pending.get(key)
+      owner = future is None
+      if owner:
+        self.misses += 1
+        future = self.pending[key] = Future()
+      else:
+        self.coalesced += 1
+    if not owner:
+      return future.result()
+
+    try:
+      snapshot = Snapshot(compute())
+    except BaseException as error:
+      with self._lock:
+        del self.pending[key]
+      future.set_exception(error)
+      raise
+    self.put(key, snapshot)
+    future.set_result(snapshot)
+    return snapshot
+
+  def put(self, key, snapshot: Snapshot):
+    with self._lock:
+      self.pending.pop(key, None)
+      previous = self.entries.pop(key, None)
+      if previous is not None:
+        self.bytes -= len(previous.body)
+      self.entries[key] = snapshot
+      self.bytes += len(snapshot.body)
+      while self.bytes > self.max_bytes and len(self.entries) > 1:
+        _, evicted = self.entries.popitem(last=False)
+        self.bytes -= len(evicted.body)
+        self.evictions += 1
+
+  def clear(self):
+    with self._lock:
+      self.entries.clear()
+      self.bytes = 0
+      self.hits = 0
+      self.misses = 0
+      self.coalesced = 0
+      self.evictions = 0
+
+  def stats(self):
+    lookups = self.hits + self.misses + self.coalesced
+    return {
+      "entries": len(self.entries),
+      "bytes": self.bytes,
+      "max_bytes": self.max_bytes,
+      "resolution_s": self.resolution_s,
+      "hits": self.hits,
+      "misses": self.misses,
+      "coalesced": self.coalesced,
+      "evictions": self.evictions,
+      "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+    }
+
+POSITION_SNAPSHOTS = SnapshotCache()
+ORBIT_SNAPSHOTS = SnapshotCache(max_bytes=ORBIT_SNAPSHOT_CACHE_BYTES)
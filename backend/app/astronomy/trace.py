@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import numpy as np
+
+from .objects import EPHEMERIS
+
+# Directory that worker processes write job traces to and the API streams them from
+TRACE_DIR = os.path.join(tempfile.gettempdir(), "sente-traces")
+
+EXPAND = 0
+SEEDED = 1
+REACHED = 2
+GAVE_UP = 3
+DEADLINE = 4
+LEG = 5
+EVENT_NAMES = ("expand", "seeded", "reached", "gave_up", "deadline", "leg")
+
+# Fixed-size little-endian record, also the layout of binary trace files
+TRACE_DTYPE = np.dtype([
+  ("event", "u1"),
+  ("body", "<i2"),
+  ("node", "<i4"),
+  ("open_size", "<i4"),
+  ("timestamp", "<f8"),
+  ("cost", "<f8"),
+  ("heuristic", "<f8"),
+])
+
+def trace_path(job_id) -> str:
+  return os.path.join(TRACE_DIR, f"{job_id}.trace")
+
+def record_dict(record) -> dict:
+  return {
+    "event": EVENT_NAMES[record["event"]],
+    "body": EPHEMERIS.names[record["body"]] if record["body"] >= 0 else None,
+    "node": int(record["node"]),
+    "open_size": int(record["open_size"]),
+    "timestamp": float(record["timestamp"]),
+    "cost": float(record["cost"]),
+    "heuristic": float(record["heuristic"]),
+  }
+
+def read_trace(path, start=0) -> np.ndarray:
+  """Return the complete records of a binary trace file from record `start` on"""
+
+  try:
+    with open(path, "rb") as f:
+      f.seek(start * TRACE_DTYPE.itemsize)
+      data = f.read()
+  except FileNotFoundError:
+    return np.zeros(0, TRACE_DTYPE)
+  count = len(data) // TRACE_DTYPE.itemsize
+  return np.frombuffer(data, TRACE_DTYPE, count)
+
+class BinaryTraceWriter:
+  """Appends raw `TRACE_DTYPE` records to a file, readable while it is being written"""
+
+  def __init__(self, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    self.file = open(path, "wb")
+
+  def write(self, records: np.ndarray):
+    self.file.write(records.tobytes())
+    self.file.flush()
+
+  def close(self):
+    self.file.close()
+
+class NdjsonTraceWriter:
+  """Appends records as one JSON object per line"""
+
+  def __init__(self, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    self.file = open(path, "w", encoding="utf-8")
+
+  def write(self, records: np.ndarray):
+    self.file.writelines(json.dumps(record_dict(record)) + "\n" for record in records)
+    self.file.flush()
+
+  def close(self):
+    self.file.close()
+
+class SearchTrace:
+  """Ring buffer of fixed-size search records.
+
+  Only every `sample_every`-th expansion is recorded, other events always
+  are. Without a sink the buffer keeps the latest `capacity` records. With
+  one, records are handed to it in batches of `flush_every` before they can
+  be overwritten, so the sink sees the whole sampled trace.
+  """
+
+  def __init__(self, capacity=4096, sample_every=1, sink=None, flush_every=64):
+    self.records = np.zeros(capacity, TRACE_DTYPE)
+    self.capacity = capacity
+    self.sample_every = max(1, sample_every)
+    self.sink = sink
+    self.flush_every = max(1, min(flush_every, capacity))
+    self.count = 0
+    self.flushed = 0
+    self.expansions = 0
+
+  def __len__(self):
+    return min(self.count, self.capacity)
+
+  def record(self, event, body_name, node=-1, timestamp=0.0, cost=0.0, heuristic=0.0, open_size=0):
+    body = EPHEMERIS.index[body_name] if body_name is not None else -1
+    self.records[self.count % self.capacity] = (event, body, node, open_size, timestamp, cost, heuristic)
+    self.count += 1
+    if self.sink is not None and self.count - self.flushed >= self.flush_every:
+      self.flush()
+
+  def expansion(self, state, open_size):
+    self.expansions += 1
+    if (self.expansions - 1) % self.sample_every == 0:
+      self.record(EXPAND, state.position.name, state.node, state.timestamp, state.cost_so_far, state.heuristic, open_size)
+
+  def tail(self, start=0) -> np.ndarray:
+    """Records from the `start`-th one on that are still buffered, oldest first"""
+
+    start = max(start, self.count - self.capacity)
+    indices = np.arange(start, self.count) % self.capacity
+    return self.records[indices]
+
+  def flush(self):
+    if self.sink is not None and self.count > self.flushed:
+      self.sink.write(self.tail(self.flushed))
+    self.flushed = self.count
+
+  def close(self):
+    self.flush()
+    if self.sink is not None:
+      self.sink.close()
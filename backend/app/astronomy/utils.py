@@ -1,87 +1,117 @@
 import math
 import numpy as np
+from dataclasses import dataclass
 from typing import Tuple
 
+from . import kepler
+
 G = 6.67430e-11
 
 G_IN_MS2 = 9.81
 AU_IN_METER = 1.496e11
 
-def calculate_coordinate_relative_to_primary(
-  semimajor_axis_m,
-  eccentricity,
-  inclination,
-  longitude_of_ascending_node,
-  argument_of_periapsis,
-  mean_anomaly_at_epoch,
-  mass_primary_kg,
-  elapsed_seconds
-) -> Tuple[float, float, float]:
-  """Calculate the 3D coordinate relative to a primary object"""
-  
-  # Convert angles to radians
-  inclination = math.radians(inclination)
-  longitude_of_ascending_node = math.radians(longitude_of_ascending_node)
-  argument_of_periapsis = math.radians(argument_of_periapsis)
-  mean_anomaly_at_epoch = math.radians(mean_anomaly_at_epoch)
+class SolveCounter:
+  """Running count of Kepler's equation solves, scalar and vectorized, read by the benchmarks"""
   
-  mu = G * mass_primary_kg
-  
-  # Mean motion in radians per second
-  mean_motion = math.sqrt(mu / semimajor_axis_m**3)
+  def __init__(self):
+    self.count = 0
+
+KEPLER_SOLVES = SolveCounter()
+
+@dataclass(frozen=True, slots=True)
+class OrbitConstants:
+  """Orbit quantities that never change for a body, computed once at construction.
+
+  There is no semi-latus rectum a(1 - e^2): positions are taken from the
+  eccentric anomaly, whose radius a(1 - e cos E) needs only the semi-axes,
+  which is cheaper than p / (1 + e cos v) after computing the true anomaly.
+  """
   
-  # Mean anomaly at given timestamp
-  mean_anomaly = mean_anomaly_at_epoch + mean_motion * elapsed_seconds
+  semimajor_axis_m: float
+  semiminor_axis_m: float
+  eccentricity: float
+  mean_anomaly_at_epoch: float
+  mean_motion: float
+  sqrt_one_plus_e: float
+  sqrt_one_minus_e: float
+  rotation: Tuple[Tuple[float, float, float], ...]
   
-  eccentric_anomaly = compute_eccentric_anomaly(eccentricity, mean_anomaly) 
-  true_anomaly = compute_true_anomaly(eccentricity, eccentric_anomaly)
+  @classmethod
+  def from_elements(
+    cls,
+    semimajor_axis_m,
+    eccentricity,
+    inclination,
+    longitude_of_ascending_node,
+    argument_of_periapsis,
+    mean_anomaly_at_epoch,
+    mass_primary_kg
+  ):
+    """Build the record from orbital elements given in degrees"""
+    
+    inclination = math.radians(inclination)
+    longitude_of_ascending_node = math.radians(longitude_of_ascending_node)
+    argument_of_periapsis = math.radians(argument_of_periapsis)
+    
+    cos_i, sin_i = math.cos(inclination), math.sin(inclination)
+    cos_node, sin_node = math.cos(longitude_of_ascending_node), math.sin(longitude_of_ascending_node)
+    cos_peri, sin_peri = math.cos(argument_of_periapsis), math.sin(argument_of_periapsis)
+    
+    # Perifocal to inertial: Rz(node) * Rx(inclination) * Rz(periapsis)
+    rotation = (
+      (cos_node * cos_peri - sin_node * sin_peri * cos_i, -cos_node * sin_peri - sin_node * cos_peri * cos_i, sin_node * sin_i),
+      (sin_node * cos_peri + cos_node * sin_peri * cos_i, -sin_node * sin_peri + cos_node * cos_peri * cos_i, -cos_node * sin_i),
+      (sin_peri * sin_i, cos_peri * sin_i, cos_i)
+    )
+    
+    return cls(
+      semimajor_axis_m=semimajor_axis_m,
+      semiminor_axis_m=semimajor_axis_m * math.sqrt(1 - eccentricity**2),
+      eccentricity=eccentricity,
+      mean_anomaly_at_epoch=math.radians(mean_anomaly_at_epoch),
+      mean_motion=compute_mean_motion(G * mass_primary_kg, semimajor_axis_m),
+      sqrt_one_plus_e=math.sqrt(1 + eccentricity),
+      sqrt_one_minus_e=math.sqrt(1 - eccentricity),
+      rotation=rotation
+    )
+
+def position_from_constants(orbit: OrbitConstants, elapsed_seconds) -> Tuple[float, float, float]:
+  """Calculate the 3D coordinate relative to the primary from a precomputed orbit"""
   
-  distance = semimajor_axis_m * (1 - eccentricity * math.cos(eccentric_anomaly))
+  mean_anomaly = orbit.mean_anomaly_at_epoch + orbit.mean_motion * elapsed_seconds
+  eccentric_anomaly = compute_eccentric_anomaly(orbit.eccentricity, mean_anomaly)
   
-  orbital_x = distance * math.cos(true_anomaly)
-  orbital_y = distance * math.sin(true_anomaly)
+  # Perifocal coordinates straight from the eccentric anomaly
+  orbital_x = orbit.semimajor_axis_m * (math.cos(eccentric_anomaly) - orbit.eccentricity)
+  orbital_y = orbit.semiminor_axis_m * math.sin(eccentric_anomaly)
   
-  # To 3D
-  # Rotate by argument of periapsis
-  x1 = orbital_x * math.cos(argument_of_periapsis) - orbital_y * math.sin(argument_of_periapsis)
-  y1 = orbital_x * math.sin(argument_of_periapsis) + orbital_y * math.cos(argument_of_periapsis)
-  z1 = 0
+  (r00, r01, _), (r10, r11, _), (r20, r21, _) = orbit.rotation
   
-  # Rotate by inclination
-  x2 = x1
-  y2 = y1 * math.cos(inclination)
-  z2 = y1 * math.sin(inclination)
+  # Convert to AU
+  return (
+    (r00 * orbital_x + r01 * orbital_y) / AU_IN_METER,
+    (r10 * orbital_x + r11 * orbital_y) / AU_IN_METER,
+    (r20 * orbital_x + r21 * orbital_y) / AU_IN_METER
+  )
+
+def true_anomaly_from_constants(orbit: OrbitConstants, elapsed_seconds):
+  """Calculate the true anomaly in radians from a precomputed orbit"""
   
-  # Rotate by longitude of ascending node
-  x = x2 * math.cos(longitude_of_ascending_node) - y2 * math.sin(longitude_of_ascending_node)
-  y = x2 * math.sin(longitude_of_ascending_node) + y2 * math.cos(longitude_of_ascending_node)
-  z = z2
+  mean_anomaly = orbit.mean_anomaly_at_epoch + orbit.mean_motion * elapsed_seconds
+  eccentric_anomaly = compute_eccentric_anomaly(orbit.eccentricity, mean_anomaly)
   
-  # Convert to AU
-  return (x / AU_IN_METER, y / AU_IN_METER, z / AU_IN_METER)
+  return 2 * math.atan2(
+    orbit.sqrt_one_plus_e * math.sin(eccentric_anomaly / 2),
+    orbit.sqrt_one_minus_e * math.cos(eccentric_anomaly / 2)
+  )
 
 def compute_mean_motion(mu, semimajor_axis_m):
   return math.sqrt(mu / semimajor_axis_m**3)
 
-def compute_mean_anomaly_at_time(mean_anomaly_at_epoch, mean_motion, elapsed_seconds):
-  return mean_anomaly_at_epoch + mean_motion * elapsed_seconds
-
 def compute_eccentric_anomaly(eccentricity, mean_anomaly):
-  eccentric_anomaly = mean_anomaly
-  for _ in range(100):
-    delta = (eccentric_anomaly - eccentricity * math.sin(eccentric_anomaly) - mean_anomaly) / (1 - eccentricity * math.cos(eccentric_anomaly))
-    eccentric_anomaly -= delta
-    if abs(delta) < 1e-6:
-        break
-  return eccentric_anomaly
-
-def compute_true_anomaly(eccentricity, eccentric_anomaly):
-  true_anomaly = 2 * math.atan2(
-    math.sqrt(1 + eccentricity) * math.sin(eccentric_anomaly / 2),
-    math.sqrt(1 - eccentricity) * math.cos(eccentric_anomaly / 2)
-  )
-  
-  return true_anomaly
+  # Counted but not timed, a timer would cost about as much as the solve
+  KEPLER_SOLVES.count += 1
+  return kepler.eccentric_anomaly(eccentricity, mean_anomaly)
 
 def distance_at_time(a, b, timestamp):
   a_pos = a.position_at_time(timestamp)
@@ -98,14 +128,14 @@ def linear_distance(src_pos, dst_pos):
 def g_to_ms2(accel_g):
   return accel_g * G_IN_MS2
 
-def distance_point_to_segment(p, a, b):
-  """Returns shortest distance from point p to segment a-b."""
-  p, a, b = np.array(p), np.array(a), np.array(b)
+def distances_points_to_segments(points, a, b):
+  """Shortest distances from points to segments a-b, all arguments broadcast over leading axes"""
   ab = b - a
-  t = np.dot(p - a, ab) / np.dot(ab, ab)
+  length_sq = np.sum(ab * ab, axis=-1, keepdims=True)
+  t = np.sum((points - a) * ab, axis=-1, keepdims=True) / np.where(length_sq == 0, 1.0, length_sq)
   t = np.clip(t, 0, 1)
   projection = a + t * ab
-  return np.linalg.norm(p - projection)
+  return np.linalg.norm(points - projection, axis=-1)
   
 def move_towards(current, target, distance):
   current, target = np.array(current), np.array(target)
@@ -0,0 +1,174 @@
+"""Accuracy and speed of the Kepler solvers for every body in `ALL_OBJECTS`.
+
+For each body, mean anomalies are taken at evenly spaced timestamps around
+`BASE_TIME` and at far-future timestamps, where an unreduced mean anomaly
+loses precision. Every solver is compared against a reference solved in
+extended precision and timed over the whole series:
+
+- `legacy scalar`: the former `compute_eccentric_anomaly`, Newton from E = M to 1e-6
+- `legacy vector`: the former vectorized Newton from E = M to 1e-12
+- `scalar`: `kepler.eccentric_anomaly`
+- `vector`: `kepler.solve_kepler`
+
+A second series steps the whole catalog through consecutive frames, as the
+live views do, comparing `solve_kepler` per frame with `kepler.WarmKepler`
+and the whole block with `kepler.solve_kepler_series`, by Newton steps per
+solve as well.
+
+Errors are reported as the position error they cause, a * |dE| in km.
+
+Run with `python -m app.benchmarks.kepler`.
+"""
+
+import argparse
+import math
+import time
+
+import numpy as np
+
+from ..astronomy.objects import ALL_OBJECTS
+from ..astronomy.kepler import solve_kepler, solve_kepler_series, eccentric_anomaly, reduce_mean_anomaly, WarmKepler, NEWTON_STEPS
+
+BASE_TIME = 1.7e9
+FAR_TIME = 1e13
+
+def legacy_scalar(eccentricity, mean_anomaly):
+  eccentric_anomaly = mean_anomaly
+  for _ in range(100):
+    delta = (eccentric_anomaly - eccentricity * math.sin(eccentric_anomaly) - mean_anomaly) / (1 - eccentricity * math.cos(eccentric_anomaly))
+    eccentric_anomaly -= delta
+    if abs(delta) < 1e-6:
+      break
+  return eccentric_anomaly
+
+def legacy_vector(eccentricity, mean_anomaly):
+  eccentric_anomaly = np.array(mean_anomaly, dtype=np.float64)
+  for _ in range(100):
+    delta = (eccentric_anomaly - eccentricity * np.sin(eccentric_anomaly) - mean_anomaly) / (1 - eccentricity * np.cos(eccentric_anomaly))
+    eccentric_anomaly -= delta
+    if np.max(np.abs(delta), initial=0.0) < 1e-12:
+      break
+  return eccentric_anomaly
+
+def reference(eccentricity, mean_anomaly):
+  """Newton in long double from the double precision solution, on the reduced mean anomaly"""
+
+  e = np.longdouble(eccentricity)
+  m = np.asarray(mean_anomaly, dtype=np.longdouble)
+  E = solve_kepler(eccentricity, mean_anomaly).astype(np.longdouble)
+  for _ in range(3):
+    E -= (E - e * np.sin(E) - m) / (1 - e * np.cos(E))
+  return E
+
+def angle_error(eccentric_anomaly, exact):
+  """|dE| folded to the nearest revolution"""
+  return np.abs(reduce_mean_anomaly(np.asarray(eccentric_anomaly, dtype=np.float64) - exact.astype(np.float64)))
+
+def timed(solve, repeat):
+  best = math.inf
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = solve()
+    best = min(best, time.perf_counter() - start)
+  return result, best
+
+def measure(name, obj, samples, span_s, repeat):
+  orbit = obj.orbit
+  timestamps = BASE_TIME + np.linspace(-span_s / 2, span_s / 2, samples)
+  far = FAR_TIME + np.linspace(0, span_s, samples)
+
+  result = {"body": name, "eccentricity": orbit.eccentricity, "solvers": {}}
+  for label, times in (("near", timestamps), ("far", far)):
+    # Mean anomalies as the ephemeris computes them, the reference uses the exactly reduced value
+    mean_anomaly = orbit.mean_anomaly_at_epoch + orbit.mean_motion * times
+    exact = reference(orbit.eccentricity, reduce_mean_anomaly(mean_anomaly))
+    values = mean_anomaly.tolist()
+
+    solvers = {
+      "legacy scalar": lambda: np.array([legacy_scalar(orbit.eccentricity, m) for m in values]),
+      "legacy vector": lambda: legacy_vector(orbit.eccentricity, mean_anomaly),
+      "scalar": lambda: np.array([eccentric_anomaly(orbit.eccentricity, m) for m in values]),
+      "vector": lambda: solve_kepler(orbit.eccentricity, mean_anomaly),
+    }
+    for solver, solve in solvers.items():
+      solution, seconds = timed(solve, repeat)
+      error_km = float(np.max(angle_error(solution, exact))) * orbit.semimajor_axis_m / 1000
+      result["solvers"].setdefault(solver, {})[label] = {"error_km": error_km, "us_per_solve": seconds / samples * 1e6}
+  return result
+
+def measure_frames(frames, step_s, repeat):
+  """Every orbit solved per frame, cold with `solve_kepler`, warm from the previous frame, and as one block"""
+
+  orbits = [obj.orbit for obj in ALL_OBJECTS.values() if hasattr(obj, "orbit")]
+  eccentricity = np.array([orbit.eccentricity for orbit in orbits])
+  mean_anomaly = (
+    np.array([orbit.mean_anomaly_at_epoch for orbit in orbits])
+    + np.array([orbit.mean_motion for orbit in orbits]) * (BASE_TIME + np.arange(frames)[:, None] * step_s)
+  )
+  semimajor_km = np.array([orbit.semimajor_axis_m for orbit in orbits]) / 1000
+  exact = reference(eccentricity, reduce_mean_anomaly(mean_anomaly))
+
+  def warm():
+    solver = WarmKepler(eccentricity)
+    return np.array([solver.solve(frame) for frame in mean_anomaly])
+
+  series = {
+    "cold": lambda: np.array([solve_kepler(eccentricity, frame) for frame in mean_anomaly]),
+    "warm": warm,
+    "warm series": lambda: solve_kepler_series(eccentricity, mean_anomaly),
+  }
+  result = {}
+  for label, solve in series.items():
+    steps = NEWTON_STEPS.count
+    solve()
+    steps = NEWTON_STEPS.count - steps
+    solution, seconds = timed(solve, repeat)
+    result[label] = {
+      "error_km": float(np.max(angle_error(solution, exact) * semimajor_km)),
+      "steps_per_solve": steps / mean_anomaly.size,
+      "us_per_frame": seconds / frames * 1e6,
+    }
+  return len(orbits), result
+
+def run(samples, span_days, repeat, frames, step_s):
+  results = [
+    measure(name, obj, samples, span_days * 86400, repeat)
+    for name, obj in ALL_OBJECTS.items()
+    if hasattr(obj, "orbit")
+  ]
+  solvers = list(results[0]["solvers"])
+
+  print(f"{'body':<16} {'e':>6}  " + "  ".join(f"{solver:>22}" for solver in solvers))
+  print(f"{'':<16} {'':>6}  " + "  ".join(f"{'km near/far':>14} {'us':>7}" for _ in solvers))
+  for r in results:
+    cells = []
+    for solver in solvers:
+      near, far = r["solvers"][solver]["near"], r["solvers"][solver]["far"]
+      cells.append(f"{near['error_km']:>6.0e}/{far['error_km']:<7.0e} {near['us_per_solve']:>7.2f}")
+    print(f"{r['body']:<16} {r['eccentricity']:>6.3f}  " + "  ".join(cells))
+
+  print()
+  for solver in solvers:
+    worst_near = max(r["solvers"][solver]["near"]["error_km"] for r in results)
+    worst_far = max(r["solvers"][solver]["far"]["error_km"] for r in results)
+    mean_us = np.mean([r["solvers"][solver]["near"]["us_per_solve"] for r in results])
+    print(f"{solver:<14} worst error {worst_near:.2e} km near, {worst_far:.2e} km far, {mean_us:.3f} us per solve")
+
+  bodies, series = measure_frames(frames, step_s, repeat)
+  print(f"\n{frames} frames of {bodies} bodies, {step_s:g} s apart")
+  for label, r in series.items():
+    print(f"{label:<14} worst error {r['error_km']:.2e} km, {r['steps_per_solve']:.2f} Newton steps per solve, {r['us_per_frame']:.1f} us per frame")
+  return results, series
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--samples", type=int, default=2000, help="timestamps per body and range")
+  parser.add_argument("--span-days", type=float, default=3650.0)
+  parser.add_argument("--repeat", type=int, default=3)
+  parser.add_argument("--frames", type=int, default=2000, help="frames of the catalog-wide series")
+  parser.add_argument("--frame-step", type=float, default=600.0, help="seconds between frames")
+  args = parser.parse_args()
+  run(args.samples, args.span_days, args.repeat, args.frames, args.frame_step)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,201 @@
+"""End-to-end benchmark of `PathFinder.find_path` over a reproducible scenario corpus.
+
+The corpus is built from `PRESETS` and `ALL_OBJECTS` with a fixed seed and
+includes routes with mandatory stops. Every scenario runs with a cold edge
+cache and records wall time, expansions, profiles generated, Kepler solves
+and peak traced memory. Results are written as JSON so runs from different
+commits can be compared, and `--baseline` turns the run into a regression
+check that exits non-zero when a metric grows past its threshold.
+
+Run with `python -m app.benchmarks.pathfinding`.
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from ..astronomy.objects import ALL_OBJECTS, LagrangePointObject
+from ..astronomy.pathfinder import PathFinder, Policy
+from ..astronomy.edge_cache import EdgeCache
+from ..astronomy.vessels import PRESETS
+from ..astronomy.utils import KEPLER_SOLVES
+
+BASE_LAUNCH_TIME = 1.7e9
+LAUNCH_SPREAD_S = 5 * 365 * 86400
+
+# Metrics compared in regression mode, with the absolute change below which they are ignored
+METRICS = {
+  "wall_s": 0.02,
+  "expansions": 2,
+  "profiles": 50,
+  "kepler_solves": 500,
+  "peak_bytes": 16 * 1024,
+  "cost": 1e-6,
+}
+
+def build_corpus(seed=0, direct_per_preset=6, with_stops_per_preset=2):
+  """Return the list of scenarios for `seed`, identical on every machine"""
+
+  rng = random.Random(seed)
+  bodies = sorted(name for name, obj in ALL_OBJECTS.items() if not isinstance(obj, LagrangePointObject))
+
+  scenarios = []
+  for preset in sorted(PRESETS):
+    for i in range(direct_per_preset + with_stops_per_preset):
+      stop_count = 0 if i < direct_per_preset else rng.randint(1, 2)
+      names = rng.sample(bodies, 2 + stop_count)
+      launch_time = BASE_LAUNCH_TIME + round(rng.uniform(0, LAUNCH_SPREAD_S) / 3600) * 3600
+      scenarios.append({
+        "id": f"{preset}:{' -> '.join(names[:1] + names[2:] + names[1:2])}@{launch_time:.0f}",
+        "preset": preset,
+        "origin": names[0],
+        "destination": names[1],
+        "mandatory_stops": names[2:],
+        "launch_time": launch_time,
+      })
+  return scenarios
+
+def search(scenario):
+  pathfinder = PathFinder(PRESETS[scenario["preset"]], Policy(), edge_cache=EdgeCache())
+  stops = [ALL_OBJECTS[name] for name in scenario["mandatory_stops"]]
+  path = pathfinder.find_path(ALL_OBJECTS[scenario["origin"]], ALL_OBJECTS[scenario["destination"]], scenario["launch_time"], stops)
+  return pathfinder, path
+
+def run_scenario(scenario, repeat=1, memory=True):
+  wall_times = []
+  for _ in range(repeat):
+    solves = KEPLER_SOLVES.count
+    start = time.perf_counter()
+    pathfinder, path = search(scenario)
+    wall_times.append(time.perf_counter() - start)
+    kepler_solves = KEPLER_SOLVES.count - solves
+
+  peak_bytes = None
+  if memory:
+    tracemalloc.start()
+    search(scenario)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+  return {
+    "id": scenario["id"],
+    "found": bool(path),
+    "legs": len(path) if path else 0,
+    "cost": sum(pathfinder.policy.evaluate(profile) for profile, _ in path) if path else None,
+    "wall_s": min(wall_times),
+    "expansions": pathfinder.stats["expansions"],
+    "profiles": pathfinder.stats["profiles"],
+    "kepler_solves": kepler_solves,
+    "peak_bytes": peak_bytes,
+  }
+
+def totals(results):
+  summary = {"scenarios": len(results), "found": sum(r["found"] for r in results)}
+  for metric in METRICS:
+    values = [r[metric] for r in results if r[metric] is not None]
+    summary[metric] = sum(values) if values else None
+  return summary
+
+def git_revision():
+  try:
+    return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def run(seed=0, direct_per_preset=6, with_stops_per_preset=2, repeat=1, memory=True, progress=None):
+  corpus = build_corpus(seed, direct_per_preset, with_stops_per_preset)
+  results = []
+  for scenario in corpus:
+    results.append(run_scenario(scenario, repeat, memory))
+    if progress:
+      progress(scenario, results[-1])
+
+  return {
+    "meta": {
+      "revision": git_revision(),
+      "created": time.time(),
+      "python": platform.python_version(),
+      "numpy": np.__version__,
+      "seed": seed,
+      "repeat": repeat,
+    },
+    "corpus": corpus,
+    "results": results,
+    "totals": totals(results),
+  }
+
+def compare(report, baseline, threshold=0.10, time_threshold=0.25):
+  """Return the regressions of `report` against `baseline` as readable strings"""
+
+  regressions = []
+  base_results = {r["id"]: r for r in baseline["results"]}
+
+  def check(label, metric, new, old):
+    if new is None or old is None:
+      return
+    limit = time_threshold if metric == "wall_s" else threshold
+    if new - old > METRICS[metric] and new > old * (1 + limit):
+      regressions.append(f"{label}: {metric} {old:.6g} -> {new:.6g} (+{(new / old - 1) if old else float('inf'):.0%})")
+
+  for result in report["results"]:
+    old = base_results.get(result["id"])
+    if old is None:
+      continue
+    if old["found"] and not result["found"]:
+      regressions.append(f"{result['id']}: no longer finds a path")
+      continue
+    for metric in METRICS:
+      check(result["id"], metric, result[metric], old[metric])
+
+  for metric in METRICS:
+    check("total", metric, report["totals"][metric], baseline["totals"][metric])
+  return regressions
+
+def print_result(scenario, result):
+  peak = f"{result['peak_bytes'] / 1024:.0f}" if result["peak_bytes"] is not None else "-"
+  print(
+    f"{result['wall_s'] * 1000:>9.1f}ms {result['expansions']:>6} exp {result['profiles']:>7} prof "
+    f"{result['kepler_solves']:>8} kepler {peak:>6} KiB  {'ok ' if result['found'] else 'NO '} {result['id']}",
+    file=sys.stderr
+  )
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--direct", type=int, default=6, help="direct routes per vessel preset")
+  parser.add_argument("--with-stops", type=int, default=2, help="mandatory-stop routes per vessel preset")
+  parser.add_argument("--repeat", type=int, default=3, help="runs per scenario, the fastest wall time is kept")
+  parser.add_argument("--no-memory", action="store_true", help="skip the traced peak memory run")
+  parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+  parser.add_argument("--baseline", help="JSON report to check this run against")
+  parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative growth of counts and memory")
+  parser.add_argument("--time-threshold", type=float, default=0.25, help="allowed relative growth of wall time")
+  args = parser.parse_args()
+
+  report = run(args.seed, args.direct, args.with_stops, args.repeat, not args.no_memory, print_result)
+  print(json.dumps(report["totals"]), file=sys.stderr)
+
+  if args.output:
+    with open(args.output, "w", encoding="utf-8") as f:
+      json.dump(report, f, indent=2)
+  else:
+    print(json.dumps(report, indent=2))
+
+  if args.baseline:
+    with open(args.baseline, encoding="utf-8") as f:
+      baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold, args.time_threshold)
+    for regression in regressions:
+      print(f"REGRESSION {regression}", file=sys.stderr)
+    print(f"{len(regressions)} regressions against {baseline['meta'].get('revision')}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+  main()
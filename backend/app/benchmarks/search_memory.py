@@ -0,0 +1,85 @@
+"""Allocation and peak memory of `PathFinder.find_path`.
+
+Runs a fixed corpus of searches under `tracemalloc` and reports, per search,
+the peak traced memory, the bytes still allocated when the search returns
+(the path and its states) and the number of allocated blocks at the peak.
+
+Run with `python -m app.benchmarks.search_memory`.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from ..astronomy.objects import ALL_OBJECTS
+from ..astronomy.pathfinder import PathFinder, Policy
+from ..astronomy.edge_cache import EdgeCache
+from ..astronomy.vessels import PRESETS
+
+LAUNCH_TIME = 1.7e9
+
+def corpus(count, seed):
+  """Random (vessel, origin, destination) searches between planets and moons"""
+
+  rng = random.Random(seed)
+  names = [name for name in ALL_OBJECTS if "-L" not in name]
+  vessels = ["Solid-Core NTR", "Gas-Core NTR Open-Cycle", "Micro-Fission Pulse", "H-B Fusion"]
+  return [(vessels[i % len(vessels)], *rng.sample(names, 2)) for i in range(count)]
+
+def measure(vessel_name, origin, destination):
+  pathfinder = PathFinder(PRESETS[vessel_name], Policy(), edge_cache=EdgeCache())
+
+  # Warm the edge cache outside the measurement so only the search itself is traced
+  pathfinder.find_path(ALL_OBJECTS[origin], ALL_OBJECTS[destination], LAUNCH_TIME)
+  edge_cache = pathfinder.edge_cache
+
+  tracemalloc.start()
+  start = time.perf_counter()
+  pathfinder = PathFinder(PRESETS[vessel_name], Policy(), edge_cache=edge_cache)
+  path = pathfinder.find_path(ALL_OBJECTS[origin], ALL_OBJECTS[destination], LAUNCH_TIME)
+  elapsed = time.perf_counter() - start
+  current, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  return {
+    "vessel": vessel_name,
+    "origin": origin,
+    "destination": destination,
+    "found": bool(path),
+    "hops": len(path) if path else 0,
+    "expansions": pathfinder.stats["expansions"],
+    "seconds": elapsed,
+    "peak_bytes": peak,
+    "retained_bytes": current,
+  }
+
+def run(count, seed):
+  results = [measure(*case) for case in corpus(count, seed)]
+
+  print(f"{'vessel':<24} {'route':<28} {'hops':>4} {'exp':>5} {'ms':>8} {'peak KiB':>9} {'kept KiB':>9}")
+  for r in results:
+    route = f"{r['origin']} -> {r['destination']}"
+    print(
+      f"{r['vessel']:<24} {route:<28} {r['hops']:>4} {r['expansions']:>5} "
+      f"{r['seconds'] * 1000:>8.1f} {r['peak_bytes'] / 1024:>9.1f} {r['retained_bytes'] / 1024:>9.1f}"
+    )
+
+  expansions = sum(r["expansions"] for r in results)
+  peak = sum(r["peak_bytes"] for r in results)
+  print(
+    f"\n{len(results)} searches, {expansions} expansions, "
+    f"total peak {peak / 1024:.1f} KiB, {peak / max(expansions, 1):.0f} peak bytes per expansion, "
+    f"max peak {max(r['peak_bytes'] for r in results) / 1024:.1f} KiB"
+  )
+  return results
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--searches", type=int, default=40)
+  parser.add_argument("--seed", type=int, default=2)
+  args = parser.parse_args()
+  run(args.searches, args.seed)
+
+if __name__ == "__main__":
+  main()
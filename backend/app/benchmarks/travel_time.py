@@ -0,0 +1,157 @@
+"""Per-edge benchmark of travel profile generation.
+
+Compares the previous stepped acceleration search against the closed-form
+`PathFinder.compute_travel_time` and the vectorized `travel_profiles` on the
+14 candidate profiles the pathfinder builds for every edge. The refuel
+candidates come from `PathFinder.refuel_profile_arrays`, as in `compute_legs`.
+
+Run with `python -m app.benchmarks.travel_time`.
+"""
+
+import argparse
+import math
+import time
+import numpy as np
+
+from ..astronomy.pathfinder import PathFinder, Policy, Profile, REFUEL_PROFILES, travel_profiles, profiles_from_arrays
+from ..astronomy.vessels import PRESETS
+from ..astronomy.utils import g_to_ms2
+
+AU_IN_METER = 1.496e11
+
+def stepped_travel_time(vessel, distance_m, accel_g, force_no_coast=False, force_accel=False, max_dv=None, step=0.01):
+  """Reference implementation: lower the acceleration by `step` until the burn fits"""
+  
+  if max_dv is None:
+    max_dv = vessel.delta_v
+    
+  while accel_g >= step:
+    max_distance = vessel.max_distance_at(accel_g, max_dv)
+    distance_to_coast = max(0, distance_m - max_distance)
+    distance_to_accel = distance_m - distance_to_coast
+    need_coasting = distance_to_coast > 0
+  
+    if distance_to_accel <= 0:
+      break
+    
+    accel_time = math.sqrt((2 * (distance_to_accel / 2)) / g_to_ms2(accel_g))
+    v_peak = g_to_ms2(accel_g) * accel_time
+    dv_cost = v_peak * 2
+    dv_to_refuel = max_dv - dv_cost
+    burn_time = 2 * accel_time
+  
+    if need_coasting:
+      if force_no_coast:
+        if force_accel or accel_g <= step:
+          break
+        accel_g -= step
+        continue
+      coast_time = distance_to_coast / v_peak
+      return Profile(burn_time, coast_time, dv_cost, dv_to_refuel, accel_g, v_peak, distance_m)
+    return Profile(burn_time, 0.0, dv_cost, dv_to_refuel, accel_g, v_peak, distance_m)
+    
+  return None
+
+def edge_arguments(pathfinder: PathFinder, dv_remaining):
+  """The 14 (accel_g, force_no_coast, force_accel, max_dv) candidates of one edge"""
+  
+  vessel = pathfinder.vessel
+  candidates = [(pathfinder.max_accel_g, False, False, dv_remaining)]
+  for factor, fraction, no_coast, force_accel in REFUEL_PROFILES:
+    candidates.append((pathfinder.max_accel_g * factor, bool(no_coast), bool(force_accel), vessel.delta_v * fraction))
+  return candidates
+
+def profiles_match(a: Profile, b: Profile, rel=1e-9):
+  if a is None or b is None:
+    return a is None and b is None
+  return all(
+    math.isclose(getattr(a, field), getattr(b, field), rel_tol=rel, abs_tol=1e-9)
+    for field in ("burn_time", "coast_time", "dv_cost", "accel_g", "v_peak")
+  )
+
+def on_grid_boundary(a: Profile, b: Profile, step=0.01):
+  """The stepped search accumulates float error in `accel_g -= step`, so at the
+  lowest grid point it may stop one step early or late where the closed form does not"""
+  
+  profile = a if b is None else b
+  return (a is None) != (b is None) and math.isclose(profile.accel_g, step, rel_tol=1e-9)
+
+def best_of(repeat, function):
+  """Return the result of `function` and its fastest wall time over `repeat` runs"""
+  
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = function()
+    best = min(best, time.perf_counter() - start)
+  return result, best
+
+def run(edges=2000, seed=0, repeat=5):
+  rng = np.random.default_rng(seed)
+  results = {}
+  
+  for preset_name, vessel in PRESETS.items():
+    pathfinder = PathFinder(vessel, Policy())
+    distances = AU_IN_METER * 10 ** rng.uniform(-3, 2.5, edges)
+    dv_remaining = vessel.delta_v * rng.uniform(0.0, 1.0, edges)
+    arguments = [edge_arguments(pathfinder, dv) for dv in dv_remaining.tolist()]
+    
+    stepped, stepped_time = best_of(repeat, lambda: [
+      [stepped_travel_time(vessel, d, a, nc, fa, dv) for a, nc, fa, dv in candidates]
+      for d, candidates in zip(distances.tolist(), arguments)
+    ])
+    
+    closed, closed_time = best_of(repeat, lambda: [
+      [pathfinder.compute_travel_time(d, a, nc, fa, dv) for a, nc, fa, dv in candidates]
+      for d, candidates in zip(distances.tolist(), arguments)
+    ])
+    
+    def vectorized_profiles():
+      first = profiles_from_arrays(travel_profiles(vessel, distances, pathfinder.max_accel_g, dv_remaining))
+      refuel_arrays = pathfinder.refuel_profile_arrays(distances)
+      rest = (profiles_from_arrays({key: value[i] for key, value in refuel_arrays.items()}) for i in range(edges))
+      return [[profile] + profiles for profile, profiles in zip(first, rest)]
+    
+    vectorized, vectorized_time = best_of(repeat, vectorized_profiles)
+    
+    flat_stepped = [p for row in stepped for p in row]
+    flat_closed = [p for row in closed for p in row]
+    vectorized = [p for row in vectorized for p in row]
+    boundary = sum(on_grid_boundary(a, b) for a, b in zip(flat_stepped, flat_closed))
+    mismatches = sum(not profiles_match(a, b) and not on_grid_boundary(a, b) for a, b in zip(flat_stepped, flat_closed))
+    mismatches += sum(not profiles_match(a, b) for a, b in zip(flat_closed, vectorized))
+    
+    results[preset_name] = {
+      "stepped_us_per_edge": stepped_time / edges * 1e6,
+      "closed_form_us_per_edge": closed_time / edges * 1e6,
+      "vectorized_us_per_edge": vectorized_time / edges * 1e6,
+      "speedup_closed_form": stepped_time / closed_time,
+      "speedup_vectorized": stepped_time / vectorized_time,
+      "grid_boundary": boundary,
+      "mismatches": mismatches,
+    }
+    
+  return results
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument("--edges", type=int, default=2000)
+  parser.add_argument("--seed", type=int, default=0)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+  
+  print(f"{'preset':<26}{'stepped':>12}{'closed':>12}{'vector':>12}{'x closed':>10}{'x vector':>10}{'edge':>6}{'diff':>6}")
+  for name, result in run(args.edges, args.seed, args.repeat).items():
+    print(
+      f"{name:<26}"
+      f"{result['stepped_us_per_edge']:>10.1f}us"
+      f"{result['closed_form_us_per_edge']:>10.1f}us"
+      f"{result['vectorized_us_per_edge']:>10.1f}us"
+      f"{result['speedup_closed_form']:>10.1f}"
+      f"{result['speedup_vectorized']:>10.1f}"
+      f"{result['grid_boundary']:>6}"
+      f"{result['mismatches']:>6}"
+    )
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import struct
+import time
+import numpy as np
+
+# Highest frame rate a client may request
+MAX_STREAM_RATE_HZ = 30.0
+# Largest time acceleration, 1e7 runs a year in about 3 seconds
+MAX_TIME_SCALE = 1e7
+# A body is sent in a delta frame once it has moved this far from its last sent position (about 150 km)
+DELTA_THRESHOLD_AU = 1e-6
+# Frames buffered per subscriber, a slow client drops frames and resynchronizes with a key frame
+SUBSCRIBER_QUEUE = 2
+
+KEY = 0
+DELTA = 1
+FRAME_KINDS = {KEY: "key", DELTA: "delta"}
+# kind, body count, simulation timestamp, padded to 16 bytes so the positions stay aligned for typed arrays
+FRAME_HEADER = struct.Struct("<BxH4xd")
+FRAME_DTYPES = {"float32": "<f4", "float64": "<f8"}
+
+def encode_frame(kind, timestamp, positions, indices, format):
+  """One frame as JSON text, or as binary: header, positions, then the uint16 body indices of a delta"""
+
+  if format == "json":
+    frame = {"type": FRAME_KINDS[kind], "timestamp": timestamp, "positions": positions.tolist()}
+    if indices is not None:
+      frame["indices"] = indices.tolist()
+    return json.dumps(frame, separators=(",", ":"))
+
+  payload = FRAME_HEADER.pack(kind, len(positions), timestamp) + positions.astype(FRAME_DTYPES[format]).tobytes()
+  if indices is not None:
+    payload += indices.astype("<u2").tobytes()
+  return payload
+
+class Subscriber:
+  def __init__(self, format):
+    self.format = format
+    self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE)
+    self.needs_key = True
+
+  def close(self):
+    """Replace any pending frames with None, which ends the subscriber's stream"""
+    while not self.queue.empty():
+      self.queue.get_nowait()
+    self.queue.put_nowait(None)
+
+class PositionBroadcaster:
+  """Computes positions at one rate and time scale and pushes them to every subscriber.
+
+  The simulation clock starts at `start` (or the wall clock) when the
+  broadcaster starts and advances `scale` seconds per second. Each tick
+  computes the positions once and encodes each frame kind once per format in
+  use. Delta frames carry only the bodies that moved more than
+  DELTA_THRESHOLD_AU since they were last sent, so a client applying every
+  frame holds exactly the broadcaster's reference positions. New or
+  lagging subscribers, and every subscriber on ticks where most bodies
+  moved, get a key frame with all of them. If computing the
+  positions fails, every subscriber's stream ends.
+  """
+
+  def __init__(self, positions, rate_hz, scale, start=None):
+    self.positions = positions
+    self.rate_hz = rate_hz
+    self.scale = scale
+    self.start = start
+    self.subscribers = set()
+    self.reference = None
+    self.ticks = 0
+    self.dropped = 0
+    self.task = None
+
+  def simulation_time(self, wall_time) -> float:
+    return self.origin + self.scale * (wall_time - self.wall_origin)
+
+  async def run(self):
+    self.wall_origin = time.time()
+    self.origin = self.start if self.start is not None else self.wall_origin
+    loop = asyncio.get_running_loop()
+    interval = 1 / self.rate_hz
+    next_tick = loop.time()
+    while True:
+      timestamp = self.simulation_time(time.time())
+      try:
+        # Off the event loop, a table window may have to be built
+        positions = await asyncio.to_thread(self.positions, timestamp)
+      except Exception:
+        for subscriber in self.subscribers:
+          subscriber.close()
+        raise
+      self.publish(timestamp, positions)
+      self.ticks += 1
+
+      next_tick = max(next_tick + interval, loop.time())
+      await asyncio.sleep(next_tick - loop.time())
+
+  def publish(self, timestamp, positions):
+    if self.reference is None:
+      self.reference = positions.copy()
+      moved = np.arange(len(positions))
+    else:
+      moved = np.flatnonzero(np.linalg.norm(positions - self.reference, axis=1) > DELTA_THRESHOLD_AU)
+      self.reference[moved] = positions[moved]
+
+    # With most bodies moved, as under strong acceleration, a key frame is the smaller one
+    everyone_key = moved.size > len(positions) // 2
+    frames = {}
+    for subscriber in list(self.subscribers):
+      kind = KEY if subscriber.needs_key or everyone_key else DELTA
+      if kind == DELTA and not moved.size:
+        continue
+      frame = frames.get((kind, subscriber.format))
+      if frame is None:
+        if kind == KEY:
+          frame = encode_frame(KEY, timestamp, self.reference, None, subscriber.format)
+        else:
+          frame = encode_frame(DELTA, timestamp, self.reference[moved], moved, subscriber.format)
+        frames[kind, subscriber.format] = frame
+      try:
+        subscriber.queue.put_nowait(frame)
+        subscriber.needs_key = False
+      except asyncio.QueueFull:
+        subscriber.needs_key = True
+        self.dropped += 1
+
+class PositionStreams:
+  """One `PositionBroadcaster` task per (rate, scale, start), stopped when its last subscriber leaves.
+
+  `stepper()` returns the positions function of a new broadcaster, which
+  may keep state from one tick to the next.
+  """
+
+  def __init__(self, stepper):
+    self.stepper = stepper
+    self.broadcasters = {}
+    self.ticks = 0
+    self.dropped = 0
+
+  def subscribe(self, rate_hz, scale, start, format):
+    key = (rate_hz, scale, start)
+    broadcaster = self.broadcasters.get(key)
+    if broadcaster is None or broadcaster.task.done():
+      broadcaster = self.broadcasters[key] = PositionBroadcaster(self.stepper(), rate_hz, scale, start)
+      broadcaster.task = asyncio.create_task(broadcaster.run())
+    subscriber = Subscriber(format)
+    broadcaster.subscribers.add(subscriber)
+    return broadcaster, subscriber
+
+  def unsubscribe(self, broadcaster, subscriber):
+    broadcaster.subscribers.discard(subscriber)
+    key = (broadcaster.rate_hz, broadcaster.scale, broadcaster.start)
+    if not broadcaster.subscribers and self.broadcasters.get(key) is broadcaster:
+      broadcaster.task.cancel()
+      del self.broadcasters[key]
+      self.ticks += broadcaster.ticks
+      self.dropped += broadcaster.dropped
+
+  def shutdown(self):
+    for broadcaster in self.broadcasters.values():
+      broadcaster.task.cancel()
+    self.broadcasters.clear()
+
+  def stats(self):
+    return {
+      "broadcasters": len(self.broadcasters),
+      "subscribers": sum(len(b.subscribers) for b in self.broadcasters.values()),
+      "ticks": self.ticks + sum(b.ticks for b in self.broadcasters.values()),
+      "dropped": self.dropped + sum(b.dropped for b in self.broadcasters.values()),
+    }
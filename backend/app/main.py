@@ -1,20 +1,50 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager, nullcontext
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import datetime, objects, pathfind, vessels, language
+from .routers import datetime, objects, pathfind, vessels, language, metrics
+from .workers import PATHFIND_WORKERS
+from .astronomy.instrumentation import INSTRUMENTS
+import time
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  yield
+  objects.POSITION_STREAMS.shutdown()
+  PATHFIND_WORKERS.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
   CORSMiddleware,
   allow_origins=["*"],
   allow_credentials=True,
   allow_methods=["*"],
-  allow_headers=["*"]
+  allow_headers=["*"],
+  expose_headers=["Server-Timing", "ETag", "X-Catalog-Id", "X-Shape", "X-Dtype", "X-Names"]
 )
 
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+  """Time requests per route, and return a Server-Timing breakdown for `?profile=1`"""
+  profiling = request.query_params.get("profile") in ("1", "true")
+  if not profiling and not INSTRUMENTS.enabled:
+    return await call_next(request)
+  
+  start = time.perf_counter()
+  with INSTRUMENTS.profile() if profiling else nullcontext() as timings:
+    response = await call_next(request)
+  
+  route = request.scope.get("route")
+  if INSTRUMENTS.enabled and route is not None:
+    INSTRUMENTS.record(f"http {request.method} {route.path}", time.perf_counter() - start)
+  if profiling:
+    response.headers["Server-Timing"] = timings.server_timing()
+  return response
+
 app.include_router(datetime.router, prefix="/api/datetime")
 app.include_router(objects.router, prefix="/api/objects")
 app.include_router(pathfind.router, prefix="/api/pathfind")
 app.include_router(vessels.router, prefix="/api/vessels")
-app.include_router(language.router, prefix="/api/language")
\ No newline at end of file
+app.include_router(language.router, prefix="/api/language")
+app.include_router(metrics.router, prefix="/api/metrics")
\ No newline at end of file
@@ -0,0 +1,71 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..astronomy.instrumentation import INSTRUMENTS
+from ..astronomy.utils import KEPLER_SOLVES
+from ..astronomy.edge_cache import SHARED_EDGE_CACHE
+from ..astronomy.replanning import SESSION_TREES
+from ..astronomy.ephemeris_table import EPHEMERIS_TABLE
+from ..astronomy.snapshot_cache import POSITION_SNAPSHOTS, ORBIT_SNAPSHOTS
+from ..astronomy.orbits import ORBIT_PATHS
+from .objects import POSITION_STREAMS
+from ..workers import PATHFIND_WORKERS, DONE, FAILED, CANCELLED, TIMEOUT
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def label_value(value) -> str:
+  return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def metric(lines, name, kind, description, samples):
+  """Append one metric family, `samples` maps a label dict (or None) to its value"""
+  lines.append(f"# HELP sente_{name} {description}")
+  lines.append(f"# TYPE sente_{name} {kind}")
+  for labels, value in samples:
+    label_string = ""
+    if labels:
+      label_string = "{" + ",".join(f'{key}="{label_value(val)}"' for key, val in labels.items()) + "}"
+    lines.append(f"sente_{name}{label_string} {float(value):.17g}")
+
+def prometheus_text() -> str:
+  lines = []
+
+  ops = INSTRUMENTS.snapshot()
+  metric(lines, "metrics_enabled", "gauge", "Whether instrumented calls are timed into these totals (SENTE_METRICS).", [(None, INSTRUMENTS.enabled)])
+  metric(lines, "op_calls_total", "counter", "Calls of instrumented hot-path operations.", [({"op": op}, entry["calls"]) for op, entry in ops.items()])
+  metric(lines, "op_items_total", "counter", "Items processed by instrumented operations, e.g. Kepler equations solved.", [({"op": op}, entry["items"]) for op, entry in ops.items()])
+  metric(lines, "op_seconds_total", "counter", "Time spent in instrumented operations, nested operations included.", [({"op": op}, entry["seconds"]) for op, entry in ops.items()])
+  metric(lines, "kepler_solves_total", "counter", "Kepler equations solved by the API process.", [(None, KEPLER_SOLVES.count)])
+
+  workers = PATHFIND_WORKERS.metrics()
+  metric(lines, "pathfind_jobs_total", "counter", "Pathfinding jobs by outcome.", [({"status": status}, workers[status]) for status in ("submitted", "rejected", DONE, FAILED, CANCELLED, TIMEOUT)])
+  metric(lines, "pathfind_queue_depth", "gauge", "Pathfinding jobs and parallel legs waiting for a worker.", [(None, workers["queue_depth"])])
+  metric(lines, "pathfind_in_flight", "gauge", "Pathfinding jobs and parallel legs holding a worker.", [(None, workers["in_flight"])])
+  metric(lines, "pathfind_coordinating", "gauge", "Parallel-leg pathfinding jobs waiting on their legs.", [(None, workers["coordinating"])])
+  metric(lines, "pathfind_mean_wait_seconds", "gauge", "Mean queue wait of started jobs.", [(None, workers["mean_wait_s"])])
+  metric(lines, "pathfind_mean_run_seconds", "gauge", "Mean run time of returned jobs.", [(None, workers["mean_run_s"])])
+  metric(lines, "search_events_total", "counter", "Search statistics summed over finished jobs.", [({"event": event}, count) for event, count in sorted(workers["search"].items())])
+
+  cache = SHARED_EDGE_CACHE.stats()
+  metric(lines, "edge_cache", "gauge", "Edge cache of the API process.", [({"stat": stat}, value) for stat, value in cache.items() if isinstance(value, (int, float))])
+  sessions = SESSION_TREES.stats()
+  metric(lines, "sessions", "gauge", "Stored re-planning session frontiers.", [({"stat": stat}, value) for stat, value in sessions.items()])
+
+  table = EPHEMERIS_TABLE.stats()
+  metric(lines, "ephemeris_table", "gauge", "Interpolated ephemeris table of the API process.", [({"stat": stat}, value) for stat, value in table.items() if value is not None])
+  orbits = ORBIT_PATHS.stats()
+  metric(lines, "orbit_paths", "gauge", "Orbit path shapes loaded per level of detail.", [({"stat": stat}, value) for stat, value in orbits.items()])
+  snapshots = POSITION_SNAPSHOTS.stats()
+  metric(lines, "position_snapshots", "gauge", "Cached /api/objects/positions responses.", [({"stat": stat}, value) for stat, value in snapshots.items()])
+  orbit_snapshots = ORBIT_SNAPSHOTS.stats()
+  metric(lines, "orbit_snapshots", "gauge", "Cached /api/objects/orbits responses.", [({"stat": stat}, value) for stat, value in orbit_snapshots.items()])
+  streams = POSITION_STREAMS.stats()
+  metric(lines, "position_streams", "gauge", "Live position WebSocket broadcasters and subscribers.", [({"stat": stat}, value) for stat, value in streams.items()])
+
+  return "\n".join(lines) + "\n"
+
+@router.get("/", response_class=PlainTextResponse)
+def get_metrics():
+  """Return the process metrics in the Prometheus text exposition format"""
+  return PlainTextResponse(prometheus_text(), media_type=PROMETHEUS_CONTENT_TYPE)
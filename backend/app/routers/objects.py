@@ -1,43 +1,272 @@
-from fastapi import APIRouter, HTTPException
-from ..astronomy.objects import ALL_OBJECTS, LagrangePointObject, LagrangePoint, Moon, DwarfPlanet
-from typing import Dict, List
+from fastapi import APIRouter, Header, HTTPException, Response, WebSocket, WebSocketException, status
+from pydantic import BaseModel
+import asyncio
+import hashlib
+import json
+import math
+import numpy as np
+
+from ..astronomy.objects import ALL_OBJECTS, EPHEMERIS, LagrangePointObject, LagrangePoint, Moon, DwarfPlanet
+from ..astronomy.ephemeris_table import EPHEMERIS_TABLE
+from ..astronomy.snapshot_cache import POSITION_SNAPSHOTS, ORBIT_SNAPSHOTS
+from ..astronomy.orbits import ORBIT_PATHS
+from ..broadcast import PositionStreams, FRAME_DTYPES, MAX_STREAM_RATE_HZ, MAX_TIME_SCALE, DELTA_THRESHOLD_AU, FRAME_HEADER
+from typing import List, Literal, Optional
 
 router = APIRouter()
 
+MAX_TRAJECTORY_VALUES = 2_000_000
+# Positions at a timestamp never change, so shared caches may keep snapshots for this long
+SNAPSHOT_MAX_AGE_S = 3600
+
+class TrajectoryRequest(BaseModel):
+  timestamps: Optional[List[float]] = None
+  start: Optional[float] = None
+  stop: Optional[float] = None
+  step: Optional[float] = None
+  names: Optional[List[str]] = None
+  format: Literal["json", "float32", "float64"] = "json"
+
 @router.get("/")
 def get_all_objects():
   return list(ALL_OBJECTS.keys())
 
-@router.get("/positions")
-def get_positions(timestamp: float) -> Dict[str, Dict]:
-  """Return all object positions at a given timestamp."""
+def object_type(obj) -> str:
+  """Return the map category of an object"""
+  if isinstance(obj, Moon):
+    primary_obj = obj.primary_object.name
+    return f"orbital_{primary_obj}"
+  elif isinstance(obj, LagrangePointObject):
+    secondary_obj = obj.secondary_object.name
+    if obj.type in (LagrangePoint.L1, LagrangePoint.L2):
+      return f"lagrange_orbital_{secondary_obj}"
+    return 'lagrange'
+  elif isinstance(obj, DwarfPlanet):
+    return "dwarf"
+  return "planet"
+
+OBJECT_TYPES = {name: object_type(obj) for name, obj in ALL_OBJECTS.items()}
+CATALOG_INDEX = [EPHEMERIS.index[name] for name in ALL_OBJECTS]
+
+# The static part of every positions response, binary frames list positions in this order
+CATALOG = {
+  "names": list(ALL_OBJECTS),
+  "types": [OBJECT_TYPES[name] for name in ALL_OBJECTS],
+  "a": [getattr(obj, "semimajor_axis_au", None) for obj in ALL_OBJECTS.values()]
+}
+CATALOG_ID = hashlib.sha1(json.dumps(CATALOG).encode("utf-8")).hexdigest()[:12]
+CATALOG_BODY = json.dumps({"id": CATALOG_ID, **CATALOG}, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+CATALOG_ETAG = f'"{CATALOG_ID}"'
+
+def position_stepper():
+  """Positions function of one stream, the analytic fallback solves each tick from the tick before"""
+  warm = EPHEMERIS.warm_start()
+  return lambda timestamp: EPHEMERIS_TABLE.positions_at(timestamp, warm)[CATALOG_INDEX]
+
+POSITION_STREAMS = PositionStreams(position_stepper)
+
+def positions_body(timestamp: float) -> bytes:
+  """Serialize all object positions at `timestamp`, encoded like FastAPI's JSONResponse"""
+  coordinates = EPHEMERIS_TABLE.positions_at(timestamp)[CATALOG_INDEX].tolist()
+  
   positions = {}
-  for name, obj in ALL_OBJECTS.items():
-    pos = obj.position_at_time(timestamp) 
-    if isinstance(obj, Moon):
-      primary_obj = obj.primary_object.name
-      obj_type = f"orbital_{primary_obj}"
-    elif isinstance(obj, LagrangePointObject):
-      secondary_obj = obj.secondary_object.name
-      if obj.type in (LagrangePoint.L1, LagrangePoint.L2):
-        obj_type = f"lagrange_orbital_{secondary_obj}"
-      else:
-        obj_type = 'lagrange'
-    elif isinstance(obj, DwarfPlanet):
-      obj_type = "dwarf"
-    else:
-      obj_type = "planet"
-      
-    a = getattr(obj, "semimajor_axis_au", None)
-    
+  for (name, obj), (x, y, z) in zip(ALL_OBJECTS.items(), coordinates):
     positions[name] = {
-      "x": pos[0],
-      "y": pos[1],
-      "z": pos[2],
-      "type": obj_type,
-      "a": a
+      "x": x,
+      "y": y,
+      "z": z,
+      "type": OBJECT_TYPES[name],
+      "a": getattr(obj, "semimajor_axis_au", None)
     }
-  return positions
+  return json.dumps(positions, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def positions_frame(timestamp: float, dtype: str) -> bytes:
+  """All object positions at `timestamp` as a packed [N x 3] array in catalog order"""
+  return EPHEMERIS_TABLE.positions_at(timestamp)[CATALOG_INDEX].astype(dtype).tobytes()
+
+def response_format(format: Optional[str], accept: Optional[str]) -> str:
+  """The explicit `format`, else float32 frames for clients accepting application/octet-stream"""
+  if format is not None:
+    return format
+  if accept and "application/octet-stream" in accept:
+    return "float32"
+  return "json"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+  if not if_none_match:
+    return False
+  candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+  return "*" in candidates or etag in candidates
+
+def snapshot_response(snapshot, format: str, if_none_match: Optional[str], shape: str) -> Response:
+  """Response for a cached snapshot, binary formats also describe the array with X- headers"""
+  headers = {
+    "ETag": snapshot.etag,
+    "Cache-Control": f"public, max-age={SNAPSHOT_MAX_AGE_S}",
+    "Vary": "Accept"
+  }
+  if format != "json":
+    headers.update({
+      "X-Catalog-Id": CATALOG_ID,
+      "X-Shape": shape,
+      "X-Dtype": FRAME_DTYPES[format]
+    })
+  if etag_matches(if_none_match, snapshot.etag):
+    return Response(status_code=304, headers=headers)
+  media_type = "application/json" if format == "json" else "application/octet-stream"
+  return Response(content=snapshot.body, media_type=media_type, headers=headers)
+
+@router.get("/catalog")
+def get_catalog(if_none_match: Optional[str] = Header(None)):
+  """Return the names, types and semimajor axes of all objects, in the order of binary position frames"""
+  headers = {"ETag": CATALOG_ETAG, "Cache-Control": f"public, max-age={SNAPSHOT_MAX_AGE_S}"}
+  if etag_matches(if_none_match, CATALOG_ETAG):
+    return Response(status_code=304, headers=headers)
+  return Response(content=CATALOG_BODY, media_type="application/json", headers=headers)
+
+@router.get("/positions")
+def get_positions(
+  timestamp: float,
+  format: Optional[Literal["json", "float32", "float64"]] = None,
+  accept: Optional[str] = Header(None),
+  if_none_match: Optional[str] = Header(None)
+):
+  """Return all object positions at a given timestamp.
+  
+  The timestamp is quantized to the snapshot resolution and the serialized
+  response is cached, see `SnapshotCache`. Responses carry an ETag and may be
+  cached by browsers and proxies.
+  
+  With `format=float32|float64`, or an `Accept: application/octet-stream`
+  header, the response is the positions alone as a packed little-endian
+  [N x 3] array in the order of `/catalog`, whose version is sent as
+  `X-Catalog-Id`.
+  """
+  if not math.isfinite(timestamp):
+    raise HTTPException(status_code=400, detail="Invalid timestamp.")
+  
+  format = response_format(format, accept)
+  quantized = POSITION_SNAPSHOTS.quantize(timestamp)
+  if format == "json":
+    snapshot = POSITION_SNAPSHOTS.get(quantized, lambda: positions_body(quantized))
+  else:
+    snapshot = POSITION_SNAPSHOTS.get((format, quantized), lambda: positions_frame(quantized, FRAME_DTYPES[format]))
+  
+  return snapshot_response(snapshot, format, if_none_match, f"{len(CATALOG_INDEX)},3")
+
+def orbits_body(lod: str, timestamp: float, dtype: Optional[str]) -> bytes:
+  """Orbit paths of all objects around their parents' positions at `timestamp`, as JSON or packed arrays"""
+  counts, points = ORBIT_PATHS.paths(lod, EPHEMERIS_TABLE.positions_at(timestamp), CATALOG_INDEX)
+  if dtype is not None:
+    return points.astype(dtype).tobytes() + counts.astype("<u4").tobytes()
+  
+  paths = {}
+  start = 0
+  for name, count in zip(ALL_OBJECTS, counts.tolist()):
+    paths[name] = points[start:start + count, :2].tolist()
+    start += count
+  return json.dumps(paths, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+@router.get("/orbits")
+def get_orbits(
+  timestamp: float,
+  lod: Literal["low", "medium", "high"] = "medium",
+  format: Optional[Literal["json", "float32", "float64"]] = None,
+  accept: Optional[str] = Header(None),
+  if_none_match: Optional[str] = Header(None)
+):
+  """Return one closed orbit path per object, drawn around its parent's position at `timestamp`.
+  
+  Points are spaced by curvature so that the path stays within a fraction of
+  the semimajor axis set by `lod` (1e-3, 1e-4 or 1e-5), see `OrbitPaths`.
+  JSON maps each name to its [x, y] points, the format of `orbit_data.json`.
+  Binary formats (chosen as for `/positions`) send the [K x 3] points of
+  all objects in `/catalog` order, then the uint32 point count per object.
+  """
+  if not math.isfinite(timestamp):
+    raise HTTPException(status_code=400, detail="Invalid timestamp.")
+  
+  format = response_format(format, accept)
+  dtype = FRAME_DTYPES.get(format)
+  quantized = ORBIT_SNAPSHOTS.quantize(timestamp)
+  snapshot = ORBIT_SNAPSHOTS.get((lod, format, quantized), lambda: orbits_body(lod, quantized, dtype))
+  points = int(ORBIT_PATHS.shapes(lod)[0][CATALOG_INDEX].sum())
+  return snapshot_response(snapshot, format, if_none_match, f"{points},3")
+
+async def send_frames(websocket: WebSocket, subscriber):
+  while True:
+    frame = await subscriber.queue.get()
+    if frame is None:
+      await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+      return
+    if isinstance(frame, str):
+      await websocket.send_text(frame)
+    else:
+      await websocket.send_bytes(frame)
+
+async def wait_disconnect(websocket: WebSocket):
+  while (await websocket.receive())["type"] != "websocket.disconnect":
+    pass
+
+@router.websocket("/stream")
+async def stream_positions(
+  websocket: WebSocket,
+  rate: float = 10.0,
+  scale: float = 1.0,
+  start: Optional[float] = None,
+  format: Literal["json", "float32", "float64"] = "json"
+):
+  """Push all object positions `rate` times per second, the simulation time advancing `scale` times real time.
+  
+  The first message is a JSON hello with the catalog id, see `/catalog`.
+  Then come key frames with every position and delta frames with the
+  bodies that moved, see `PositionBroadcaster`. Clients asking for the same
+  rate, scale and start share one broadcaster. JSON frames hold `type`,
+  `timestamp`, `positions` and, for deltas, `indices`; binary frames are a
+  16-byte header (uint8 kind 0 key / 1 delta, uint16 count, float64
+  timestamp at byte 8), the positions and, for deltas, the uint16 indices.
+  """
+  if not 0 < rate <= MAX_STREAM_RATE_HZ:
+    raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=f"Rate must be in (0, {MAX_STREAM_RATE_HZ:g}] Hz.")
+  if not abs(scale) <= MAX_TIME_SCALE:
+    raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=f"Scale must be within {MAX_TIME_SCALE:g}.")
+  if start is not None and not math.isfinite(start):
+    raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid start.")
+  
+  await websocket.accept()
+  await websocket.send_json({
+    "type": "hello",
+    "catalog": CATALOG_ID,
+    "rate": rate,
+    "scale": scale,
+    "format": format,
+    "header_bytes": FRAME_HEADER.size,
+    "threshold_au": DELTA_THRESHOLD_AU
+  })
+  broadcaster, subscriber = POSITION_STREAMS.subscribe(rate, scale, start, format)
+  sender = asyncio.create_task(send_frames(websocket, subscriber))
+  receiver = asyncio.create_task(wait_disconnect(websocket))
+  try:
+    await asyncio.wait((sender, receiver), return_when=asyncio.FIRST_COMPLETED)
+  finally:
+    POSITION_STREAMS.unsubscribe(broadcaster, subscriber)
+    for task in (sender, receiver):
+      task.cancel()
+      # A send or receive on a socket the client closed fails, which only means the stream is over
+      if task.done() and not task.cancelled():
+        task.exception()
+
+@router.get("/streams")
+def get_stream_stats():
+  return POSITION_STREAMS.stats()
+
+@router.get("/ephemeris")
+def get_ephemeris_table_stats():
+  return {**EPHEMERIS_TABLE.stats(), "orbits": ORBIT_PATHS.stats()}
+
+@router.get("/snapshots")
+def get_snapshot_cache_stats():
+  return {**POSITION_SNAPSHOTS.stats(), "orbits": ORBIT_SNAPSHOTS.stats()}
 
 @router.get("/position")
 def get_position(name: str, timestamp: float):
@@ -50,4 +279,58 @@ def get_position(name: str, timestamp: float):
         "x": pos[0],
         "y": pos[1],
         "z": pos[2]
-    }
\ No newline at end of file
+    }
+
+@router.post("/trajectory")
+def get_trajectory(request: TrajectoryRequest):
+  """Return a dense [T x N x 3] block of positions for many timestamps and bodies.
+  
+  Timestamps are either given explicitly or as a `start`/`stop`/`step` range
+  (stop inclusive). Positions within the ephemeris table window are
+  interpolated, see `EphemerisTable`. Binary formats return the little-endian timestamps (float64)
+  followed by the position block in the requested precision.
+  """
+  if request.timestamps is not None:
+    timestamps = np.asarray(request.timestamps, dtype=np.float64)
+    if not np.isfinite(timestamps).all():
+      raise HTTPException(status_code=400, detail="Invalid timestamps.")
+  elif None not in (request.start, request.stop, request.step):
+    if not all(math.isfinite(value) for value in (request.start, request.stop, request.step)):
+      raise HTTPException(status_code=400, detail="Invalid time range.")
+    if request.step <= 0 or request.stop < request.start:
+      raise HTTPException(status_code=400, detail="Invalid time range.")
+    count = int(np.floor((request.stop - request.start) / request.step)) + 1
+    if count * 3 > MAX_TRAJECTORY_VALUES:
+      raise HTTPException(status_code=400, detail="Too many samples requested.")
+    timestamps = request.start + request.step * np.arange(count)
+  else:
+    raise HTTPException(status_code=400, detail="Provide timestamps or start, stop and step.")
+  
+  names = request.names if request.names else list(ALL_OBJECTS.keys())
+  unknown = [name for name in names if name not in ALL_OBJECTS]
+  if unknown:
+    raise HTTPException(status_code=404, detail=f"Object not found: {', '.join(unknown)}")
+  
+  if timestamps.size * len(names) * 3 > MAX_TRAJECTORY_VALUES:
+    raise HTTPException(status_code=400, detail="Too many samples requested.")
+  
+  positions = EPHEMERIS_TABLE.positions_over(timestamps, names)
+  
+  if request.format == "json":
+    return {
+      "timestamps": timestamps.tolist(),
+      "names": names,
+      "positions": positions.tolist()
+    }
+  
+  dtype = FRAME_DTYPES[request.format]
+  payload = timestamps.astype("<f8").tobytes() + positions.astype(dtype).tobytes()
+  return Response(
+    content=payload,
+    media_type="application/octet-stream",
+    headers={
+      "X-Shape": ",".join(str(n) for n in positions.shape),
+      "X-Dtype": dtype,
+      "X-Names": ",".join(names)
+    }
+  )
@@ -1,14 +1,30 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from ..astronomy.objects import ALL_OBJECTS
 from ..astronomy.vessels import Vessel
-from ..astronomy.pathfinder import PathFinder, Policy
+from ..astronomy.pathfinder import Policy, TIME_BUCKET_S, PARETO_MAX_ROUTES
+from ..astronomy.porkchop import porkchop_scan, best_windows
+from ..astronomy.edge_cache import SHARED_EDGE_CACHE
+from ..astronomy.replanning import SESSION_TREES
+from ..astronomy.instrumentation import INSTRUMENTS
+from ..astronomy.trace import TRACE_DTYPE, EVENT_NAMES, read_trace, record_dict
+from ..workers import PATHFIND_WORKERS, QueueFull, DEFAULT_TIMEOUT_S, MAX_TIMEOUT_S, QUEUED, RUNNING, DONE, TIMEOUT, FINISHED
 
-from typing import List
+import asyncio
+import json
+import math
+import numpy as np
+from typing import List, Literal, Optional
 
 router = APIRouter()
 
+MAX_JOB_WAIT_S = 60.0
+MAX_PORKCHOP_CELLS = 1_000_000
+# Seconds between reads of the files a streamed or traced job writes
+STREAM_POLL_S = 0.1
+
 class VesselInput(BaseModel):
     delta_v: float
     mass_t: float
@@ -27,35 +43,270 @@ class PathfindRequest(BaseModel):
     destination: str
     launch_time: float
     mandatory_stops: List[str]
+    heuristic: Literal["direct", "table"] = "direct"
+    parallel_legs: bool = False
+    session_id: Optional[str] = Field(None, max_length=128)
+    time_bucket_s: float = Field(TIME_BUCKET_S, gt=0)
+    timeout_s: float = Field(DEFAULT_TIMEOUT_S, gt=0, le=MAX_TIMEOUT_S)
+    trace: bool = False
+    trace_every: int = Field(1, ge=1)
+    anytime_s: Optional[float] = Field(None, gt=0)
+    target_cost: Optional[float] = None
+    
+class PorkchopRequest(BaseModel):
+    vessel: VesselInput
+    policy: PolicyInput
+    origin: str
+    destination: str
+    departure_start: float
+    departure_stop: float
+    departure_steps: int = Field(500, ge=1)
+    tof_min_s: float = Field(gt=0)
+    tof_max_s: float = Field(gt=0)
+    tof_steps: int = Field(500, ge=1)
+    windows: int = Field(5, ge=0, le=100)
+    format: Literal["json", "float32"] = "json"
+    
+def job_request(request: PathfindRequest) -> dict:
+    """Validate the body names and return the request in the plain form the workers take"""
+    
+    names = [request.origin, request.destination] + request.mandatory_stops
+    unknown = [name for name in names if name not in ALL_OBJECTS]
+    if request.origin in unknown or request.destination in unknown:
+        raise HTTPException(status_code=400, detail="Invalid origin or destination name.")
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Invalid mandatory stop: {', '.join(unknown)}")
     
-@router.post("/")
-def pathfind(request: PathfindRequest):
-    origin_obj = ALL_OBJECTS.get(request.origin)
-    destination_obj = ALL_OBJECTS.get(request.destination)
-    mandatory_stops = [ALL_OBJECTS.get(s) for s in request.mandatory_stops] 
     stops_string = "<direct>"
-    if mandatory_stops:
+    if request.mandatory_stops:
       stops_string = " -> ".join(request.mandatory_stops)
+    print(f"[pathfind] Path find {request.origin} -> {stops_string} -> {request.destination}")
     
-      
-    print(f"[pathfind] Path find {origin_obj.name} -> {stops_string} -> {destination_obj.name}")
+    job = request.model_dump(exclude={"timeout_s"})
+    if request.session_id:
+        # Seed the search with the session's previous trees so small changes only repair them
+        job["seeds"] = SESSION_TREES.get(request.session_id)
+    return job
 
-    if origin_obj is None or destination_obj is None:
-        raise HTTPException(status_code=400, detail="Invalid origin or destination name.")
+def submit_job(request: PathfindRequest, **options):
+    try:
+        # Have the worker time its search when this request is being profiled
+        profile = INSTRUMENTS.current() is not None
+        return PATHFIND_WORKERS.submit({**job_request(request), "profile": profile, **options}, request.timeout_s)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Pathfinding queue is full: {e}")
 
-    vessel = Vessel(
-        delta_v=request.vessel.delta_v,
-        mass_t=request.vessel.mass_t,
-        thrust_n=request.vessel.thrust_n
-    )
+async def job_result(job):
+    """Wait for a job and return its result, or raise the matching HTTP error"""
+    job = await PATHFIND_WORKERS.wait(job)
+    
+    profile = INSTRUMENTS.current()
+    if profile is not None and job.result is not None and job.result["timings"]:
+        profile.merge(job.result["timings"])
+    
+    if job.status == DONE:
+        return job.result["path"]
+    if job.status in (TIMEOUT, QUEUED, RUNNING):
+        PATHFIND_WORKERS.cancel(job.id)
+        if job.search_deadline < job.deadline:
+            raise HTTPException(status_code=504, detail=f"No route found within the anytime deadline of {job.request['anytime_s']:g} s")
+        raise HTTPException(status_code=504, detail=f"Pathfinding did not finish within {job.timeout_s:g} s")
+    raise HTTPException(status_code=500, detail=job.error or f"Pathfinding job {job.status}")
+
+def read_progress(path, offset):
+    """Return the complete JSON lines written to a progress file past `offset` and the new offset"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+    end = data.rfind(b"\n") + 1
+    return [json.loads(line) for line in data[:end].splitlines()], offset + end
+
+async def progress_events(job, request: Request):
+    """Server-sent events of a streamed job: `job`, then `progress` snapshots, then `result` or `error`"""
+    yield f"event: job\ndata: {json.dumps(job.describe(include_result=False))}\n\n"
+    offset = 0
+    finished = False
+    try:
+        while not finished:
+            finished = job.status in FINISHED
+            snapshots, offset = read_progress(job.request["progress_path"], offset)
+            for snapshot in snapshots:
+                yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+            
+            if finished:
+                if job.status == DONE:
+                    yield f"event: result\ndata: {json.dumps(job.result['path'])}\n\n"
+                else:
+                    yield f"event: error\ndata: {json.dumps({'status': job.status, 'detail': job.error})}\n\n"
+            elif await request.is_disconnected():
+                break
+            else:
+                await asyncio.sleep(STREAM_POLL_S)
+    finally:
+        if not finished:
+            # The client went away, there is nobody left to return a route to
+            PATHFIND_WORKERS.stop(job.id)
+            PATHFIND_WORKERS.cancel(job.id)
+
+def find_job(job_id: str):
+    job = PATHFIND_WORKERS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.post("/")
+async def pathfind(request: PathfindRequest):
+    return await job_result(submit_job(request))
+
+@router.post("/pareto")
+async def pathfind_pareto(request: PathfindRequest, max_routes: int = Query(PARETO_MAX_ROUTES, ge=1, le=64)):
+    """Return the Pareto set of direct routes over travel time, delta-v and peak acceleration"""
+    if request.mandatory_stops:
+        raise HTTPException(status_code=400, detail="Pareto search does not support mandatory stops.")
+    return await job_result(submit_job(request, mode="pareto", max_routes=max_routes))
 
-    policy = Policy(
-        time_weight=request.policy.time_weight,
-        cost_weight=request.policy.cost_weight,
-        comfort_weight=request.policy.comfort_weight,
-        disable_coast=request.policy.disable_coast
+@router.post("/stream")
+def pathfind_stream(request: PathfindRequest, http_request: Request):
+    """Run a search and stream its progress as server-sent events.
+    
+    Progress events carry the partial path being expanded, the cost bound,
+    the best complete route so far and the search statistics. POST
+    /jobs/{job_id}/stop, `target_cost` or `anytime_s` end the search early
+    with the best route found.
+    """
+    job = submit_job(request, stream=True)
+    return StreamingResponse(progress_events(job, http_request), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/jobs", status_code=202)
+def submit_pathfind_job(request: PathfindRequest):
+    return submit_job(request).describe()
+
+@router.get("/jobs/{job_id}")
+async def get_pathfind_job(job_id: str, wait: float = Query(0.0, ge=0.0, le=MAX_JOB_WAIT_S)):
+    job = find_job(job_id)
+    if wait > 0 and job.status not in FINISHED:
+        job = await PATHFIND_WORKERS.wait(job, wait)
+    return job.describe()
+
+@router.post("/jobs/{job_id}/stop")
+def stop_pathfind_job(job_id: str):
+    """Stop a search early, it finishes with the best route found so far"""
+    find_job(job_id)
+    return PATHFIND_WORKERS.stop(job_id).describe()
+
+@router.delete("/jobs/{job_id}")
+def cancel_pathfind_job(job_id: str):
+    """Cancel a job, a running one keeps its worker until the search notices and reports `cancelling` until then"""
+    find_job(job_id)
+    job = PATHFIND_WORKERS.cancel(job_id)
+    if job.status == RUNNING and not job.cancelling:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} runs a search that cannot be stopped, it ends at its deadline")
+    return job.describe()
+
+async def trace_events(job, request: Request):
+    """Server-sent events of a job's trace records as the worker writes them, then an `end` event"""
+    sent = 0
+    while True:
+        finished = job.status in FINISHED
+        records = read_trace(job.request["trace_path"], sent)
+        for record in records:
+            yield f"event: {EVENT_NAMES[record['event']]}\ndata: {json.dumps(record_dict(record))}\n\n"
+        sent += len(records)
+        
+        if finished:
+            yield f"event: end\ndata: {json.dumps({'status': job.status, 'records': sent})}\n\n"
+            return
+        if await request.is_disconnected():
+            return
+        await asyncio.sleep(STREAM_POLL_S)
+
+@router.get("/jobs/{job_id}/trace")
+def get_pathfind_trace(job_id: str, request: Request, format: Literal["sse", "ndjson", "binary"] = "sse"):
+    """Stream the expansion trace of a job submitted with `trace` enabled.
+    
+    `sse` follows the running search live, `ndjson` and `binary` export the
+    records written so far. Binary traces are packed little-endian records
+    whose layout is given in the X-Dtype header.
+    """
+    job = find_job(job_id)
+    if not job.request.get("trace_path"):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} was not traced")
+    
+    if format == "sse":
+        return StreamingResponse(trace_events(job, request), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    
+    records = read_trace(job.request["trace_path"])
+    if format == "ndjson":
+        return StreamingResponse((json.dumps(record_dict(record)) + "\n" for record in records), media_type="application/x-ndjson")
+    return Response(
+        content=records.tobytes(),
+        media_type="application/octet-stream",
+        headers={"X-Dtype": json.dumps(TRACE_DTYPE.descr), "X-Events": ",".join(EVENT_NAMES)}
     )
+
+@router.get("/workers")
+def get_worker_metrics():
+    return PATHFIND_WORKERS.metrics()
+
+@router.get("/sessions")
+def get_session_stats():
+    return SESSION_TREES.stats()
+
+@router.delete("/sessions/{session_id}")
+def forget_session(session_id: str):
+    if not SESSION_TREES.discard(session_id):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return {"session_id": session_id}
+
+@router.get("/cache")
+def get_edge_cache_stats():
+    return SHARED_EDGE_CACHE.stats()
+
+@router.post("/porkchop")
+def porkchop(request: PorkchopRequest):
+    """Scan the direct leg cost over a departure x time-of-flight grid.
+    
+    JSON responses hold the full cost matrix (null where the leg is impossible).
+    The float32 format returns the little-endian [departures x tofs] cost matrix
+    as the body and the best windows as JSON in the X-Windows header.
+    """
+    origin_obj = ALL_OBJECTS.get(request.origin)
+    destination_obj = ALL_OBJECTS.get(request.destination)
+    if origin_obj is None or destination_obj is None or origin_obj == destination_obj:
+        raise HTTPException(status_code=400, detail="Invalid origin or destination name.")
+    if request.departure_stop < request.departure_start or request.tof_max_s < request.tof_min_s:
+        raise HTTPException(status_code=400, detail="Invalid departure or time of flight range.")
+    if request.departure_steps * request.tof_steps > MAX_PORKCHOP_CELLS:
+        raise HTTPException(status_code=400, detail="Too many grid cells requested.")
+    
+    vessel = Vessel(**request.vessel.model_dump())
+    policy = Policy(**request.policy.model_dump())
+    departures = np.linspace(request.departure_start, request.departure_stop, request.departure_steps)
+    times_of_flight = np.linspace(request.tof_min_s, request.tof_max_s, request.tof_steps)
+    
+    scan = porkchop_scan(vessel, policy, origin_obj, destination_obj, departures, times_of_flight)
+    windows = best_windows(scan, request.windows, origin_obj, destination_obj)
+    
+    if request.format == "float32":
+        return Response(
+            content=scan["cost"].astype("<f4").tobytes(),
+            media_type="application/octet-stream",
+            headers={
+                "X-Shape": ",".join(str(n) for n in scan["cost"].shape),
+                "X-Dtype": "<f4",
+                "X-Departures": f"{request.departure_start},{request.departure_stop},{request.departure_steps}",
+                "X-Times-Of-Flight": f"{request.tof_min_s},{request.tof_max_s},{request.tof_steps}",
+                "X-Windows": json.dumps(windows)
+            }
+        )
     
-    pathfinder = PathFinder(vessel, policy, list(ALL_OBJECTS.values()))
-    pathfinder.find_path(origin_obj, destination_obj, request.launch_time, mandatory_stops)
-    return pathfinder.parse_path()
\ No newline at end of file
+    cost = scan["cost"]
+    return {
+        "departures": departures.tolist(),
+        "times_of_flight": times_of_flight.tolist(),
+        "cost": [[c if math.isfinite(c) else None for c in row] for row in cost.tolist()],
+        "windows": windows
+    }
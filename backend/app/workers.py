@@ -0,0 +1,509 @@
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+from .astronomy.objects import ALL_OBJECTS, EPHEMERIS
+from .astronomy.vessels import Vessel
+from .astronomy.pathfinder import PathFinder, Policy, TIME_BUCKET_S, PARETO_MAX_ROUTES
+from .astronomy.edge_cache import SHARED_EDGE_CACHE
+from .astronomy.replanning import SESSION_TREES
+from .astronomy.instrumentation import INSTRUMENTS
+from .astronomy.trace import SearchTrace, BinaryTraceWriter, trace_path, TRACE_DIR
+
+DEFAULT_TIMEOUT_S = 120.0
+MAX_TIMEOUT_S = 600.0
+MAX_PENDING_JOBS = 64
+FINISHED_JOB_RETENTION = 256
+# Trace records a worker buffers before appending them to the job's trace file
+TRACE_FLUSH_EVERY = 16
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMEOUT = "timeout"
+FINISHED = (DONE, FAILED, CANCELLED, TIMEOUT)
+
+# Request keys naming the files a job shares with the API process, removed when the job expires
+JOB_FILES = ("trace_path", "progress_path", "stop_path")
+
+class QueueFull(Exception):
+  pass
+
+def error_message(error) -> str:
+  return f"{type(error).__name__}: {error}"
+
+def job_file(job_id, kind) -> str:
+  return os.path.join(TRACE_DIR, f"{job_id}.{kind}")
+
+def coordinated(request: dict) -> bool:
+  """Whether `request` is run by a coordinator thread that fans its legs out over the pool"""
+  return bool(request.get("parallel_legs") and request["mandatory_stops"])
+
+def stoppable(request: dict) -> bool:
+  """Whether the search of `request` watches its stop file, Pareto searches and parallel legs only stop at their deadline"""
+  return request.get("mode") != "pareto" and not coordinated(request)
+
+def request_stop(stop_path):
+  os.makedirs(os.path.dirname(stop_path), exist_ok=True)
+  with open(stop_path, "w"):
+    pass
+
+class StopFile:
+  """Progress callback that tells the search to stop once the stop file exists"""
+
+  def __init__(self, stop_path):
+    self.stop_path = stop_path
+
+  def __call__(self, snapshot) -> bool:
+    return os.path.exists(self.stop_path)
+
+  def close(self):
+    pass
+
+class ProgressFile(StopFile):
+  """Progress callback of a streamed search.
+
+  Appends each snapshot as a JSON line to a file the API process tails, and
+  tells the search to stop once the stop file exists or a route at or below
+  `target_cost` has been found.
+  """
+
+  def __init__(self, path, stop_path, target_cost=None):
+    super().__init__(stop_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    self.file = open(path, "w", encoding="utf-8")
+    self.target_cost = target_cost
+
+  def __call__(self, snapshot) -> bool:
+    self.file.write(json.dumps(snapshot) + "\n")
+    self.file.flush()
+    good_enough = self.target_cost is not None and snapshot["best_cost"] is not None and snapshot["best_cost"] <= self.target_cost
+    return good_enough or super().__call__(snapshot)
+
+  def close(self):
+    self.file.close()
+
+def warm_worker():
+  """Process pool initializer, touches the catalog so the first job does not pay for it"""
+  EPHEMERIS.positions_at(0.0)
+
+def run_pathfind(request: dict, deadline: float, leg_executor=None):
+  """Run one pathfinding request inside a worker process.
+
+  `request` is the plain dict form of the router's request model so it can be
+  pickled, the result is the `parse_path` dict plus search statistics and the
+  search frontiers to re-plan from. With a
+  `leg_executor` the legs of a mandatory-stop route are solved in parallel on it.
+  When metrics are enabled or the request asks for a profile, the timings of
+  the instrumented calls made by the search are returned as well. With a
+  `trace_path` the search trace is streamed to that file as it runs, and with
+  a `progress_path` progress snapshots are, see `ProgressFile`. The search
+  stops early once the file at `stop_path` exists.
+  """
+
+  vessel = Vessel(**request["vessel"])
+  policy = Policy(**request["policy"])
+  origin = ALL_OBJECTS[request["origin"]]
+  destination = ALL_OBJECTS[request["destination"]]
+  mandatory_stops = [ALL_OBJECTS[name] for name in request["mandatory_stops"]]
+  
+  progress = None
+  if request.get("progress_path"):
+    progress = ProgressFile(request["progress_path"], request["stop_path"], request.get("target_cost"))
+  elif request.get("stop_path"):
+    progress = StopFile(request["stop_path"])
+  
+  trace = None
+  if request.get("trace_path"):
+    trace = SearchTrace(sample_every=request.get("trace_every", 1), sink=BinaryTraceWriter(request["trace_path"]), flush_every=TRACE_FLUSH_EVERY)
+
+  pathfinder = PathFinder(
+    vessel,
+    policy,
+    list(ALL_OBJECTS.values()),
+    edge_cache=SHARED_EDGE_CACHE,
+    heuristic=request.get("heuristic", "direct"),
+    deadline=deadline,
+    leg_executor=leg_executor,
+    seeds=request.get("seeds"),
+    time_bucket_s=request.get("time_bucket_s", TIME_BUCKET_S),
+    trace=trace,
+    progress=progress
+  )
+  try:
+    with INSTRUMENTS.profile() if request.get("profile") or INSTRUMENTS.enabled else nullcontext() as timings:
+      if request.get("mode") == "pareto":
+        paths = pathfinder.find_pareto_routes(origin, destination, request["launch_time"], request.get("max_routes", PARETO_MAX_ROUTES))
+        result = pathfinder.parse_pareto_routes(paths)
+      else:
+        pathfinder.find_path(origin, destination, request["launch_time"], mandatory_stops)
+        result = pathfinder.parse_path()
+  finally:
+    if trace is not None:
+      trace.close()
+    if progress is not None:
+      progress.close()
+
+  return {
+    "path": result,
+    # A search cut short by its deadline that still found a route has done its job
+    "timed_out": pathfinder.timed_out and not pathfinder.full_path,
+    "stats": dict(pathfinder.stats),
+    "frontiers": pathfinder.frontiers,
+    "timings": timings.as_dict() if timings is not None else None,
+    "pid": os.getpid(),
+  }
+
+class PathfindJob:
+  def __init__(self, request: dict, timeout_s: float):
+    self.id = uuid.uuid4().hex
+    self.request = request
+    self.timeout_s = timeout_s
+    self.submitted_at = time.time()
+    self.deadline = self.submitted_at + timeout_s
+    # Anytime searches stop earlier and return the best route found by then
+    self.search_deadline = self.deadline
+    if request.get("anytime_s"):
+      self.search_deadline = min(self.deadline, self.submitted_at + request["anytime_s"])
+    self.started_at = None
+    self.finished_at = None
+    self.status = QUEUED
+    self.result = None
+    self.error = None
+    self.future = None
+    # Set once a running job was asked to stop, it finishes as cancelled when its worker returns
+    self.cancelling = False
+
+    # Resolved with the job itself once it reaches a finished status
+    self.done = Future()
+
+  def describe(self, include_result=True):
+    info = {
+      "job_id": self.id,
+      "status": self.status,
+      "origin": self.request["origin"],
+      "destination": self.request["destination"],
+      "submitted_at": self.submitted_at,
+      "started_at": self.started_at,
+      "finished_at": self.finished_at,
+      "timeout_s": self.timeout_s,
+    }
+    if self.error is not None:
+      info["error"] = self.error
+    if self.cancelling and self.status == RUNNING:
+      info["cancelling"] = True
+    if include_result and self.result is not None:
+      info["result"] = self.result["path"]
+      info["stats"] = self.result["stats"]
+    return info
+
+class LegTask:
+  """One leg search of a coordinated job, queued for a pool slot like a job"""
+
+  def __init__(self, fn, args):
+    self.id = uuid.uuid4().hex
+    self.fn = fn
+    self.args = args
+    # Handed to the coordinator, resolved with the pool's result
+    self.future = Future()
+
+class LegQueue:
+  """`leg_executor` of a coordinated job, queues its legs on `workers` instead of submitting them to the pool"""
+
+  def __init__(self, workers):
+    self.workers = workers
+
+  def submit(self, fn, *args) -> Future:
+    return self.workers.submit_leg(fn, *args)
+
+class PathfindWorkers:
+  """Bounded process pool running pathfinding jobs off the API process.
+
+  At most `max_workers` jobs are handed to the pool at a time, the rest wait
+  in a FIFO of at most `max_pending` jobs, so queue depth and in-flight counts
+  are exact. Cancelling a running job creates its stop file, the job stays
+  in flight until its search notices and returns, see `cancel`.
+
+  Jobs asking for `parallel_legs` on a route with mandatory stops are run by
+  a coordinator thread of this process instead, at most `max_workers` at a
+  time. Their legs wait in a FIFO of their own, served before the jobs so a
+  coordinator never waits on jobs queued behind it. Queued legs count
+  against `max_pending` and running legs take pool slots like jobs.
+  """
+
+  def __init__(self, max_workers=None, max_pending=MAX_PENDING_JOBS, retention=FINISHED_JOB_RETENTION):
+    self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+    self.max_pending = max_pending
+    self.retention = retention
+
+    self.jobs = {}
+    self.pending = deque()
+    self.legs = deque()
+    # Ids of the jobs and legs holding a pool slot, and of the jobs holding a coordinator thread
+    self.running = set()
+    self.coordinating = set()
+    self.finished = OrderedDict()
+    self.counts = {"submitted": 0, "rejected": 0, DONE: 0, FAILED: 0, CANCELLED: 0, TIMEOUT: 0}
+    self.started = 0
+    self.returned = 0
+    self.total_wait_s = 0.0
+    self.total_run_s = 0.0
+    self.search_stats = Counter()
+
+    self._executor = None
+    self._coordinator = None
+    self._lock = threading.RLock()
+
+  def _pool(self):
+    if self._executor is None:
+      # Forking this threaded process could copy a lock another thread holds into the worker, spawned workers start clean
+      self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"), initializer=warm_worker)
+    return self._executor
+
+  def _coordinators(self):
+    if self._coordinator is None:
+      self._coordinator = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pathfind-legs")
+    return self._coordinator
+
+  def _pool_submit(self, fn, *args):
+    try:
+      return self._pool().submit(fn, *args)
+    except BrokenProcessPool:
+      # A worker died, the pool is replaced once
+      self._executor = None
+      return self._pool().submit(fn, *args)
+
+  def _start(self, job: PathfindJob):
+    if coordinated(job.request):
+      return self._coordinators().submit(run_pathfind, job.request, job.search_deadline, LegQueue(self))
+    return self._pool_submit(run_pathfind, job.request, job.search_deadline)
+
+  def submit(self, request: dict, timeout_s=DEFAULT_TIMEOUT_S) -> PathfindJob:
+    job = PathfindJob(request, min(timeout_s, MAX_TIMEOUT_S))
+    if request.get("trace"):
+      job.request = {**job.request, "trace_path": trace_path(job.id)}
+    job.request = {**job.request, "stop_path": job_file(job.id, "stop")}
+    if request.get("stream"):
+      job.request = {**job.request, "progress_path": job_file(job.id, "progress")}
+    with self._lock:
+      queued = len(self.pending) + len(self.legs)
+      if queued >= self.max_pending:
+        self.counts["rejected"] += 1
+        raise QueueFull(f"{queued} jobs and legs already queued")
+      self.jobs[job.id] = job
+      self.pending.append(job)
+      self.counts["submitted"] += 1
+      self._dispatch()
+    return job
+
+  def submit_leg(self, fn, *args) -> Future:
+    """Queue a leg of a running coordinated job, admitted even when the queue is full since its job already was"""
+
+    task = LegTask(fn, args)
+    with self._lock:
+      self.legs.append(task)
+      self._dispatch()
+    return task.future
+
+  def get(self, job_id) -> PathfindJob:
+    with self._lock:
+      job = self.jobs.get(job_id)
+      if job is not None and job.status == QUEUED and time.time() > job.deadline:
+        self.pending.remove(job)
+        self._finish(job, TIMEOUT, error="Timed out while queued")
+      return job
+
+  def cancel(self, job_id) -> PathfindJob:
+    """Cancel a job, a queued one at once and a running one once its search stopped.
+
+    A running job whose search cannot be stopped (see `stoppable`) is left
+    running and returned without `cancelling` set, it ends at its deadline.
+    """
+
+    with self._lock:
+      job = self.jobs.get(job_id)
+      if job is None or job.status in FINISHED:
+        return job
+      if job.status == QUEUED:
+        self.pending.remove(job)
+        self._finish(job, CANCELLED)
+        return job
+      if not stoppable(job.request):
+        return job
+      job.cancelling = True
+    request_stop(job.request["stop_path"])
+    return job
+
+  def stop(self, job_id) -> PathfindJob:
+    """Ask a job to stop searching and return the best route found so far"""
+
+    with self._lock:
+      job = self.jobs.get(job_id)
+      if job is None or job.status in FINISHED:
+        return job
+      if job.status == QUEUED or not stoppable(job.request):
+        return self.cancel(job_id)
+    request_stop(job.request["stop_path"])
+    return job
+
+  async def wait(self, job: PathfindJob, timeout_s=None) -> PathfindJob:
+    """Wait for `job` to finish, or until `timeout_s` passes, and return it"""
+
+    # Never wait past the job's own deadline plus a little slack for the worker to notice it
+    remaining = job.deadline - time.time() + 1.0
+    if timeout_s is None or timeout_s > remaining:
+      timeout_s = max(remaining, 0.0)
+
+    try:
+      await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.done)), timeout_s)
+    except asyncio.TimeoutError:
+      pass
+    return self.get(job.id)
+
+  def _dispatch(self):
+    while self.legs and len(self.running) < self.max_workers:
+      task = self.legs.popleft()
+      # False once the coordinator cancelled the leg
+      if not task.future.set_running_or_notify_cancel():
+        continue
+      self.running.add(task.id)
+      try:
+        future = self._pool_submit(task.fn, *task.args)
+      except Exception as error:
+        self.running.discard(task.id)
+        task.future.set_exception(error)
+        continue
+      future.add_done_callback(lambda future, task=task: self._leg_completed(task, future))
+
+    while self.pending:
+      job = self.pending[0]
+      slots = self.coordinating if coordinated(job.request) else self.running
+      if len(slots) >= self.max_workers:
+        break
+      self.pending.popleft()
+      now = time.time()
+      if now > job.deadline:
+        self._finish(job, TIMEOUT, error="Timed out while queued")
+        continue
+
+      job.status = RUNNING
+      job.started_at = now
+      self.started += 1
+      self.total_wait_s += now - job.submitted_at
+      slots.add(job.id)
+      try:
+        job.future = self._start(job)
+      except Exception as error:
+        slots.discard(job.id)
+        self._finish(job, FAILED, error=error_message(error))
+        continue
+      job.future.add_done_callback(lambda future, job=job: self._completed(job, future))
+
+  def _leg_completed(self, task: LegTask, future):
+    # Cancelled by the pool shutting down, the leg's own future is running and cannot be cancelled any more
+    error = CancelledError() if future.cancelled() else future.exception()
+    with self._lock:
+      self.running.discard(task.id)
+      if isinstance(error, BrokenProcessPool):
+        self._executor = None
+      self._dispatch()
+    if error is not None:
+      task.future.set_exception(error)
+    else:
+      task.future.set_result(future.result())
+
+  def _completed(self, job: PathfindJob, future):
+    with self._lock:
+      self.running.discard(job.id)
+      self.coordinating.discard(job.id)
+      self.returned += 1
+      self.total_run_s += time.time() - job.started_at
+
+      if job.status == RUNNING and (future.cancelled() or job.cancelling):
+        self._finish(job, CANCELLED)
+      elif job.status == RUNNING:
+        # Anything raised here would be swallowed by the executor and leave the job running forever
+        try:
+          result = future.result()
+          timed_out = result["timed_out"]
+        except Exception as error:
+          if isinstance(error, BrokenProcessPool):
+            self._executor = None
+          self._finish(job, FAILED, error=error_message(error))
+        else:
+          if timed_out:
+            self._finish(job, TIMEOUT, result=result, error="Search deadline reached")
+          else:
+            self._finish(job, DONE, result=result)
+
+      self._dispatch()
+
+  def _finish(self, job: PathfindJob, status, result=None, error=None):
+    job.status = status
+    job.result = result
+    job.error = error
+    job.finished_at = time.time()
+    self.counts[status] += 1
+    
+    if result is not None:
+      self.search_stats.update(result["stats"])
+      # Searches run by a coordinator thread were already timed in this process
+      if result["pid"] != os.getpid():
+        INSTRUMENTS.absorb(result["timings"])
+    if status == DONE and job.request.get("session_id"):
+      SESSION_TREES.put(job.request["session_id"], result["frontiers"])
+    job.done.set_result(job)
+
+    self.finished[job.id] = job
+    while len(self.finished) > self.retention:
+      expired, expired_job = self.finished.popitem(last=False)
+      self.jobs.pop(expired, None)
+      for key in JOB_FILES:
+        if expired_job.request.get(key):
+          try:
+            os.remove(expired_job.request[key])
+          except OSError:
+            pass
+
+  def metrics(self):
+    with self._lock:
+      return {
+        "max_workers": self.max_workers,
+        "max_pending": self.max_pending,
+        "queue_depth": len(self.pending) + len(self.legs),
+        "in_flight": len(self.running),
+        "legs_queued": len(self.legs),
+        "coordinating": len(self.coordinating),
+        "jobs_tracked": len(self.jobs),
+        **self.counts,
+        "mean_wait_s": self.total_wait_s / self.started if self.started else 0.0,
+        "mean_run_s": self.total_run_s / self.returned if self.returned else 0.0,
+        "search": dict(self.search_stats),
+      }
+
+  def shutdown(self):
+    with self._lock:
+      executor, self._executor = self._executor, None
+      coordinator, self._coordinator = self._coordinator, None
+      for job in list(self.pending):
+        self._finish(job, CANCELLED)
+      self.pending.clear()
+      for task in self.legs:
+        task.future.cancel()
+      self.legs.clear()
+    if executor is not None:
+      executor.shutdown(wait=False, cancel_futures=True)
+    if coordinator is not None:
+      coordinator.shutdown(wait=False, cancel_futures=True)
+
+PATHFIND_WORKERS = PathfindWorkers()
@@ -0,0 +1,32 @@
+import numpy as np
+
+from app.astronomy.ephemeris import Ephemeris
+from app.astronomy.ephemeris_table import EphemerisTable
+from app.astronomy.objects import ALL_OBJECTS
+
+TIMESTAMP = 1.7e9
+# Below what Ihokronu's samples reach within TABLE_MAX_REFINE halvings, Seruna's meet it
+TOLERANCE_AU = 5e-11
+
+def test_bodies_over_tolerance_use_the_analytic_ephemeris(tmp_path):
+  ephemeris = Ephemeris([ALL_OBJECTS["Ihokronu"], ALL_OBJECTS["Seruna"]])
+  table = EphemerisTable(ephemeris, window_s=4 * 86400, tolerance_au=TOLERANCE_AU, directory=str(tmp_path))
+  table.build_window(table.window_start(TIMESTAMP))
+
+  index = table.covering(TIMESTAMP, TIMESTAMP)[2]
+  assert index["count"][ephemeris.index["Ihokronu"]] == 0
+  assert index["count"][ephemeris.index["Seruna"]] > 0
+
+  timestamps = TIMESTAMP + np.linspace(-43200, 43200, 97)
+  positions = table.positions_over(timestamps)
+  exact = ephemeris.positions_over(timestamps)
+  assert table.hits == 1
+  np.testing.assert_array_equal(positions[:, ephemeris.index["Ihokronu"]], exact[:, ephemeris.index["Ihokronu"]])
+  assert np.linalg.norm(positions - exact, axis=-1).max() <= TOLERANCE_AU
+
+  np.testing.assert_array_equal(table.positions_over(timestamps, ["Ihokronu"]), exact[:, [ephemeris.index["Ihokronu"]]])
+  np.testing.assert_array_equal(table.positions_at(TIMESTAMP)[ephemeris.index["Ihokronu"]], ephemeris.positions_at(TIMESTAMP)[ephemeris.index["Ihokronu"]])
+
+  stats = table.stats()
+  assert stats["error_bound_au"] <= TOLERANCE_AU
+  assert stats["analytic_bodies"] == 1